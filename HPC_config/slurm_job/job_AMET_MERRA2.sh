@@ -3,12 +3,12 @@
 #SBATCH -p normal    # short partition
 #SBATCH -t 1-12:00:00 # wall time limit of job
 
-# run 16 jobs on one node
+# run the jobs (one year each, one input file each) on one node
+# the number of jobs running at the same time is chosen by AMET_MERRA2_Cartesius.py
+# from the memory of the node, and each job computes the days of a month in parallel
+# with the worker processes that fit in its share of the memory
 cd /projects/0/blueactn/reanalysis/MERRA2/input
-for ((i=0; i<=10; i++)); do
-(
-  python AMET_MERRA2_Cartesius.py < ./input_stream_1/input.$i   # read time from a txt file
-)&
-done
-# wait until all the processes are ended
-wait
+years=$(ls ./input_stream_1/input.* | wc -l)
+export JOBS_PER_NODE=$(python AMET_MERRA2_Cartesius.py --jobs $years)
+# a new year starts as soon as one is finished
+ls ./input_stream_1/input.* | xargs -P $JOBS_PER_NODE -I {} sh -c 'python AMET_MERRA2_Cartesius.py < {}'   # read time from a txt file
@@ -0,0 +1,50 @@
+#!/usr/bin/env python
+"""
+Copyright Netherlands eScience Center
+
+Function        : Summarize the timing of the stages of the AMET and OMET jobs
+Author          : Yang Liu
+Date            : 2018.2.14
+Last Update     : 2018.2.23
+Description     : The AMET and OMET scripts write the wall time, CPU time and peak
+                  memory of each stage as JSON lines next to their log (wizard.timing),
+                  e.g. history_E_1980_timing.jsonl. The code collects these files of
+                  all the Slurm jobs and prints the total and maximum time and the
+                  peak memory of each stage, to see where the node-hours go, and of
+                  each stage and job, to find a job which is slower than the others.
+Return Value    : table on the standard output
+Dependencies    : os, sys, glob, wizard.timing
+Caveat!!        : The share of each stage is relative to the sum of all the stages.
+                  The stages of the worker processes overlap in time, so the sum of
+                  their wall time exceeds the elapsed time of the job.
+                  There is no stage of the geopotential, it is streamed level by level
+                  into the energy flux and its time is included in the flux stage.
+"""
+import os
+import sys
+import glob
+# add the root of the toolkit to the search path for the shared kernels
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+import wizard.timing
+
+################################   Input zone  ######################################
+# files of the measurements, the path of the logs of each dataset
+timing_files = '/projects/0/blueactn/reanalysis/MERRA2/log/*_timing.jsonl'
+# labels by which the measurements are aggregated
+keys = ('dataset', 'stage')
+keys_job = ('dataset', 'job', 'stage')
+####################################################################################
+
+if __name__=="__main__":
+    filenames = sorted(glob.glob(timing_files))
+    print 'Summarize %d timing files.' % (len(filenames))
+    print '*******************************************************************'
+    print '************************  time of each stage  *********************'
+    print '*******************************************************************'
+    for line in wizard.timing.report(wizard.timing.summarize(filenames, keys), keys):
+        print line
+    print '*******************************************************************'
+    print '*******************  time of each stage and job  ******************'
+    print '*******************************************************************'
+    for line in wizard.timing.report(wizard.timing.summarize(filenames, keys_job), keys_job):
+        print line
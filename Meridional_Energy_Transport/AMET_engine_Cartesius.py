@@ -0,0 +1,286 @@
+#!/usr/bin/env python
+"""
+Copyright Netherlands eScience Center
+Function        : Quantify atmospheric meridional energy transport with the shared engine (Cartesius customised)
+Author          : Yang Liu
+Date            : 2018.1.24
+Last Update     : 2018.2.23
+Description     : The code calculates the atmospheric meridional energy transport of
+                  any of the supported datasets (MERRA2, ERA-Interim, JRA55, EC-Earth)
+                  with the shared AMET engine (wizard.engine). The layout of the files
+                  of each dataset is handled by its reader (wizard.reader), which hands
+                  the fields over as blocks (time, level, lat, lon) together with the
+                  orientation of the levels and the latitude.
+                  The wall time, CPU time and peak memory of each stage are written as
+                  JSON lines next to the log (wizard.timing).
+                  With mean2int, the AMET of the vertical integrals of the monthly mean
+                  fields (as AMET_ERAI_mean2int) and its difference to the default
+                  ordering (int2mean) are computed from the same read of each month and
+                  written to the same file.
+                  The energy transport is integrated over longitude sectors or basins
+                  (e.g. Atlantic, Pacific) as well as along the full latitude circle.
+                  The zonal integrals are split into pressure bands (e.g. surface - 850 hPa,
+                  ... 200 hPa - TOA) as well, from the same walk through the model levels,
+                  and written with the extra dimension band.
+                  With daily, the AMET of each day is written to a file of its own as
+                  soon as it is known (with prefetch, once the blocks of the month are
+                  read), with the barotropic correction wind of the month or with a
+                  correction of each day.
+                  The barotropic correction wind is optionally the divergent wind of
+                  Trenberth (1991), solved from the Poisson equation of the mass residual.
+Return Value    : NetCFD4 data file
+Dependencies    : os, time, datetime, numpy, netCDF4, sys, logging, pygrib (JRA55 and EC-Earth)
+variables       : Absolute Temperature              T         [K]
+                  Specific Humidity                 q         [kg/kg]
+                  Surface Pressure                  ps        [Pa]
+                  Zonal Divergent Wind              u         [m/s]
+                  Meridional Divergent Wind         v         [m/s]
+                  Surface geopotential              z         [m2/s2]
+Caveat!!        : The dataset and the year are given on the standard input, e.g.
+                  echo "MERRA2 1980" | python AMET_engine_Cartesius.py
+                  Mass correction is accmpolished through the correction of barotropic wind:
+                  mass residual = surface pressure tendency + divergence of mass flux (u,v) - (E-P)
+                  E-P = evaporation - precipitation = moisture tendency - divergence of moisture flux(u,v)
+"""
+import numpy as np
+import time as tttt
+import datetime
+import os
+import sys
+import logging
+# add the root of the toolkit to the search path for the shared kernels
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+import wizard.bands
+import wizard.engine
+import wizard.reader
+import wizard.sector
+import wizard.timing
+import wizard.writer
+
+# define the constant:
+constant ={'g' : 9.80616,      # gravititional acceleration [m / s2]
+           'R' : 6371009,      # radius of the earth [m]
+           'cp': 1004.64,      # heat capacity of air [J/(Kg*K)]
+           'Lv': 2264670,      # Latent heat of vaporization [J/Kg]
+           'R_dry' : 286.9,    # gas constant of dry air [J/(kg*K)]
+           'R_vap' : 461.5,    # gas constant for water vapour [J/(kg*K)]
+            }
+
+################################   Input zone  ######################################
+#get input from shell
+line_in = sys.stdin.readline().split()
+dataset = line_in[0]
+year = int(line_in[1])
+# specify data path of each dataset
+datapath = {'MERRA2' : '/projects/0/blueactn/reanalysis/MERRA2/subdaily',
+            'ERAI'   : '/project/Reanalysis/ERA_Interim/Subdaily/Model',
+            'JRA55'  : '/projects/0/blueactn/reanalysis/JRA55/subdaily',
+            'ECEARTH': '/projects/0/blueactn/reanalysis/temp',
+            }
+# specify output path for the netCDF4 file
+output_path = '/projects/0/blueactn/reanalysis/%s/output' % (dataset)
+# precision of the energy flux arithmetic, np.float64 (default) or np.float32
+precision = np.float64
+# the surface pressure and precipitable water at the first and the last time step of
+# each month are kept for the tendency terms of the adjacent months
+snapshot_path = output_path + os.sep + 'snapshot'
+# precision of the fields at each grid point in the output file, np.float32 or np.float64
+output_precision = np.float32
+# number of decimal digits [TW] kept in the fields at each grid point, e.g. 4 for 0.1 GW
+# None keeps all the digits
+output_digits = None
+# also take the vertical integrals of the monthly mean fields (mean2int), besides the
+# monthly mean of the vertical integrals (int2mean), and their difference
+mean2int = False
+# sectors of the integrals besides the zonal integral, as (name, (west, east)) in
+# degrees east or (name, mask (lat, lon)) for a basin, e.g.
+# sectors = wizard.sector.sectors + (('Indian', (20, 120)),)
+sectors = wizard.sector.sectors
+# edges of the pressure bands [Pa] from the surface to TOA, the zonal integrals are
+# written for each band as well, None for the full column only, e.g.
+# bands = (70000.0, 30000.0, 10000.0)
+bands = wizard.bands.edges
+# daily AMET in a file of its own, with the mass budget correction of the month
+# ('monthly') or of each day ('daily'), None for the monthly AMET only
+daily = None
+# write the daily energy transport at each grid point besides the zonal integrals
+daily_point = False
+# barotropic correction wind from the mass residual at each grid point ('local') or
+# the divergent wind from the Poisson equation of the mass residual ('poisson')
+correction = 'local'
+# transform the spectral fields of the EC-Earth output ICMSH to the grid in memory,
+# then the data path of EC-Earth is the output of the model (no cdo sp2gpl)
+ecearth_spectral = False
+####################################################################################
+
+###############################   stdout and log  ##################################
+# calculate the time for the code execution
+start_time = tttt.time()
+# logging level 'DEBUG' 'INFO' 'WARNING' 'ERROR' 'CRITICAL'
+log_file = output_path + os.sep + 'history_engine_E_%d.log' % (year)
+logging.basicConfig(filename = log_file,
+                    filemode = 'w', level = logging.DEBUG,
+                    format = '%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+# measurements of each stage, summarized by HPC_config/summarize_timing.py
+timer = wizard.timing.StageTimer(wizard.timing.timing_file(log_file), dataset=dataset)
+####################################################################################
+
+# reader of each dataset
+readers = {'MERRA2' : wizard.reader.MERRA2Reader,
+           'ERAI'   : wizard.reader.ERAInterimReader,
+           'JRA55'  : wizard.reader.JRA55Reader,
+           'ECEARTH': wizard.reader.ECEarthReader,
+           }
+
+# save output datasets
+def create_netcdf(latitude, longitude, output_path, year):
+    '''
+    Create the netCDF4 file of the meridional energy transport and each component,
+    as zonal integral and at each grid point, or open it again. The months are
+    written one by one as soon as they are computed (wizard.writer).
+    '''
+    print '*******************************************************************'
+    print '*********************** create netcdf file*************************'
+    print '*******************************************************************'
+    logging.info("Start creating netcdf file for total meridional energy transport and each component.")
+    coordinates = [('latitude', latitude, 'degree_north'), ('longitude', longitude, 'degree_east')]
+    if bands:
+        coordinates.append(wizard.writer.amet_band_coordinate(bands))
+    data_writer = wizard.writer.RecordWriter(output_path + os.sep + 'AMET_%s_model_engine_%d_E.nc' % (dataset, year), 'month',
+                                             coordinates,
+                                             'Monthly mean meridional energy transport and each component (%s)' % (dataset))
+    # zonal integral and each grid point
+    for name, long_name in wizard.writer.amet_components:
+        data_writer.variable(name, ('latitude',), 'tera watt', long_name, dtype=np.float64)
+        data_writer.variable(name + '_point', ('latitude','longitude'), 'tera watt', long_name + ' at each grid point',
+                             dtype=output_precision, least_significant_digit=output_digits)
+    data_writer.variable('uc', ('latitude','longitude'), 'm/s', 'zonal barotropic correction wind')
+    data_writer.variable('vc', ('latitude','longitude'), 'm/s', 'meridional barotropic correction wind')
+    sector_names = [name for name, definition in sectors]
+    wizard.writer.amet_sector_variables(data_writer, sector_names)
+    if bands:
+        wizard.writer.amet_band_variables(data_writer, bands)
+    if mean2int:
+        for suffix, description in (('_mean2int', 'from the vertical integral of monthly mean fields'),
+                                    ('_difference', 'difference between int2mean and mean2int')):
+            for name, long_name in wizard.writer.amet_components:
+                data_writer.variable(name + suffix, ('latitude',), 'tera watt', long_name + ' ' + description,
+                                     dtype=np.float64)
+                data_writer.variable(name + suffix + '_point', ('latitude','longitude'), 'tera watt',
+                                     long_name + ' at each grid point ' + description,
+                                     dtype=output_precision, least_significant_digit=output_digits)
+            wizard.writer.amet_sector_variables(data_writer, sector_names, suffix)
+        data_writer.variable('uc_mean2int', ('latitude','longitude'), 'm/s',
+                             'zonal barotropic correction wind from the vertical integral of monthly mean fields')
+        data_writer.variable('vc_mean2int', ('latitude','longitude'), 'm/s',
+                             'meridional barotropic correction wind from the vertical integral of monthly mean fields')
+    print "Create netcdf file successfully"
+    logging.info("The netcdf file for the total meridional energy transport and each component is ready!!")
+
+    return data_writer
+
+def create_daily_netcdf(latitude, longitude, output_path, year):
+    '''
+    Create the netCDF4 file of the daily meridional energy transport and each
+    component, as zonal integral and optionally at each grid point, or open it
+    again. The days are written one by one as soon as they are computed.
+    '''
+    logging.info("Start creating netcdf file for the daily meridional energy transport and each component.")
+    daily_writer = wizard.writer.RecordWriter(output_path + os.sep + 'AMET_%s_model_engine_%d_E_daily.nc' % (dataset, year), 'day',
+                                              [('latitude', latitude, 'degree_north'), ('longitude', longitude, 'degree_east')],
+                                              'Daily mean meridional energy transport and each component (%s), '
+                                              'with the %s mass budget correction' % (dataset, daily), time_chunk=31)
+    for name, long_name in wizard.writer.amet_components:
+        daily_writer.variable(name, ('latitude',), 'tera watt', long_name, dtype=np.float64)
+        if daily_point:
+            daily_writer.variable(name + '_point', ('latitude','longitude'), 'tera watt', long_name + ' at each grid point',
+                                  dtype=output_precision, least_significant_digit=output_digits)
+    wizard.writer.amet_sector_variables(daily_writer, [name for name, definition in sectors])
+    if daily_point and daily == 'daily':
+        daily_writer.variable('uc', ('latitude','longitude'), 'm/s', 'zonal barotropic correction wind')
+        daily_writer.variable('vc', ('latitude','longitude'), 'm/s', 'meridional barotropic correction wind')
+    logging.info("The netcdf file for the daily meridional energy transport and each component is ready!!")
+
+    return daily_writer
+
+# the daily file is created with the first day, once the coordinates are known
+daily_writer = None
+
+def write_day(month, day, result):
+    '''
+    Write the results of the engine for a day of the month (from 1) to the daily
+    netCDF4 file, with the day of the year as record.
+    '''
+    global daily_writer
+    with timer.stage('write', year=year, month=month, day=day):
+        if daily_writer is None:
+            daily_writer = create_daily_netcdf(reader.latitude, reader.longitude, output_path, year)
+        fields = {}
+        for name, long_name in wizard.writer.amet_components:
+            fields[name] = result[name]
+            if daily_point:
+                fields[name + '_point'] = result[name + '_point']
+            for sector, definition in sectors:
+                fields[name + '_' + sector] = result[name + '_' + sector]
+        if daily_point and daily == 'daily':
+            fields['uc'] = result['uc']
+            fields['vc'] = result['vc']
+        day_of_year = datetime.date(year, int(month), int(day)).timetuple().tm_yday
+        daily_writer.write(day_of_year - 1, day_of_year, **fields)
+
+def write_month(data_writer, month, result):
+    '''
+    Write the results of the engine for a month (from 1) to the netCDF4 file.
+    '''
+    fields = dict(uc = result['uc'], vc = result['vc'])
+    suffixes = ['']
+    if mean2int:
+        fields['uc_mean2int'] = result['uc_mean2int']
+        fields['vc_mean2int'] = result['vc_mean2int']
+        suffixes += ['_mean2int', '_difference']
+    if bands:
+        for name, long_name in wizard.writer.amet_components:
+            fields[name + '_band'] = result[name + '_band']
+    for suffix in suffixes:
+        for name, long_name in wizard.writer.amet_components:
+            fields[name + suffix] = result[name + suffix]
+            fields[name + suffix + '_point'] = result[name + suffix + '_point']
+            for sector, definition in sectors:
+                fields[name + suffix + '_' + sector] = result[name + suffix + '_' + sector]
+    data_writer.write(month - 1, month, **fields)
+
+if __name__=="__main__":
+    if dataset == 'JRA55':
+        reader = readers[dataset](datapath[dataset], g=constant['g'])
+    elif dataset == 'ECEARTH':
+        reader = readers[dataset](datapath[dataset], spectral=ecearth_spectral)
+    else:
+        reader = readers[dataset](datapath[dataset])
+    engine = wizard.engine.AMETEngine(reader, constant, dtype=precision, snapshot_path=snapshot_path,
+                                      timer=timer, mean2int=mean2int, sectors=sectors,
+                                      bands=bands, daily_correction=(daily == 'daily'),
+                                      correction=correction)
+    data_writer = None
+    for month in np.arange(1, 13):
+        print "Start the computation of AMET for %s %d (y) - %d (m)" % (dataset, year, month)
+        logging.info("Start the computation of AMET for %s %d (y) - %d (m)" % (dataset, year, month))
+        if daily is None:
+            result = engine.month(year, month)
+        else:
+            # each day is written as soon as it is known
+            result = engine.month(year, month, daily=lambda day, day_result: write_day(month, day, day_result))
+        # the coordinates are known after the first block is read
+        with timer.stage('write', year=year, month=month):
+            if data_writer is None:
+                data_writer = create_netcdf(reader.latitude, reader.longitude, output_path, year)
+            write_month(data_writer, month, result)
+    data_writer.close()
+    if daily_writer is not None:
+        daily_writer.close()
+    print "Create netcdf file successfully"
+    logging.info("The generation of netcdf files for the total meridional energy transport and each component is complete!!")
+    print 'The full pipeline of the quantification of meridional energy transport in the atmosphere is accomplished!'
+    logging.info("The full pipeline of the quantification of meridional energy transport in the atmosphere is accomplished!")
+    elapsed_time = tttt.time() - start_time
+    print elapsed_time
+    logging.info("The elapsed time for the computation is %f s" % (elapsed_time))
@@ -36,7 +36,8 @@ variables       : Absolute Temperature              T         [K]
 		          Geopotential 	                    gz        [m2/s2]
 Caveat!!	    : The dataset is for the entire globe from -90N - 90N.
                   The model uses TL511 spectral resolution with N256 Gaussian Grid.
-                  For postprocessing, the spectral fields will be converted to grid.
+                  For postprocessing, the spectral fields will be converted to grid,
+                  either in memory (spectral = True) or by cdo sp2gpl beforehand.
                   The spatial resolution of Gaussian grid is 512 (lat) x 1024 (lon)
                   It uses hybrid vertical levels and has 91 vertical levels.
                   The simulation starts from 00:00:00 01-01-1979.
@@ -71,6 +72,10 @@ matplotlib.use('Agg')
 import matplotlib.pyplot as plt
 #import iris
 import pygrib
+# add the root of the toolkit to the search path for the shared kernels
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, os.pardir))
+import wizard.gribindex
+import wizard.spectral
 
 ##########################################################################
 ###########################   Units vacabulory   #########################
@@ -145,6 +150,10 @@ start_time = tttt.time()
 ####################################################################################
 ################################   Input zone  #####################################
 datapath = '/projects/0/blueactn/reanalysis/temp/'
+# the spectral fields of ICMSH are transformed to the Gaussian grid in memory
+# (wizard.spectral), then datapath is the output of the model and the conversion
+# by cdo sp2gpl is not needed, False if ICMSH is converted to the grid already
+spectral = True
 # time of the data, which concerns with the name of input
 line_in = sys.stdin.readline()
 file_name = int(line_in)
@@ -173,16 +182,14 @@ logging.basicConfig(filename = output_path + os.sep + 'history.log',
 
 def var_key_retrive(file_time):
     # use pygrib to read the grib files
-    print "##########################################################################"
-    print "# Due to the characteristic of GRIB file, it is highly efficient to read #"
-    print "# messages monotonically! Thus, for the sake of processing time,         #"
-    print "#                  PLEASE DON'T RETRIVE BACKWARD!                        #"
-    print "##########################################################################"
+    # the messages are decoded directly from their byte offset in the GRIB files
+    # which is given by the message index (wizard.gribindex), hence they can be
+    # retrieved in any order
 
     print "Start retrieving datasets ICMSHECE and ICMGGECE for the time %d" % (file_time)
     logging.info("Start retrieving variables T,q,u,v,sp,gz for from ICMSHECE and ICMGGECE for the time %d" % (file_time))
-    ICMSHECE = pygrib.open(datapath + os.sep + 'ICMSHECE3+%d' % (file_time))
-    ICMGGECE = pygrib.open(datapath + os.sep + 'ICMGGECE3+%d' % (file_time))
+    ICMSHECE = wizard.gribindex.MessageIndex(datapath + os.sep + 'ICMSHECE3+%d' % (file_time))
+    ICMGGECE = wizard.gribindex.MessageIndex(datapath + os.sep + 'ICMGGECE3+%d' % (file_time))
     print "Retrieving datasets successfully and return the key!"
     # extract the basic information about the dataset
     num_message_SH = ICMSHECE.messages
@@ -523,6 +530,8 @@ if __name__=="__main__":
     ###############################################################################
     ###  extract variables and calculate the vertical integrated zonal integral ###
     ###############################################################################
+    # the Legendre functions of the spectral transform are computed once
+    transform = None
     # create a message iterator
     index_SH = 2
     index_GG = 1 # the first message is already read
@@ -531,6 +540,19 @@ if __name__=="__main__":
         ######       Get all the variables - spectral field      #######
         ################################################################
         # for the variables on the spectral fields
+        if spectral:
+            # all the levels of each field in a single transform
+            fields = ICMSHECE.values(np.arange(index_SH, index_SH + 4*Dim_level))
+            if transform is None:
+                transform = wizard.spectral.SpectralTransform(wizard.spectral.truncation(fields),
+                                                              wizard.spectral.gaussian_latitudes(len(latitude)),
+                                                              len(longitude))
+            u[:] = transform.grid(fields[:Dim_level])
+            v[:] = transform.grid(fields[Dim_level:2*Dim_level])
+            T[:] = transform.grid(fields[2*Dim_level:3*Dim_level])
+            gz[:] = transform.grid(fields[3*Dim_level:])
+            del fields
+            index_SH = index_SH + 4*Dim_level
         while (index_SH <= (92+i*num_SH_per)):
             key_u = ICMSHECE.message(index_SH)
             u[index_SH-2-i*num_SH_per,:,:] = key_u.values
@@ -50,6 +50,9 @@ matplotlib.use('Agg')
 import matplotlib.pyplot as plt
 import iris
 import pygrib
+# add the root of the toolkit to the search path for the shared kernels
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, os.pardir))
+import wizard.divergence
 
 ##########################################################################
 ###########################   Units vacabulory   #########################
@@ -301,27 +304,11 @@ def mass_correction(u,v,q,sp,dp,days):
     moisture_flux_u_int = np.sum(moisture_flux_u,1)
     moisture_flux_v_int = np.sum(moisture_flux_v,1)
     # calculate the divergence of moisture flux
-    div_moisture_flux_u = np.zeros((days,len(latitude),len(longitude)),dtype = float)
-    div_moisture_flux_v = np.zeros((days,len(latitude),len(longitude)),dtype = float)
     ######################## Attnention to the coordinate and symbol #######################
     # zonal moisture flux divergence
-    for i in np.arange(len(latitude)):
-        for j in np.arange(len(longitude)):
-            # the longitude could be from 0 to 360 or -180 to 180, but the index remains the same
-            if j == 0:
-                div_moisture_flux_u[:,i,j] = (moisture_flux_u_int[:,i,j+1] - moisture_flux_u_int[:,i,-1]) / (2 * dx[i])
-            elif j == (len(longitude)-1) :
-                div_moisture_flux_u[:,i,j] = (moisture_flux_u_int[:,i,0] - moisture_flux_u_int[:,i,j-1]) / (2 * dx[i])
-            else:
-                div_moisture_flux_u[:,i,j] = (moisture_flux_u_int[:,i,j+1] - moisture_flux_u_int[:,i,j-1]) / (2 * dx[i])
+    div_moisture_flux_u = wizard.divergence.zonal(moisture_flux_u_int, dx)
     # meridional moisture flux divergence
-    for i in np.arange(len(latitude)):
-        if i == 0:
-            div_moisture_flux_v[:,i,:] = -(moisture_flux_v_int[:,i+1,:] - moisture_flux_v_int[:,i,:]) / (2 * dy)
-        elif i == (len(latitude)-1):
-            div_moisture_flux_v[:,i,:] = -(moisture_flux_v_int[:,i,:] - moisture_flux_v_int[:,i-1,:]) / (2 * dy)
-        else:
-            div_moisture_flux_v[:,i,:] = -(moisture_flux_v_int[:,i+1,:] - moisture_flux_v_int[:,i-1,:]) / (2 * dy)
+    div_moisture_flux_v = wizard.divergence.meridional(moisture_flux_v_int, dy, descending=True)
     print 'The calculation of divergent verically integrated moisture flux is finished !!'
 
     # calculate evaporation minus precipitation
@@ -346,27 +333,11 @@ def mass_correction(u,v,q,sp,dp,days):
     mass_flux_u_int = np.sum(mass_flux_u,1)
     mass_flux_v_int = np.sum(mass_flux_v,1)
     # calculate the divergence of moisture flux
-    div_mass_flux_u = np.zeros((days,len(latitude),len(longitude)),dtype = float)
-    div_mass_flux_v = np.zeros((days,len(latitude),len(longitude)),dtype = float)
     # zonal mass flux divergence
     # zonal moisture flux divergence
-    for i in np.arange(len(latitude)):
-        for j in np.arange(len(longitude)):
-            # the longitude could be from 0 to 360 or -180 to 180, but the index remains the same
-            if j == 0:
-                div_mass_flux_u[:,i,j] = (mass_flux_u_int[:,i,j+1] - mass_flux_u_int[:,i,-1]) / (2 * dx[i])
-            elif j == (len(longitude)-1) :
-                div_mass_flux_u[:,i,j] = (mass_flux_u_int[:,i,0] - mass_flux_u_int[:,i,j-1]) / (2 * dx[i])
-            else:
-                div_mass_flux_u[:,i,j] = (mass_flux_u_int[:,i,j+1] - mass_flux_u_int[:,i,j-1]) / (2 * dx[i])
+    div_mass_flux_u = wizard.divergence.zonal(mass_flux_u_int, dx)
     # meridional mass flux divergence
-    for i in np.arange(len(latitude)):
-        if i == 0:
-            div_mass_flux_v[:,i,:] = -(mass_flux_v_int[:,i+1,:] - mass_flux_v_int[:,i,:]) / (2 * dy)
-        elif i == (len(latitude)-1):
-            div_mass_flux_v[:,i,:] = -(mass_flux_v_int[:,i,:] - mass_flux_v_int[:,i-1,:]) / (2 * dy)
-        else:
-            div_mass_flux_v[:,i,:] = -(mass_flux_v_int[:,i+1,:] - mass_flux_v_int[:,i-1,:]) / (2 * dy)
+    div_mass_flux_v = wizard.divergence.meridional(mass_flux_v_int, dy, descending=True)
     print 'The calculation of divergent verically integrated mass flux is finished !!'
     mass_residual = np.zeros((len(latitude),len(longitude)),dtype = float)
     mass_residual = sp_tendency + constant['g'] * (np.mean(div_mass_flux_u,0) + np.mean(div_mass_flux_v,0)) - constant['g'] * E_P
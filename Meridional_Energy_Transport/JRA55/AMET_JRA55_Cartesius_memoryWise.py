@@ -4,7 +4,7 @@ Copyright Netherlands eScience Center
 Function        : Quantify atmospheric meridional energy transport (JRA55)(Cartesius,memory wise)
 Author          : Yang Liu
 Date            : 2017.11.27
-Last Update     : 2018.1.3
+Last Update     : 2018.2.23
 Description     : The code aims to calculate the atmospheric meridional energy
                   transport based on atmospheric reanalysis dataset JRA 55 from
                   JMA (Japan). The complete procedure includes the calculation of
@@ -51,6 +51,17 @@ matplotlib.use('Agg')
 import matplotlib.pyplot as plt
 import iris
 import pygrib
+# add the root of the toolkit to the search path for the shared kernels
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, os.pardir))
+import wizard.checkpoint
+import wizard.decoder
+import wizard.planner
+import wizard.prefetch
+import wizard.gribindex
+import wizard.surfacecache
+import wizard.writer
+import wizard.sector
+import wizard.divergence
 
 ##########################################################################
 ###########################   Units vacabulory   #########################
@@ -127,6 +138,39 @@ start_year = 1979
 end_year = 2013
 # specify output path for the netCDF4 file
 output_path = '/home/lwc16308/reanalysis/JRA55/output'
+# the results of each month and the message counter of the surface fields are saved
+# as checkpoint, a job which is stopped can resume from the last completed month
+checkpoint_path = output_path + os.sep + 'checkpoint'
+resume = True
+# the byte offset of each GRIB message is indexed once and the index is saved
+# in this directory (None to save it next to the GRIB files)
+grib_index_path = None
+# the five 3D variables are stored in separate files, which are decoded concurrently
+# by one worker process each, straight into buffers in shared memory
+fields_3D = ['007_hgt', '011_tmp', '033_ugrd', '034_vgrd', '051_spfh']
+# the surface pressure of a whole year is decoded once into a memory-mapped file
+# on the local disk of the node, which is shared by all the jobs on the node
+surface_cache_path = '/scratch-local/%s/JRA55_surface' % (os.environ.get('USER', 'JRA55'))
+# memory available for the 3D fields of a chunk [bytes], the chunk of time steps is
+# the largest one which fits (wizard.planner), e.g. 48 GB gives chunks of 30 time steps
+# (7.5 days) with prefetch, which keeps 12 + 5 fields, or 43 time steps (10.75 days)
+# without prefetch, which keeps 12 fields
+memory_limit = 48 * 1024**3
+# number of 3D fields (time, level, lat, lon) alive at the same time: the five decoded
+# variables, dp and the fluxes with their temporaries in the energy divergence
+fields_4D = 12
+# the next chunk is decoded in the background while the current one is processed,
+# which takes a second set of buffers for the five decoded variables
+prefetch = True
+# the output is written as compressed netCDF4, each month as soon as it is computed
+# precision of the fields at each grid point in the output file, np.float32 or np.float64
+output_precision = np.float32
+# number of decimal digits [TW] kept in the fields at each grid point, e.g. 4 for 0.1 GW
+# the quantization makes the file much smaller, None keeps all the digits
+output_digits = None
+# sectors of the integrals besides the zonal integral, as (name, (west, east)) in
+# degrees east or (name, mask (lat, lon)) for a basin (wizard.sector)
+sectors = wizard.sector.sectors
 ####################################################################################
 # ==============================  Initial test   ==================================
 # benchmark datasets for basic dimensions
@@ -147,202 +191,51 @@ logging.basicConfig(filename = output_path + os.sep + 'history_E.log',
                     format = '%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 ####################################################################################
 
-def var_3D_key_retrieve(datapath, year, month, days, counter_surface, rounds):
+def var_3D_key_retrieve(datapath, year, month, days, counter_surface, start, stop, buffer_set=0):
     '''
     This module extracts the variables for mass correction and the computation of AMET.
+    The fields of the time steps from start to stop (excluded) of the month are
+    returned, the chunk is planned by wizard.planner and may span the 10-day files.
+    The GRIB files are opened through their message index (wizard.gribindex), so
+    each message is decoded directly from its byte offset. The surface pressure from
+    counter_surface on is a slice of the memory-mapped year (wizard.surfacecache).
+    The five 3D variables are decoded concurrently by the decoder (wizard.decoder)
+    into the given set of its shared buffers, the returned fields are views of these
+    buffers.
     '''
     print '*******************************************************************'
     print '****************** open pygrib files - 3D fields ******************'
     print '*******************************************************************'
     print "Start retrieving datasets %d (y) - %s (m) for 3D variables" % (year,namelist_month[month-1])
     logging.info("Start retrieving 3D variables T,q,u,v,z for from %d (y) - %s (m)" % (year,namelist_month[month-1]))
-    # get the base message counter for surface pressure
-    counter_accumulate = counter_surface - 1
-    if rounds == 0:
-        # for the first 10 days
-        key_10d_hgt = pygrib.open(datapath + os.sep + 'jra%d' % (year) + os.sep + 'anl_mdl.007_hgt.reg_tl319.%d%s0100_%d%s1018' %(year,namelist_month[month-1],year,namelist_month[month-1]))
-        key_10d_tmp = pygrib.open(datapath + os.sep + 'jra%d' % (year) + os.sep + 'anl_mdl.011_tmp.reg_tl319.%d%s0100_%d%s1018' %(year,namelist_month[month-1],year,namelist_month[month-1]))
-        key_10d_ugrd = pygrib.open(datapath + os.sep + 'jra%d' % (year) + os.sep + 'anl_mdl.033_ugrd.reg_tl319.%d%s0100_%d%s1018' %(year,namelist_month[month-1],year,namelist_month[month-1]))
-        key_10d_vgrd = pygrib.open(datapath + os.sep + 'jra%d' % (year) + os.sep + 'anl_mdl.034_vgrd.reg_tl319.%d%s0100_%d%s1018' %(year,namelist_month[month-1],year,namelist_month[month-1]))
-        key_10d_spfh = pygrib.open(datapath + os.sep + 'jra%d' % (year) + os.sep + 'anl_mdl.051_spfh.reg_tl319.%d%s0100_%d%s1018' %(year,namelist_month[month-1],year,namelist_month[month-1]))
-        key_sp_year = pygrib.open(datapath + os.sep + 'jra_surf' + os.sep + 'anl_surf.001_pres.reg_tl319.%d010100_%d123118' %(year,year))
-        print "Retrieving datasets successfully and return the variable key (1-10)!"
-        logging.info("Retrieving 3D variables from %d (y) - %s (m) successfully (1-10)!" % (year,namelist_month[month-1]))
-        print '*******************************************************************'
-        print '********************** extract target fields **********************'
-        print '*******************************************************************'
-        print "Extract target fields!"
-        logging.info("Extract target fields")
-        z = np.zeros((40,60,Dim_latitude,Dim_longitude),dtype = float)
-        T = np.zeros((40,60,Dim_latitude,Dim_longitude),dtype = float)
-        u = np.zeros((40,60,Dim_latitude,Dim_longitude),dtype = float)
-        v = np.zeros((40,60,Dim_latitude,Dim_longitude),dtype = float)
-        q = np.zeros((40,60,Dim_latitude,Dim_longitude),dtype = float)
-        sp = np.zeros((40,Dim_latitude,Dim_longitude),dtype = float)
-        # get the target fields
-        # the first ten days
-        # reset counters
-        counter_time = 0
-        counter_lev = 0
-        counter_message = 1
-        while (counter_message <= 60*4*10):
-            # take the key
-            key_z = key_10d_hgt.message(counter_message)
-            key_T = key_10d_tmp.message(counter_message)
-            key_u = key_10d_ugrd.message(counter_message)
-            key_v = key_10d_vgrd.message(counter_message)
-            key_q = key_10d_spfh.message(counter_message)
-            # 60 levels (0-59)
-            if counter_lev == 60:
-                counter_lev = 0
-                counter_time = counter_time + 1
-            # take the values
-            z[counter_time,counter_lev,:,:] = key_z.values
-            T[counter_time,counter_lev,:,:] = key_T.values
-            u[counter_time,counter_lev,:,:] = key_u.values
-            v[counter_time,counter_lev,:,:] = key_v.values
-            q[counter_time,counter_lev,:,:] = key_q.values
-            # push the counter
-            counter_lev = counter_lev + 1
-            counter_message = counter_message + 1
-        # for surface pressure
-        counter_time = 0
-        while (counter_surface <= counter_accumulate + 10*4):
-            key_sp = key_sp_year.message(counter_surface)
-            sp[counter_time,:,:] = key_sp.values
-            counter_time = counter_time + 1
-            counter_surface = counter_surface + 1
-        # close all the grib files
-        key_10d_hgt.close()
-        key_10d_tmp.close()
-        key_10d_ugrd.close()
-        key_10d_vgrd.close()
-        key_10d_spfh.close()
-        key_sp_year.close()
-
-    # for the second 10 days
-    elif rounds == 1:
-        key_20d_hgt = pygrib.open(datapath + os.sep + 'jra%d' % (year) + os.sep + 'anl_mdl.007_hgt.reg_tl319.%d%s1100_%d%s2018' %(year,namelist_month[month-1],year,namelist_month[month-1]))
-        key_20d_tmp = pygrib.open(datapath + os.sep + 'jra%d' % (year) + os.sep + 'anl_mdl.011_tmp.reg_tl319.%d%s1100_%d%s2018' %(year,namelist_month[month-1],year,namelist_month[month-1]))
-        key_20d_ugrd = pygrib.open(datapath + os.sep + 'jra%d' % (year) + os.sep + 'anl_mdl.033_ugrd.reg_tl319.%d%s1100_%d%s2018' %(year,namelist_month[month-1],year,namelist_month[month-1]))
-        key_20d_vgrd = pygrib.open(datapath + os.sep + 'jra%d' % (year) + os.sep + 'anl_mdl.034_vgrd.reg_tl319.%d%s1100_%d%s2018' %(year,namelist_month[month-1],year,namelist_month[month-1]))
-        key_20d_spfh = pygrib.open(datapath + os.sep + 'jra%d' % (year) + os.sep + 'anl_mdl.051_spfh.reg_tl319.%d%s1100_%d%s2018' %(year,namelist_month[month-1],year,namelist_month[month-1]))
-        key_sp_year = pygrib.open(datapath + os.sep + 'jra_surf' + os.sep + 'anl_surf.001_pres.reg_tl319.%d010100_%d123118' %(year,year))
-        print "Retrieving datasets successfully and return the variable key (10-20)!"
-        logging.info("Retrieving 3D variables from %d (y) - %s (m) successfully (10-20)!" % (year,namelist_month[month-1]))
-        print '*******************************************************************'
-        print '********************** extract target fields **********************'
-        print '*******************************************************************'
-        print "Extract target fields!"
-        logging.info("Extract target fields")
-        z = np.zeros((40,60,Dim_latitude,Dim_longitude),dtype = float)
-        T = np.zeros((40,60,Dim_latitude,Dim_longitude),dtype = float)
-        u = np.zeros((40,60,Dim_latitude,Dim_longitude),dtype = float)
-        v = np.zeros((40,60,Dim_latitude,Dim_longitude),dtype = float)
-        q = np.zeros((40,60,Dim_latitude,Dim_longitude),dtype = float)
-        sp = np.zeros((40,Dim_latitude,Dim_longitude),dtype = float)
-        # the second ten days
-        # reset counters
-        counter_time = 0
-        counter_lev = 0
-        counter_message = 1
-        while (counter_message <= 60*4*10):
-            # take the key
-            key_z = key_20d_hgt.message(counter_message)
-            key_T = key_20d_tmp.message(counter_message)
-            key_u = key_20d_ugrd.message(counter_message)
-            key_v = key_20d_vgrd.message(counter_message)
-            key_q = key_20d_spfh.message(counter_message)
-            # 60 levels (0-59)
-            if counter_lev == 60:
-                counter_lev = 0
-                counter_time = counter_time + 1
-            # take the values
-            z[counter_time,counter_lev,:,:] = key_z.values
-            T[counter_time,counter_lev,:,:] = key_T.values
-            u[counter_time,counter_lev,:,:] = key_u.values
-            v[counter_time,counter_lev,:,:] = key_v.values
-            q[counter_time,counter_lev,:,:] = key_q.values
-            # push the counter
-            counter_lev = counter_lev + 1
-            counter_message = counter_message + 1
-        # for surface pressure
-        counter_time = 0
-        while (counter_surface <= counter_accumulate + 10*4):
-            key_sp = key_sp_year.message(counter_surface)
-            sp[counter_time,:,:] = key_sp.values
-            counter_time = counter_time + 1
-            counter_surface = counter_surface + 1
-        # close all the grib files
-        key_20d_hgt.close()
-        key_20d_tmp.close()
-        key_20d_ugrd.close()
-        key_20d_vgrd.close()
-        key_20d_spfh.close()
-        key_sp_year.close()
-
-    # for the rest of days
-    else:
-        # deal with the changing last day of each month
-        key_30d_hgt = pygrib.open(datapath + os.sep + 'jra%d' % (year) + os.sep + 'anl_mdl.007_hgt.reg_tl319.%d%s2100_%d%s%d18' %(year,namelist_month[month-1],year,namelist_month[month-1],days))
-        key_30d_tmp = pygrib.open(datapath + os.sep + 'jra%d' % (year) + os.sep + 'anl_mdl.011_tmp.reg_tl319.%d%s2100_%d%s%d18' %(year,namelist_month[month-1],year,namelist_month[month-1],days))
-        key_30d_ugrd = pygrib.open(datapath + os.sep + 'jra%d' % (year) + os.sep + 'anl_mdl.033_ugrd.reg_tl319.%d%s2100_%d%s%d18' %(year,namelist_month[month-1],year,namelist_month[month-1],days))
-        key_30d_vgrd = pygrib.open(datapath + os.sep + 'jra%d' % (year) + os.sep + 'anl_mdl.034_vgrd.reg_tl319.%d%s2100_%d%s%d18' %(year,namelist_month[month-1],year,namelist_month[month-1],days))
-        key_30d_spfh = pygrib.open(datapath + os.sep + 'jra%d' % (year) + os.sep + 'anl_mdl.051_spfh.reg_tl319.%d%s2100_%d%s%d18' %(year,namelist_month[month-1],year,namelist_month[month-1],days))
-        key_sp_year = pygrib.open(datapath + os.sep + 'jra_surf' + os.sep + 'anl_surf.001_pres.reg_tl319.%d010100_%d123118' %(year,year))
-        print "Retrieving datasets successfully and return the variable key!"
-        logging.info("Retrieving 3D variables from %d (y) - %s (m) successfully!" % (year,namelist_month[month-1]))
-        print '*******************************************************************'
-        print '********************** extract target fields **********************'
-        print '*******************************************************************'
-        print "Extract target fields!"
-        logging.info("Extract target fields")
-        # reserve space for target fields
-        z = np.zeros(((days-20)*4,60,Dim_latitude,Dim_longitude),dtype = float)
-        T = np.zeros(((days-20)*4,60,Dim_latitude,Dim_longitude),dtype = float)
-        u = np.zeros(((days-20)*4,60,Dim_latitude,Dim_longitude),dtype = float)
-        v = np.zeros(((days-20)*4,60,Dim_latitude,Dim_longitude),dtype = float)
-        q = np.zeros(((days-20)*4,60,Dim_latitude,Dim_longitude),dtype = float)
-        sp = np.zeros(((days-20)*4,Dim_latitude,Dim_longitude),dtype = float)
-        # the rest of days
-        # reset counters
-        counter_time = 0
-        counter_lev = 0
-        counter_message = 1
-        while (counter_message <= 60*4*(days-20)):
-            # take the key
-            key_z = key_30d_hgt.message(counter_message)
-            key_T = key_30d_tmp.message(counter_message)
-            key_u = key_30d_ugrd.message(counter_message)
-            key_v = key_30d_vgrd.message(counter_message)
-            key_q = key_30d_spfh.message(counter_message)
-            # 60 levels (0-59)
-            if counter_lev == 60:
-                counter_lev = 0
-                counter_time = counter_time + 1
-                # take the values
-            z[counter_time,counter_lev,:,:] = key_z.values
-            T[counter_time,counter_lev,:,:] = key_T.values
-            u[counter_time,counter_lev,:,:] = key_u.values
-            v[counter_time,counter_lev,:,:] = key_v.values
-            q[counter_time,counter_lev,:,:] = key_q.values
-            # push the counter
-            counter_lev = counter_lev + 1
-            counter_message = counter_message + 1
-        # for surface pressure
-        counter_time = 0
-        while (counter_surface <= counter_accumulate + (days-20)*4):
-            key_sp = key_sp_year.message(counter_surface)
-            sp[counter_time,:,:] = key_sp.values
-            counter_time = counter_time + 1
-            counter_surface = counter_surface + 1
-        # close all the grib files
-        key_30d_hgt.close()
-        key_30d_tmp.close()
-        key_30d_ugrd.close()
-        key_30d_vgrd.close()
-        key_30d_spfh.close()
-        key_sp_year.close()
+    # each file covers 10 days (the last one the rest of days), 4 time steps per day
+    # name of the files and the time steps (from, to) of the month in each file
+    period_3D = ['%d%s0100_%d%s1018' % (year,namelist_month[month-1],year,namelist_month[month-1]),
+                 '%d%s1100_%d%s2018' % (year,namelist_month[month-1],year,namelist_month[month-1]),
+                 '%d%s2100_%d%s%d18' % (year,namelist_month[month-1],year,namelist_month[month-1],days)]
+    spans_3D = [(0, 40), (40, 80), (80, days*4)]
+    print '*******************************************************************'
+    print '********************** extract target fields **********************'
+    print '*******************************************************************'
+    print "Extract target fields of day %d - %d!" % (start/4+1, stop/4)
+    logging.info("Extract target fields of day %d - %d" % (start/4+1, stop/4))
+    for n, part_start, part_stop in wizard.planner.split(start, stop, spans_3D):
+        # the files of the five variables, which are decoded concurrently
+        files_3D = [datapath + os.sep + 'jra%d' % (year) + os.sep + 'anl_mdl.%s.reg_tl319.%s' %(field,period_3D[n])
+                    for field in fields_3D]
+        # decode the five variables concurrently into the shared buffers
+        # the messages are ordered by time and then by the 60 levels (0-59)
+        # the part of the chunk in this file is placed after the parts of the previous files
+        first = (part_start - spans_3D[n][0]) * 60 + 1
+        last = (part_stop - spans_3D[n][0]) * 60
+        z, T, u, v, q = decoder.decode(files_3D, np.arange(first, last+1), (stop-start,60,Dim_latitude,Dim_longitude),
+                                       offset=(part_start - start) * 60, buffer_set=buffer_set)
+    print "Retrieving datasets successfully and return the variable key!"
+    logging.info("Retrieving 3D variables from %d (y) - %s (m) successfully!" % (year,namelist_month[month-1]))
+    # for surface pressure, a slice of the memory-mapped year
+    # counter_surface is the message number (from 1) of the first time step
+    sp = np.array(sp_year[counter_surface-1:counter_surface-1+stop-start])
+    counter_surface = counter_surface + stop - start
 
     # return all the fields
     return z, T, u, v, q, sp, counter_surface
@@ -359,27 +252,11 @@ def mass_correction_divergence(u,v,q,dp):
     # save memory
     del moisture_flux_u, moisture_flux_v
     # calculate the divergence of moisture flux
-    div_moisture_flux_u = np.zeros(moisture_flux_u_int.shape,dtype = float)
-    div_moisture_flux_v = np.zeros(moisture_flux_v_int.shape,dtype = float)
     ######################## Attnention to the coordinate and symbol #######################
     # zonal moisture flux divergence
-    for i in np.arange(len(latitude)):
-        for j in np.arange(len(longitude)):
-            # the longitude could be from 0 to 360 or -180 to 180, but the index remains the same
-            if j == 0:
-                div_moisture_flux_u[:,i,j] = (moisture_flux_u_int[:,i,j+1] - moisture_flux_u_int[:,i,-1]) / (2 * dx[i])
-            elif j == (len(longitude)-1) :
-                div_moisture_flux_u[:,i,j] = (moisture_flux_u_int[:,i,0] - moisture_flux_u_int[:,i,j-1]) / (2 * dx[i])
-            else:
-                div_moisture_flux_u[:,i,j] = (moisture_flux_u_int[:,i,j+1] - moisture_flux_u_int[:,i,j-1]) / (2 * dx[i])
+    div_moisture_flux_u = wizard.divergence.zonal(moisture_flux_u_int, dx)
     # meridional moisture flux divergence
-    for i in np.arange(len(latitude)):
-        if i == 0:
-            div_moisture_flux_v[:,i,:] = -(moisture_flux_v_int[:,i+1,:] - moisture_flux_v_int[:,i,:]) / (2 * dy)
-        elif i == (len(latitude)-1):
-            div_moisture_flux_v[:,i,:] = -(moisture_flux_v_int[:,i,:] - moisture_flux_v_int[:,i-1,:]) / (2 * dy)
-        else:
-            div_moisture_flux_v[:,i,:] = -(moisture_flux_v_int[:,i+1,:] - moisture_flux_v_int[:,i-1,:]) / (2 * dy)
+    div_moisture_flux_v = wizard.divergence.meridional(moisture_flux_v_int, dy, descending=True)
     print 'The calculation of divergent verically integrated moisture flux is finished !!'
 
     print 'Begin the calculation of divergent verically integrated mass flux.'
@@ -394,27 +271,11 @@ def mass_correction_divergence(u,v,q,dp):
     # save memory
     del mass_flux_u, mass_flux_v
     # calculate the divergence of moisture flux
-    div_mass_flux_u = np.zeros(mass_flux_u_int.shape,dtype = float)
-    div_mass_flux_v = np.zeros(mass_flux_v_int.shape,dtype = float)
     # zonal mass flux divergence
     # zonal moisture flux divergence
-    for i in np.arange(len(latitude)):
-        for j in np.arange(len(longitude)):
-            # the longitude could be from 0 to 360 or -180 to 180, but the index remains the same
-            if j == 0:
-                div_mass_flux_u[:,i,j] = (mass_flux_u_int[:,i,j+1] - mass_flux_u_int[:,i,-1]) / (2 * dx[i])
-            elif j == (len(longitude)-1) :
-                div_mass_flux_u[:,i,j] = (mass_flux_u_int[:,i,0] - mass_flux_u_int[:,i,j-1]) / (2 * dx[i])
-            else:
-                div_mass_flux_u[:,i,j] = (mass_flux_u_int[:,i,j+1] - mass_flux_u_int[:,i,j-1]) / (2 * dx[i])
+    div_mass_flux_u = wizard.divergence.zonal(mass_flux_u_int, dx)
     # meridional mass flux divergence
-    for i in np.arange(len(latitude)):
-        if i == 0:
-            div_mass_flux_v[:,i,:] = -(mass_flux_v_int[:,i+1,:] - mass_flux_v_int[:,i,:]) / (2 * dy)
-        elif i == (len(latitude)-1):
-            div_mass_flux_v[:,i,:] = -(mass_flux_v_int[:,i,:] - mass_flux_v_int[:,i-1,:]) / (2 * dy)
-        else:
-            div_mass_flux_v[:,i,:] = -(mass_flux_v_int[:,i+1,:] - mass_flux_v_int[:,i-1,:]) / (2 * dy)
+    div_mass_flux_v = wizard.divergence.meridional(mass_flux_v_int, dy, descending=True)
     print 'The calculation of divergent verically integrated mass flux is finished !!'
 
     print 'Calculate precipitable water!!'
@@ -542,117 +403,39 @@ def visualization(E_total,E_internal,E_latent,E_geopotential,E_kinetic,output_pa
     plt.close(fig5)
 
 # save output datasets
-def create_netcdf_point (meridional_E_point_pool,meridional_E_internal_point_pool,
-                         meridional_E_latent_point_pool,meridional_E_geopotential_point_pool,
-                         meridional_E_kinetic_point_pool,uc_point_pool,vc_point_pool,output_path,year):
+def create_netcdf_point(output_path, year):
+    '''
+    Create the netCDF4 file of the meridional energy transport and each component at
+    each grid point, or open it again to resume. The months are written one by one
+    as soon as they are computed (wizard.writer), compressed and in single precision.
+    '''
     print '*******************************************************************'
     print '*********************** create netcdf file*************************'
     print '*******************************************************************'
     logging.info("Start creating netcdf file for total meridional energy transport and each component at each grid point.")
-    # wrap the datasets into netcdf file
-    # 'NETCDF3_CLASSIC', 'NETCDF3_64BIT', 'NETCDF4_CLASSIC', and 'NETCDF4'
-    data_wrap = Dataset(output_path + os.sep + 'point' + os.sep + 'AMET_JRA55_model_daily_%d_E_point.nc' % (year),'w',format = 'NETCDF3_64BIT')
-    # create dimensions for netcdf data
-    month_wrap_dim = data_wrap.createDimension('month',Dim_month)
-    lat_wrap_dim = data_wrap.createDimension('latitude',Dim_latitude)
-    lon_wrap_dim = data_wrap.createDimension('longitude',Dim_longitude)
-    # create coordinate variables for 3-dimensions
-    month_wrap_var = data_wrap.createVariable('month',np.int32,('month',))
-    lat_warp_var = data_wrap.createVariable('latitude',np.float32,('latitude',))
-    lon_warp_var = data_wrap.createVariable('longitude',np.float32,('longitude',))
-    # create the actual 3-d variable
-    uc_warp_var = data_wrap.createVariable('uc',np.float32,('month','latitude','longitude'))
-    vc_warp_var = data_wrap.createVariable('vc',np.float32,('month','latitude','longitude'))
-
-    E_total_wrap_var = data_wrap.createVariable('E',np.float64,('month','latitude','longitude'))
-    E_internal_wrap_var = data_wrap.createVariable('E_cpT',np.float64,('month','latitude','longitude'))
-    E_latent_wrap_var = data_wrap.createVariable('E_Lvq',np.float64,('month','latitude','longitude'))
-    E_geopotential_wrap_var = data_wrap.createVariable('E_gz',np.float64,('month','latitude','longitude'))
-    E_kinetic_wrap_var = data_wrap.createVariable('E_uv2',np.float64,('month','latitude','longitude'))
-    # global attributes
-    data_wrap.description = 'Monthly mean meridional energy transport and each component at each grid point'
-    # variable attributes
-    lat_warp_var.units = 'degree_north'
-    lon_warp_var.units = 'degree_east'
-    uc_warp_var.units = 'm/s'
-    vc_warp_var.units = 'm/s'
-    E_total_wrap_var.units = 'tera watt'
-    E_internal_wrap_var.units = 'tera watt'
-    E_latent_wrap_var.units = 'tera watt'
-    E_geopotential_wrap_var.units = 'tera watt'
-    E_kinetic_wrap_var.units = 'tera watt'
-
-    uc_warp_var.long_name = 'zonal barotropic correction wind'
-    vc_warp_var.long_name = 'meridional barotropic correction wind'
-    E_total_wrap_var.long_name = 'atmospheric meridional energy transport'
-    E_internal_wrap_var.long_name = 'atmospheric meridional internal energy transport'
-    E_latent_wrap_var.long_name = 'atmospheric meridional latent heat transport'
-    E_geopotential_wrap_var.long_name = 'atmospheric meridional geopotential transport'
-    E_kinetic_wrap_var.long_name = 'atmospheric meridional kinetic energy transport'
-    # writing data
-    lat_warp_var[:] = latitude
-    lon_warp_var[:] = longitude
-    month_wrap_var[:] = index_month
-    uc_warp_var[:] = uc_point_pool
-    vc_warp_var[:] = vc_point_pool
-    E_total_wrap_var[:] = meridional_E_point_pool
-    E_internal_wrap_var[:] = meridional_E_internal_point_pool
-    E_latent_wrap_var[:] = meridional_E_latent_point_pool
-    E_geopotential_wrap_var[:] = meridional_E_geopotential_point_pool
-    E_kinetic_wrap_var[:] = meridional_E_kinetic_point_pool
-    # close the file
-    data_wrap.close()
+    point_writer = wizard.writer.amet_point(output_path + os.sep + 'point' + os.sep + 'AMET_JRA55_model_daily_%d_E_point.nc' % (year),
+                                            latitude, longitude, output_precision, output_digits)
     print "Create netcdf file successfully"
-    logging.info("The generation of netcdf files for the total meridional energy transport and each component on each grid point is complete!!")
+    logging.info("The netcdf file for the total meridional energy transport and each component on each grid point is ready!!")
+
+    return point_writer
 
 # save output datasets
-def create_netcdf_zonal_int (meridional_E_pool, meridional_E_internal_pool, meridional_E_latent_pool,
-                             meridional_E_geopotential_pool, meridional_E_kinetic_pool, output_path, year):
+def create_netcdf_zonal_int(output_path, year):
+    '''
+    Create the netCDF4 file of the zonal integral of meridional energy transport and
+    each component, or open it again to resume. The months are written one by one.
+    '''
     print '*******************************************************************'
     print '*********************** create netcdf file*************************'
     print '*******************************************************************'
     logging.info("Start creating netcdf files for the zonal integral of total meridional energy transport and each component.")
-    # wrap the datasets into netcdf file
-    # 'NETCDF3_CLASSIC', 'NETCDF3_64BIT', 'NETCDF4_CLASSIC', and 'NETCDF4'
-    data_wrap = Dataset(output_path + os.sep + 'zonal_int' + os.sep + 'AMET_JRA55_model_daily_%d_E_zonal_int.nc' % (year),'w',format = 'NETCDF3_64BIT')
-    # create dimensions for netcdf data
-    month_wrap_dim = data_wrap.createDimension('month',Dim_month)
-    lat_wrap_dim = data_wrap.createDimension('latitude',Dim_latitude)
-    # create coordinate variables for 3-dimensions
-    month_wrap_var = data_wrap.createVariable('month',np.int32,('month',))
-    lat_warp_var = data_wrap.createVariable('latitude',np.float32,('latitude',))
-    # create the actual 3-d variable
-    E_total_wrap_var = data_wrap.createVariable('E',np.float64,('month','latitude',))
-    E_internal_wrap_var = data_wrap.createVariable('E_cpT',np.float64,('month','latitude',))
-    E_latent_wrap_var = data_wrap.createVariable('E_Lvq',np.float64,('month','latitude',))
-    E_geopotential_wrap_var = data_wrap.createVariable('E_gz',np.float64,('month','latitude',))
-    E_kinetic_wrap_var = data_wrap.createVariable('E_uv2',np.float64,('month','latitude',))
-    # global attributes
-    data_wrap.description = 'Monthly mean zonal integral of meridional energy transport and each component'
-    # variable attributes
-    lat_warp_var.units = 'degree_north'
-    E_total_wrap_var.units = 'tera watt'
-    E_internal_wrap_var.units = 'tera watt'
-    E_latent_wrap_var.units = 'tera watt'
-    E_geopotential_wrap_var.units = 'tera watt'
-    E_kinetic_wrap_var.units = 'tera watt'
-    E_total_wrap_var.long_name = 'atmospheric meridional energy transport'
-    E_internal_wrap_var.long_name = 'atmospheric meridional internal energy transport'
-    E_latent_wrap_var.long_name = 'atmospheric meridional latent heat transport'
-    E_geopotential_wrap_var.long_name = 'atmospheric meridional geopotential transport'
-    E_kinetic_wrap_var.long_name = 'atmospheric meridional kinetic energy transport'
-    # writing data
-    lat_warp_var[:] = latitude
-    month_wrap_var[:] = index_month
-    E_total_wrap_var[:] = meridional_E_pool
-    E_internal_wrap_var[:] = meridional_E_internal_pool
-    E_latent_wrap_var[:] = meridional_E_latent_pool
-    E_geopotential_wrap_var[:] = meridional_E_geopotential_pool
-    E_kinetic_wrap_var[:] = meridional_E_kinetic_pool
-    # close the file
-    data_wrap.close()
+    zonal_writer = wizard.writer.amet_zonal_int(output_path + os.sep + 'zonal_int' + os.sep + 'AMET_JRA55_model_daily_%d_E_zonal_int.nc' % (year),
+                                                latitude, [name for name, definition in sectors])
     print "Create netcdf file successfully"
-    logging.info("The generation of netcdf files for the zonal integral of total meridional energy transport and each component is complete!!")
+    logging.info("The netcdf file for the zonal integral of total meridional energy transport and each component is ready!!")
+
+    return zonal_writer
 
 if __name__=="__main__":
     ####################################################################
@@ -673,6 +456,8 @@ if __name__=="__main__":
     Dim_level = 60
     Dim_latitude = len(latitude)
     Dim_longitude = len(longitude)
+    # weights of the sectors on the grid, for the sector integrals
+    sector_masks = wizard.sector.masks(latitude, longitude, sectors)
     Dim_month = len(index_month)
     #Dim_year = len(period)
     # calculate zonal & meridional grid size on earth
@@ -688,20 +473,44 @@ if __name__=="__main__":
     meridional_E_latent_pool = np.zeros((Dim_month,Dim_latitude),dtype = float)
     meridional_E_geopotential_pool = np.zeros((Dim_month,Dim_latitude),dtype = float)
     meridional_E_kinetic_pool = np.zeros((Dim_month,Dim_latitude),dtype = float)
-    # data pool for grid point values
-    uc_point_pool = np.zeros((Dim_month,Dim_latitude,Dim_longitude),dtype = float)
-    vc_point_pool = np.zeros((Dim_month,Dim_latitude,Dim_longitude),dtype = float)
-    meridional_E_point_pool = np.zeros((Dim_month,Dim_latitude,Dim_longitude),dtype = float)
-    meridional_E_internal_point_pool = np.zeros((Dim_month,Dim_latitude,Dim_longitude),dtype = float)
-    meridional_E_latent_point_pool = np.zeros((Dim_month,Dim_latitude,Dim_longitude),dtype = float)
-    meridional_E_geopotential_point_pool = np.zeros((Dim_month,Dim_latitude,Dim_longitude),dtype = float)
-    meridional_E_kinetic_point_pool = np.zeros((Dim_month,Dim_latitude,Dim_longitude),dtype = float)
+    # the grid point values are written to the output file month by month
+    # the largest chunk of time steps which fits in the memory, at most a month
+    if prefetch:
+        buffer_sets = 2
+    else:
+        buffer_sets = 1
+    chunk = min(wizard.planner.chunk_steps(memory_limit, Dim_level, Dim_latitude, Dim_longitude,
+                                           fields_4D + (buffer_sets - 1) * len(fields_3D)), 31*4)
+    print "The months are processed in chunks of at most %d time steps." % (chunk)
+    logging.info("The months are processed in chunks of at most %d time steps." % (chunk))
+    # shared buffers for the 3D fields of the largest chunk
+    decoder = wizard.decoder.ParallelDecoder(len(fields_3D), (chunk,Dim_level,Dim_latitude,Dim_longitude), grib_index_path,
+                                             sets=buffer_sets)
     # loop for calculation
     for i in period:
+        # surface pressure of the year (time, lat, lon), decoded at the first use
+        sp_year = wizard.surfacecache.year_field(datapath + os.sep + 'jra_surf' + os.sep + 'anl_surf.001_pres.reg_tl319.%d010100_%d123118' %(i,i),
+                                                 surface_cache_path, grib_index_path)
         # set the message counter for the extraction of surface field
         counter_surface = 1
+        # the output files, to which each month is written as soon as it is complete
+        point_writer = create_netcdf_point(output_path, i)
+        zonal_writer = create_netcdf_zonal_int(output_path, i)
         for j in index_month:
-            rounds = 0 # for the optimization of memory
+            # skip the month which is completed in a previous run
+            if resume and wizard.checkpoint.completed(checkpoint_path, i, j):
+                checkpoint = wizard.checkpoint.load(checkpoint_path, i, j)
+                meridional_E_pool[j-1,:] = checkpoint['meridional_E']
+                meridional_E_internal_pool[j-1,:] = checkpoint['meridional_E_internal']
+                meridional_E_latent_pool[j-1,:] = checkpoint['meridional_E_latent']
+                meridional_E_geopotential_pool[j-1,:] = checkpoint['meridional_E_geopotential']
+                meridional_E_kinetic_pool[j-1,:] = checkpoint['meridional_E_kinetic']
+                # the output file may be new, e.g. from a run before the monthly output
+                wizard.writer.write_amet_month(point_writer, zonal_writer, j, checkpoint, sector_masks)
+                counter_surface = int(checkpoint['counter_surface'])
+                print "Resume from the checkpoint of %d (y) - %s (m)" % (i,namelist_month[j-1])
+                logging.info("Resume from the checkpoint of %d (y) - %s (m)" % (i,namelist_month[j-1]))
+                continue
             # reset dx to benchmark
             #dx = dx_benchmark
             #dy = dy_benchmark
@@ -735,9 +544,15 @@ if __name__=="__main__":
             pool_vapor_flux_int = np.zeros((days*4,len(latitude),len(longitude)),dtype=float)
             pool_geo_flux_int = np.zeros((days*4,len(latitude),len(longitude)),dtype=float)
             pool_velocity_flux_int = np.zeros((days*4,len(latitude),len(longitude)),dtype=float)
-            for k in np.arange(3): # devide into 3 rounds
-                # extract 3D variables
-                z, T, u, v, q, sp, counter_surface = var_3D_key_retrieve(datapath, i, j, days, counter_surface,k)
+            # the month is processed in chunks of time steps which fit in the memory
+            chunks = wizard.planner.plan(days*4, chunk, align=4)
+            # the chunks alternate between the buffer sets of the decoder
+            tasks = [(datapath, i, j, days, counter_surface + start, start, stop, n % buffer_sets)
+                     for n, (start, stop) in enumerate(chunks)]
+            # extract 3D variables, the next chunk is read ahead in the background
+            for n, fields in enumerate(wizard.prefetch.read_ahead(var_3D_key_retrieve, tasks, buffer_sets)):
+                start, stop = chunks[n]
+                z, T, u, v, q, sp, counter_surface = fields
                 # calculate delta pressure of each level
                 dp = np.zeros(T.shape,dtype = float)
                 for c in np.arange(60):
@@ -749,66 +564,35 @@ if __name__=="__main__":
                 div_moisture_flux_u, div_moisture_flux_v, div_mass_flux_u, div_mass_flux_v, \
                 precipitable_water_int = mass_correction_divergence(u,v,q,dp)
                 # save output to temporary storage
-                if k == 0:
-                    q_start = q[0,:,:,:]
+                if start == 0:
+                    # the buffers of the 3D fields are reused by the next chunk
+                    q_start = q[0,:,:,:].copy()
                     sp_start = sp[0,:,:]
-                    dp_start = dp[0,:,:,:]
-                    pool_div_moisture_flux_u[:40,:,:] = div_moisture_flux_u
-                    pool_div_moisture_flux_v[:40,:,:] = div_moisture_flux_v
-                    pool_div_mass_flux_u[:40,:,:] = div_mass_flux_u
-                    pool_div_mass_flux_v[:40,:,:] = div_mass_flux_v
-                    pool_precipitable_water[:40,:,:] = precipitable_water_int
-                    pool_ps_mean[:40,:,:] = sp
-                elif k == 1:
-                    pool_div_moisture_flux_u[40:80,:,:] = div_moisture_flux_u
-                    pool_div_moisture_flux_v[40:80,:,:] = div_moisture_flux_v
-                    pool_div_mass_flux_u[40:80,:,:] = div_mass_flux_u
-                    pool_div_mass_flux_v[40:80,:,:] = div_mass_flux_v
-                    pool_precipitable_water[40:80,:,:] = precipitable_water_int
-                    pool_ps_mean[40:80,:,:] = sp
-                else:
-                    q_end = q[-1,:,:,:]
+                    dp_start = dp[0,:,:,:].copy()
+                if stop == days*4:
+                    q_end = q[-1,:,:,:].copy()
                     sp_end = sp[-1,:,:]
-                    dp_end = dp[-1,:,:,:]
-                    pool_div_moisture_flux_u[80:,:,:] = div_moisture_flux_u
-                    pool_div_moisture_flux_v[80:,:,:] = div_moisture_flux_v
-                    pool_div_mass_flux_u[80:,:,:] = div_mass_flux_u
-                    pool_div_mass_flux_v[80:,:,:] = div_mass_flux_v
-                    pool_precipitable_water[80:,:,:] = precipitable_water_int
-                    pool_ps_mean[80:,:,:] = sp
+                    dp_end = dp[-1,:,:,:].copy()
+                pool_div_moisture_flux_u[start:stop,:,:] = div_moisture_flux_u
+                pool_div_moisture_flux_v[start:stop,:,:] = div_moisture_flux_v
+                pool_div_mass_flux_u[start:stop,:,:] = div_mass_flux_u
+                pool_div_mass_flux_v[start:stop,:,:] = div_mass_flux_v
+                pool_precipitable_water[start:stop,:,:] = precipitable_water_int
+                pool_ps_mean[start:stop,:,:] = sp
                 ####################################################################
                 ######               Meridional Energy Transport             #######
                 ####################################################################
                 internal_flux_int, latent_flux_int, geopotential_flux_int, kinetic_flux_int,\
                 heat_flux_int, vapor_flux_int, geo_flux_int, velocity_flux_int,\
                 = meridional_energy_transport_divergence(z,T,u,v,q,dp)
-                if k == 0:
-                    pool_internal_flux_int[:40,:,:] = internal_flux_int
-                    pool_latent_flux_int[:40,:,:] = latent_flux_int
-                    pool_geopotential_flux_int[:40,:,:] = geopotential_flux_int
-                    pool_kinetic_flux_int[:40,:,:] = kinetic_flux_int
-                    pool_heat_flux_int[:40,:,:] = heat_flux_int
-                    pool_vapor_flux_int[:40,:,:] = vapor_flux_int
-                    pool_geo_flux_int[:40,:,:] = geo_flux_int
-                    pool_velocity_flux_int[:40,:,:] = velocity_flux_int
-                elif k == 1:
-                    pool_internal_flux_int[40:80,:,:] = internal_flux_int
-                    pool_latent_flux_int[40:80,:,:] = latent_flux_int
-                    pool_geopotential_flux_int[40:80,:,:] = geopotential_flux_int
-                    pool_kinetic_flux_int[40:80,:,:] = kinetic_flux_int
-                    pool_heat_flux_int[40:80,:,:] = heat_flux_int
-                    pool_vapor_flux_int[40:80,:,:] = vapor_flux_int
-                    pool_geo_flux_int[40:80,:,:] = geo_flux_int
-                    pool_velocity_flux_int[40:80,:,:] = velocity_flux_int
-                else:
-                    pool_internal_flux_int[80:,:,:] = internal_flux_int
-                    pool_latent_flux_int[80:,:,:] = latent_flux_int
-                    pool_geopotential_flux_int[80:,:,:] = geopotential_flux_int
-                    pool_kinetic_flux_int[80:,:,:] = kinetic_flux_int
-                    pool_heat_flux_int[80:,:,:] = heat_flux_int
-                    pool_vapor_flux_int[80:,:,:] = vapor_flux_int
-                    pool_geo_flux_int[80:,:,:] = geo_flux_int
-                    pool_velocity_flux_int[80:,:,:] = velocity_flux_int
+                pool_internal_flux_int[start:stop,:,:] = internal_flux_int
+                pool_latent_flux_int[start:stop,:,:] = latent_flux_int
+                pool_geopotential_flux_int[start:stop,:,:] = geopotential_flux_int
+                pool_kinetic_flux_int[start:stop,:,:] = kinetic_flux_int
+                pool_heat_flux_int[start:stop,:,:] = heat_flux_int
+                pool_vapor_flux_int[start:stop,:,:] = vapor_flux_int
+                pool_geo_flux_int[start:stop,:,:] = geo_flux_int
+                pool_velocity_flux_int[start:stop,:,:] = velocity_flux_int
             ####################################################################
             ######                     Mass Correction                   #######
             ####################################################################
@@ -905,25 +689,30 @@ if __name__=="__main__":
             meridional_E_latent_pool[j-1,:] = meridional_E_latent
             meridional_E_geopotential_pool[j-1,:] = meridional_E_geopotential
             meridional_E_kinetic_pool[j-1,:] = meridional_E_kinetic
-            # save uc and vc to the data pool
-            uc_point_pool[j-1,:,:] = uc
-            vc_point_pool[j-1,:,:] = vc
-            # save the meridional energy on each grid point to the data pool
-            meridional_E_point_pool[j-1,:,:] = meridional_E_point
-            meridional_E_internal_point_pool[j-1,:,:] = meridional_E_internal_point
-            meridional_E_latent_point_pool[j-1,:,:] = meridional_E_latent_point
-            meridional_E_geopotential_point_pool[j-1,:,:] = meridional_E_geopotential_point
-            meridional_E_kinetic_point_pool[j-1,:,:] = meridional_E_kinetic_point
+            results = dict(meridional_E = meridional_E,
+                           meridional_E_internal = meridional_E_internal,
+                           meridional_E_latent = meridional_E_latent,
+                           meridional_E_geopotential = meridional_E_geopotential,
+                           meridional_E_kinetic = meridional_E_kinetic, uc = uc, vc = vc,
+                           meridional_E_point = meridional_E_point,
+                           meridional_E_internal_point = meridional_E_internal_point,
+                           meridional_E_latent_point = meridional_E_latent_point,
+                           meridional_E_geopotential_point = meridional_E_geopotential_point,
+                           meridional_E_kinetic_point = meridional_E_kinetic_point)
+            # write this month to the netcdf files
+            wizard.writer.write_amet_month(point_writer, zonal_writer, j, results, sector_masks)
+            # save the checkpoint of this month
+            wizard.checkpoint.save(checkpoint_path, i, j, counter_surface = counter_surface, **results)
+            logging.info("Save the checkpoint of %d (y) - %s (m)" % (i,namelist_month[j-1]))
         # make plots for monthly means
         visualization(meridional_E_pool,meridional_E_internal_pool,meridional_E_latent_pool,
                       meridional_E_geopotential_pool,meridional_E_kinetic_pool,output_path,i)
-        # save data as netcdf file
-        create_netcdf_zonal_int(meridional_E_pool,meridional_E_internal_pool,
-                                meridional_E_latent_pool,meridional_E_geopotential_pool,
-                                meridional_E_kinetic_pool,output_path,i)
-        create_netcdf_point(meridional_E_point_pool,meridional_E_internal_point_pool,
-                            meridional_E_latent_point_pool,meridional_E_geopotential_point_pool,
-                            meridional_E_kinetic_point_pool,uc_point_pool,vc_point_pool,output_path,i)
+        # all the months are in the netcdf files
+        point_writer.close()
+        zonal_writer.close()
+        print "Create netcdf file successfully"
+        logging.info("The generation of netcdf files for the total meridional energy transport and each component is complete!!")
+    decoder.close()
     print 'Computation of meridional energy transport on model level for JRA55 is complete!!!'
     print 'The output is in sleep, safe and sound!!!'
     logging.info("The full pipeline of the quantification of meridional energy transport in the atmosphere is accomplished!")
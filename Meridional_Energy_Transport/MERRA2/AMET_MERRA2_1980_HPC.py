@@ -45,6 +45,9 @@ import matplotlib
 # generate images without having a window appear
 matplotlib.use('Agg')
 import matplotlib.pyplot as plt
+# add the root of the toolkit to the search path for the shared kernels
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, os.pardir))
+import wizard.divergence
 
 ##########################################################################
 ###########################   Units vacabulory   #########################
@@ -245,28 +248,12 @@ def mass_correction_divergence(var_key):
     moisture_flux_u_int = np.sum(moisture_flux_u,1)
     moisture_flux_v_int = np.sum(moisture_flux_v,1)
     # calculate the divergence of moisture flux
-    div_moisture_flux_u = np.zeros((len(time),len(latitude),len(longitude)),dtype = float)
-    div_moisture_flux_v = np.zeros((len(time),len(latitude),len(longitude)),dtype = float)
     ######################## Attnention to the coordinate and symbol #######################
     # zonal moisture flux divergence
-    for i in np.arange(len(latitude)):
-        for j in np.arange(len(longitude)):
-            # the longitude could be from 0 to 360 or -180 to 180, but the index remains the same
-            if j == 0:
-                div_moisture_flux_u[:,i,j] = (moisture_flux_u_int[:,i,j+1] - moisture_flux_u_int[:,i,-1]) / (2 * dx[i])
-            elif j == (len(longitude)-1) :
-                div_moisture_flux_u[:,i,j] = (moisture_flux_u_int[:,i,0] - moisture_flux_u_int[:,i,j-1]) / (2 * dx[i])
-            else:
-                div_moisture_flux_u[:,i,j] = (moisture_flux_u_int[:,i,j+1] - moisture_flux_u_int[:,i,j-1]) / (2 * dx[i])
+    div_moisture_flux_u = wizard.divergence.zonal(moisture_flux_u_int, dx)
     # meridional moisture flux divergence
     # the latitude is from -90S to 90N
-    for i in np.arange(len(latitude)):
-        if i == 0:
-            div_moisture_flux_v[:,i,:] = (moisture_flux_v_int[:,i+1,:] - moisture_flux_v_int[:,i,:]) / (2 * dy)
-        elif i == (len(latitude)-1):
-            div_moisture_flux_v[:,i,:] = (moisture_flux_v_int[:,i,:] - moisture_flux_v_int[:,i-1,:]) / (2 * dy)
-        else:
-            div_moisture_flux_v[:,i,:] = (moisture_flux_v_int[:,i+1,:] - moisture_flux_v_int[:,i-1,:]) / (2 * dy)
+    div_moisture_flux_v = wizard.divergence.meridional(moisture_flux_v_int, dy)
     # take the daily mean
     div_moisture_flux_u_mean = np.mean(div_moisture_flux_u,0)
     div_moisture_flux_v_mean = np.mean(div_moisture_flux_v,0)
@@ -280,26 +267,10 @@ def mass_correction_divergence(var_key):
     mass_flux_u_int = np.sum(mass_flux_u,1)
     mass_flux_v_int = np.sum(mass_flux_v,1)
     # calculate the divergence of moisture flux
-    div_mass_flux_u = np.zeros((len(time),len(latitude),len(longitude)),dtype = float)
-    div_mass_flux_v = np.zeros((len(time),len(latitude),len(longitude)),dtype = float)
     # zonal mass flux divergence
-    for i in np.arange(len(latitude)):
-        for j in np.arange(len(longitude)):
-            # the longitude could be from 0 to 360 or -180 to 180, but the index remains the same
-            if j == 0:
-                div_mass_flux_u[:,i,j] = (mass_flux_u_int[:,i,j+1] - mass_flux_u_int[:,i,-1]) / (2 * dx[i])
-            elif j == (len(longitude)-1) :
-                div_mass_flux_u[:,i,j] = (mass_flux_u_int[:,i,0] - mass_flux_u_int[:,i,j-1]) / (2 * dx[i])
-            else:
-                div_mass_flux_u[:,i,j] = (mass_flux_u_int[:,i,j+1] - mass_flux_u_int[:,i,j-1]) / (2 * dx[i])
+    div_mass_flux_u = wizard.divergence.zonal(mass_flux_u_int, dx)
     # meridional mass flux divergence
-    for i in np.arange(len(latitude)):
-        if i == 0:
-            div_mass_flux_v[:,i,:] = (mass_flux_v_int[:,i+1,:] - mass_flux_v_int[:,i,:]) / (2 * dy)
-        elif i == (len(latitude)-1):
-            div_mass_flux_v[:,i,:] = (mass_flux_v_int[:,i,:] - mass_flux_v_int[:,i-1,:]) / (2 * dy)
-        else:
-            div_mass_flux_v[:,i,:] = (mass_flux_v_int[:,i+1,:] - mass_flux_v_int[:,i-1,:]) / (2 * dy)
+    div_mass_flux_v = wizard.divergence.meridional(mass_flux_v_int, dy)
     # take the daily mean
     div_mass_flux_u_mean = np.mean(div_mass_flux_u,0)
     div_mass_flux_v_mean = np.mean(div_mass_flux_v,0)
@@ -4,13 +4,15 @@ Copyright Netherlands eScience Center
 Function        : Quantify atmospheric meridional energy transport (MERRA2)(Cartesius customised)
 Author          : Yang Liu
 Date            : 2017.11.15
-Last Update     : 2018.1.3
+Last Update     : 2018.2.23
 Description     : The code aims to calculate the atmospheric meridional energy
                   transport based on atmospheric reanalysis dataset MERRA II
                   from NASA. The complete procedure includes the calculation of
                   geopotential on model levels, and the mass budget correction.
                   The procedure is generic and is able to adapt any atmospheric
                   reanalysis datasets, with some changes.
+                  The wall time, CPU time and peak memory of each stage are written as
+                  JSON lines next to the log (wizard.timing).
 Return Value    : NetCFD4 data file
 Dependencies    : os, time, numpy, netCDF4, sys, matplotlib
 variables       : Absolute Temperature              T         [K]
@@ -33,6 +35,9 @@ Caveat!!	    : The dataset is the complete dataset of MERRA2 from 20N - 90N.
                   Due to the structure of the dataset, the mass budget correction are split into
                   two parts: 1. Quantify tendency terms in month loop
                              2. Quantify divergence terms in day loop
+                  The states at the edges of the adjacent months for the tendency terms
+                  are taken from the boundary snapshot store, so the months and years
+                  can run as independent jobs.
 """
 import numpy as np
 import time as tttt
@@ -41,10 +46,25 @@ import os
 import platform
 import sys
 import logging
+import calendar
 import matplotlib
 # generate images without having a window appear
 matplotlib.use('Agg')
 import matplotlib.pyplot as plt
+# add the root of the toolkit to the search path for the shared kernels
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, os.pardir))
+import wizard.cache
+import wizard.checkpoint
+import wizard.coordinate
+import wizard.divergence
+import wizard.executor
+import wizard.flux
+import wizard.geopotential
+import wizard.snapshot
+import wizard.summation
+import wizard.timing
+import wizard.sector
+import wizard.writer
 
 ##########################################################################
 ###########################   Units vacabulory   #########################
@@ -116,7 +136,13 @@ B = B[::-1]
 ################################   Input zone  ######################################
 #get input from shell
 # this aims for running serial program with one node on Cartesius
-line_in = sys.stdin.readline()
+# with the argument --jobs <number of years>, the number of year-jobs which fit on
+# the node is printed instead, for the job script (job_AMET_MERRA2.sh)
+count_jobs = len(sys.argv) > 2 and sys.argv[1] == '--jobs'
+if count_jobs:
+    line_in = '0'
+else:
+    line_in = sys.stdin.readline()
 # specify data path
 #datapath = 'F:\DataBase\ERA_Interim\Subdaily'
 datapath = '/projects/0/blueactn/reanalysis/MERRA2/subdaily'
@@ -131,6 +157,56 @@ output_path = '/projects/0/blueactn/reanalysis/MERRA2/output'
 # benchmark datasets for basic dimensions
 benchmark_path = '/projects/0/blueactn/reanalysis/MERRA2/subdaily/merra1980/MERRA2_100.inst3_3d_asm_Nv.19801221.SUB.nc4'
 benchmark = Dataset(benchmark_path)
+# size of a 3D field of a daily file (time, level, lat, lon) as decoded (float32) [bytes]
+field_size = len(benchmark.variables['time']) * len(benchmark.variables['lev']) * \
+             len(benchmark.variables['lat']) * len(benchmark.variables['lon']) * 4
+# memory budget for the fields kept in memory [bytes]
+# each variable of a daily file is decoded only once and shared by all the stages
+# the cache holds the 3D fields of a day (T, QV, U, V), PS and PHIS
+cache_budget = 5 * field_size
+field_cache = wizard.cache.FieldCache(cache_budget)
+# precision of the energy flux arithmetic and the data pools
+# np.float64 (default) or np.float32, which halves the memory traffic
+# in single precision the vertical integrals are taken with compensated summation
+precision = np.float64
+# in single precision, compare the zonal integrals of the first day of each month
+# with the double precision path and log the differences in PW
+accuracy_check = True
+# memory needed for the computation of a single day [bytes]
+# the days of a month are computed in parallel by as many worker processes as fit in the memory
+# each worker fills its own field cache, and keeps the half level pressure and dp of the
+# day in float64 (2 x 2 fields) and a field which is being decoded
+# the vertical integrals are taken level by level, without 4D temporaries
+memory_per_worker = cache_budget + 5 * field_size
+# memory of the main process of the job: the daily data pools of a month (14 fields, 31 days)
+memory_per_job = 14 * 31 * len(benchmark.variables['lat']) * len(benchmark.variables['lon']) * \
+                 np.dtype(precision).itemsize
+if count_jobs:
+    # the number of year-jobs is taken from the same memory as the number of workers
+    print wizard.executor.job_count(memory_per_job, memory_per_worker, int(sys.argv[2]))
+    sys.exit(0)
+# the memory of the node is shared by the jobs started on it at the same time
+# (JOBS_PER_NODE, set by the job script), the main process of this job is kept aside
+jobs_per_node = int(os.environ.get('JOBS_PER_NODE', 1))
+memory_budget = wizard.executor.node_memory(jobs_per_node, memory_per_job)
+workers = wizard.executor.worker_count(memory_budget, memory_per_worker)
+# the results of each month and the state for the tendency terms of the next month
+# are saved as checkpoint, a job which is stopped can resume from the last completed month
+checkpoint_path = output_path + os.sep + 'checkpoint'
+resume = True
+# the surface pressure and precipitable water at the first and the last time step of
+# each month are kept for the tendency terms of the adjacent months
+# the store is shared by the jobs of all the years, so no month depends on another job
+snapshot_path = output_path + os.sep + 'snapshot'
+# the output is written as compressed netCDF4, each month as soon as it is computed
+# precision of the fields at each grid point in the output file, np.float32 or np.float64
+output_precision = np.float32
+# number of decimal digits [TW] kept in the fields at each grid point, e.g. 4 for 0.1 GW
+# the quantization makes the file much smaller, None keeps all the digits
+output_digits = None
+# sectors of the integrals besides the zonal integral, as (name, (west, east)) in
+# degrees east or (name, mask (lat, lon)) for a basin (wizard.sector)
+sectors = wizard.sector.sectors
 ####################################################################################
 
 ###############################   stdout and log  ##################################
@@ -140,9 +216,13 @@ start_time = tttt.time()
 # Redirect all the console output to a file
 sys.stdout = open('/projects/0/blueactn/reanalysis/MERRA2/stdout/console_E_%d.out' % (start_year),'w')
 # logging level 'DEBUG' 'INFO' 'WARNING' 'ERROR' 'CRITICAL'
-logging.basicConfig(filename = '/projects/0/blueactn/reanalysis/MERRA2/log/history_E_%d.log' % (start_year),
+log_file = '/projects/0/blueactn/reanalysis/MERRA2/log/history_E_%d.log' % (start_year)
+logging.basicConfig(filename = log_file,
                     filemode = 'w', level = logging.DEBUG,
                     format = '%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+# measurements of each stage, summarized by HPC_config/summarize_timing.py
+# the worker processes append the measurements of each day to the same file
+timer = wizard.timing.StageTimer(wizard.timing.timing_file(log_file), dataset='MERRA2')
 ####################################################################################
 
 def var_key_retrieve(datapath, year, month, day):
@@ -168,162 +248,106 @@ def var_key_retrieve(datapath, year, month, day):
     logging.info("Retrieving variables for from %d (y) - %s (m) - %s (d) successfully!" % (year,namelist_month[month-1],namelist_day[day]))
     return var_key
 
-def mass_correction_tendency(datapath,year,month,var_start,var_end,var_last,days):
+def boundary_state(datapath, year, month, edge):
+    '''
+    This module reads the state (surface pressure and precipitable water) at the
+    first ('first') or the last ('last') time step of the given month, which is
+    not in the boundary snapshot store yet. Only this time step is read, and the
+    state is saved in the store (wizard.snapshot) for the other months and jobs.
+    '''
+    if edge == 'first':
+        day = 0
+        index = 0
+    else:
+        day = calendar.monthrange(year, month)[1] - 1
+        index = -1
+    var_key = var_key_retrieve(datapath, year, month, day)
+    ps = field_cache.get(var_key, 'PS', (index,))
+    q = field_cache.get(var_key, 'QV', (index,))
+    dp_level = wizard.coordinate.HybridLevel(A*100, B, ps).dp
+    moisture = np.sum((q * dp_level), 0) / constant['g']
+    field_cache.release(var_key)
+    var_key.close()
+    wizard.snapshot.save(snapshot_path, year, month, edge, ps, moisture)
+
+    return ps, moisture
+
+def mass_correction_tendency(datapath,year,month,state_start,state_end,days):
     '''
     This module deals with all the tendency terms in mass correction.
     These tendency terms include:
     moisture tendency in E-P
     surface pressure tendency in mass residual
+    The states (surface pressure and precipitable water) at the first and the last
+    time step of the current month are given by state_start and state_end. The
+    states at the last time step of the last month and at the first time step of
+    the next month are taken from the boundary snapshot store (wizard.snapshot).
     '''
     logging.info("Start calculating the tendency terms for mass budget correction in %d (y) - %s (m) " % (year,namelist_month[month-1]))
     print "Start calculating the tendency terms for mass budget correction in %d (y) - %s (m)" % (year,namelist_month[month-1])
-    # the options are specifically for the calculation of tendency during mass budget correction
-    # for the calculation of tendency, exception should be made due to the time dependency
-    if month == 12:
-        year_next = year + 1
-        if year_next < 1992:
-            datapath_next = datapath + os.sep + 'merra%d' % (year_next) + os.sep + 'MERRA2_100.inst3_3d_asm_Nv.%d0101.SUB.nc4' % (year_next) # month-1+1
-        elif year_next < 2001:
-            datapath_next = datapath + os.sep + 'merra%d' % (year_next) + os.sep + 'MERRA2_200.inst3_3d_asm_Nv.%d0101.SUB.nc4' % (year_next) # month-1+1
-        elif year_next < 2011:
-            datapath_next = datapath + os.sep + 'merra%d' % (year_next) + os.sep + 'MERRA2_300.inst3_3d_asm_Nv.%d0101.SUB.nc4' % (year_next) # month-1+1
-        else:
-            datapath_next = datapath + os.sep + 'merra%d' % (year_next) + os.sep + 'MERRA2_400.inst3_3d_asm_Nv.%d0101.SUB.nc4' % (year_next) # month-1+1
-    else:
-        if year < 1992:
-            datapath_next = datapath + os.sep + 'merra%d' % (year) + os.sep + 'MERRA2_100.inst3_3d_asm_Nv.%d%s01.SUB.nc4' % (year,namelist_month[month]) # month-1+1
-        elif year < 2001:
-            datapath_next = datapath + os.sep + 'merra%d' % (year) + os.sep + 'MERRA2_200.inst3_3d_asm_Nv.%d%s01.SUB.nc4' % (year,namelist_month[month]) # month-1+1
-        elif year < 2011:
-            datapath_next = datapath + os.sep + 'merra%d' % (year) + os.sep + 'MERRA2_300.inst3_3d_asm_Nv.%d%s01.SUB.nc4' % (year,namelist_month[month]) # month-1+1
-        else:
-            datapath_next = datapath + os.sep + 'merra%d' % (year) + os.sep + 'MERRA2_400.inst3_3d_asm_Nv.%d%s01.SUB.nc4' % (year,namelist_month[month]) # month-1+1
-    # get the variable key
-    var_next = Dataset(datapath_next)
-    # extract data
-    # surface pressure (8,361,576)
-    ps_last = var_last.variables['PS'][-1,:,:] # the last day of last month at 21:00
-    ps_start = var_start.variables['PS'][0,:,:] # the first day of current month at 00:00
-    ps_end = var_end.variables['PS'][-1,:,:] # the last day of current month at 21:00
-    ps_next = var_next.variables['PS'][0,:,:] # the first day of next month at 00:00
-    # specific Humidity (8,72,361,576)
-    q_last = var_last.variables['QV'][-1,:,:,:] # the naming rule is the same as above
-    q_start = var_start.variables['QV'][0,:,:,:]
-    q_end = var_end.variables['QV'][-1,:,:,:]
-    q_next = var_next.variables['QV'][0,:,:,:]
-    # calculate the index of pressure levels
-    index_level = np.arange(len(level))
-    # calculate pressure depth
-    dp_level_last = np.zeros((len(level),len(latitude),len(longitude)),dtype = float) # last day of the last month
-    dp_level_start = np.zeros((len(level),len(latitude),len(longitude)),dtype = float) # start of the current month
-    dp_level_end = np.zeros((len(level),len(latitude),len(longitude)),dtype = float) # end of the current month
-    dp_level_next = np.zeros((len(level),len(latitude),len(longitude)),dtype = float) # first day of the next month
-    # use matrix A and B to calculate dp based on half pressure level
-    for i in index_level:
-        dp_level_last[i,:,:] = (A[i+1]*100 + B[i+1] * ps_last) - (A[i]*100 + B[i] * ps_last)
-        dp_level_start[i,:,:] = (A[i+1]*100 + B[i+1] * ps_start) - (A[i]*100 + B[i] * ps_start)
-        dp_level_end[i,:,:] = (A[i+1]*100 + B[i+1] * ps_end) - (A[i]*100 + B[i] * ps_end)
-        dp_level_next[i,:,:] = (A[i+1]*100 + B[i+1] * ps_next) - (A[i]*100 + B[i] * ps_next)
-    # calculte the precipitable water tendency and take the vertical integral
-    moisture_last = np.sum((q_last * dp_level_last), 0) # last day of the last month
-    moisture_start = np.sum((q_start * dp_level_start), 0) # start of the current month
-    moisture_end = np.sum((q_end * dp_level_end), 0) # end of the current month
-    moisture_next = np.sum((q_next * dp_level_next), 0) # first day of the next month
-    # compute the moisture tendency (one day has 86400s)
-    moisture_tendency = ((moisture_end + moisture_next) / 2 - (moisture_last + moisture_start) / 2) / (len(days)*86400) / constant['g']
-    # calculate the surface pressure tendency
-    ps_tendency = ((ps_end + ps_next) / 2 - (ps_last + ps_start) / 2 ) / (len(days)*86400)
+    # the states of the current month are saved for the adjacent months
+    wizard.snapshot.save(snapshot_path, year, month, 'first', *state_start)
+    wizard.snapshot.save(snapshot_path, year, month, 'last', *state_end)
+    # for the calculation of tendency, the states of the adjacent months are needed
+    state_last, state_next = wizard.snapshot.neighbours(snapshot_path, year, month)
+    if state_last is None:
+        # the last day of last month at 21:00
+        year_last, month_last = wizard.snapshot.previous_month(year, month)
+        state_last = boundary_state(datapath, year_last, month_last, 'last')
+    if state_next is None:
+        # the first day of next month at 00:00
+        year_next, month_next = wizard.snapshot.next_month(year, month)
+        state_next = boundary_state(datapath, year_next, month_next, 'first')
+    # compute the moisture tendency and the surface pressure tendency (one day has 86400s)
+    ps_tendency, moisture_tendency = wizard.snapshot.tendency(state_last, state_start, state_end,
+                                                              state_next, len(days)*86400)
     logging.info("Finish calculating the moisture tendency and surface pressure tendency")
     print "Finish calculating the moisture tendency and surface pressure tendency"
 
     return moisture_tendency, ps_tendency
 
 
-def mass_correction_divergence(var_key):
+def mass_correction_divergence(var_key, pressure):
     '''
     This module deals with all the divergence terms in mass correction.
     These divergence terms include:
     divergence of moisture flux
     divergence of mass flux
+    The pressure coordinate of the day is given by pressure (HybridLevel).
     '''
     # extract variables
     print "Start extracting variables for mass correction."
-    q = var_key.variables['QV'][:]
-    ps = var_key.variables['PS'][:]
-    u = var_key.variables['U'][:]
-    v = var_key.variables['V'][:]
+    q = field_cache.get(var_key, 'QV')
+    ps = pressure.ps
+    u = field_cache.get(var_key, 'U')
+    v = field_cache.get(var_key, 'V')
     print 'Extracting variables successfully!'
     logging.info("Extracting variables successfully!")
 
-    print 'Begin the calculation of divergent verically integrated moisture flux.'
-    # calculate the index of pressure levels
-    index_level = np.arange(len(level))
-    # calculate the delta pressure
-    dp_level = np.zeros((len(time),len(level),len(latitude),len(longitude)),dtype = float)
-    for i in index_level:
-        dp_level[:,i,:,:] =  (A[i+1]*100 + B[i+1] * ps) - (A[i]*100 + B[i] * ps)
-    # calculte the mean moisture flux for a certain month
-    moisture_flux_u = u * q * dp_level / constant['g']
-    moisture_flux_v = v * q * dp_level / constant['g']
-    # take the vertical integral
-    moisture_flux_u_int = np.sum(moisture_flux_u,1)
-    moisture_flux_v_int = np.sum(moisture_flux_v,1)
+    print 'Begin the calculation of divergent verically integrated moisture flux and mass flux.'
+    # the delta pressure
+    dp_level = pressure.dp
+    # take the vertical integrals in a single pass through the levels, so no 4D
+    # product (e.g. u * q * dp) is created
+    moisture_flux_u_int, moisture_flux_v_int, mass_flux_u_int, mass_flux_v_int, \
+    precipitable_water_int = wizard.flux.mass_flux_int(q, u, v, dp_level, constant)
     # calculate the divergence of moisture flux
-    div_moisture_flux_u = np.zeros((len(time),len(latitude),len(longitude)),dtype = float)
-    div_moisture_flux_v = np.zeros((len(time),len(latitude),len(longitude)),dtype = float)
     ######################## Attnention to the coordinate and symbol #######################
     # zonal moisture flux divergence
-    for i in np.arange(len(latitude)):
-        for j in np.arange(len(longitude)):
-            # the longitude could be from 0 to 360 or -180 to 180, but the index remains the same
-            if j == 0:
-                div_moisture_flux_u[:,i,j] = (moisture_flux_u_int[:,i,j+1] - moisture_flux_u_int[:,i,-1]) / (2 * dx[i])
-            elif j == (len(longitude)-1) :
-                div_moisture_flux_u[:,i,j] = (moisture_flux_u_int[:,i,0] - moisture_flux_u_int[:,i,j-1]) / (2 * dx[i])
-            else:
-                div_moisture_flux_u[:,i,j] = (moisture_flux_u_int[:,i,j+1] - moisture_flux_u_int[:,i,j-1]) / (2 * dx[i])
+    div_moisture_flux_u = wizard.divergence.zonal(moisture_flux_u_int, dx)
     # meridional moisture flux divergence
     # the latitude is from -90S to 90N
-    for i in np.arange(len(latitude)):
-        if i == 0:
-            div_moisture_flux_v[:,i,:] = (moisture_flux_v_int[:,i+1,:] - moisture_flux_v_int[:,i,:]) / (2 * dy)
-        elif i == (len(latitude)-1):
-            div_moisture_flux_v[:,i,:] = (moisture_flux_v_int[:,i,:] - moisture_flux_v_int[:,i-1,:]) / (2 * dy)
-        else:
-            div_moisture_flux_v[:,i,:] = (moisture_flux_v_int[:,i+1,:] - moisture_flux_v_int[:,i-1,:]) / (2 * dy)
+    div_moisture_flux_v = wizard.divergence.meridional(moisture_flux_v_int, dy)
     # take the daily mean
     div_moisture_flux_u_mean = np.mean(div_moisture_flux_u,0)
     div_moisture_flux_v_mean = np.mean(div_moisture_flux_v,0)
     print 'The calculation of divergent verically integrated moisture flux is finished !!'
 
-    print 'Begin the calculation of divergent verically integrated mass flux.'
-    # calculate the mass flux
-    mass_flux_u = u * dp_level / constant['g']
-    mass_flux_v = v * dp_level / constant['g']
-    # take the vertical integral
-    mass_flux_u_int = np.sum(mass_flux_u,1)
-    mass_flux_v_int = np.sum(mass_flux_v,1)
-    # calculate the divergence of moisture flux
-    div_mass_flux_u = np.zeros((len(time),len(latitude),len(longitude)),dtype = float)
-    div_mass_flux_v = np.zeros((len(time),len(latitude),len(longitude)),dtype = float)
+    # calculate the divergence of mass flux
     # zonal mass flux divergence
-    for i in np.arange(len(latitude)):
-        for j in np.arange(len(longitude)):
-            # the longitude could be from 0 to 360 or -180 to 180, but the index remains the same
-            if j == 0:
-                div_mass_flux_u[:,i,j] = (mass_flux_u_int[:,i,j+1] - mass_flux_u_int[:,i,-1]) / (2 * dx[i])
-            elif j == (len(longitude)-1) :
-                div_mass_flux_u[:,i,j] = (mass_flux_u_int[:,i,0] - mass_flux_u_int[:,i,j-1]) / (2 * dx[i])
-            else:
-                div_mass_flux_u[:,i,j] = (mass_flux_u_int[:,i,j+1] - mass_flux_u_int[:,i,j-1]) / (2 * dx[i])
+    div_mass_flux_u = wizard.divergence.zonal(mass_flux_u_int, dx)
     # meridional mass flux divergence
-    for i in np.arange(len(latitude)):
-        if i == 0:
-            div_mass_flux_v[:,i,:] = (mass_flux_v_int[:,i+1,:] - mass_flux_v_int[:,i,:]) / (2 * dy)
-        elif i == (len(latitude)-1):
-            div_mass_flux_v[:,i,:] = (mass_flux_v_int[:,i,:] - mass_flux_v_int[:,i-1,:]) / (2 * dy)
-        else:
-            div_mass_flux_v[:,i,:] = (mass_flux_v_int[:,i+1,:] - mass_flux_v_int[:,i-1,:]) / (2 * dy)
+    div_mass_flux_v = wizard.divergence.meridional(mass_flux_v_int, dy)
     # take the daily mean
     div_mass_flux_u_mean = np.mean(div_mass_flux_u,0)
     div_mass_flux_v_mean = np.mean(div_mass_flux_v,0)
@@ -332,79 +356,37 @@ def mass_correction_divergence(var_key):
     # now calculate other variables
     # take the mean surface pressure value
     ps_mean = np.mean(ps,0)
-    # calculate precipitable water
-    precipitable_water = q * dp_level / constant['g']
-    precipitable_water_mean = np.mean(np.sum(precipitable_water,1),0)
+    # the precipitable water is integrated together with the fluxes
+    precipitable_water_mean = np.mean(precipitable_water_int,0)
+    # the states at the first and the last time step of the day, for the tendency terms
+    state_first = (ps[0], precipitable_water_int[0])
+    state_last = (ps[-1], precipitable_water_int[-1])
 
     return div_moisture_flux_u_mean, div_moisture_flux_v_mean, div_mass_flux_u_mean,\
-           div_mass_flux_v_mean, precipitable_water_mean, ps_mean
+           div_mass_flux_v_mean, precipitable_water_mean, ps_mean, state_first, state_last
 
-def calc_geopotential(var_key):
+def calc_geopotential(var_key, pressure):
     '''
     This module aims to calculate the geopotential based on surface geopotential.
     The procedure and relevant equations can be found in ECMWF IFS 9220.
     See equation 2.20 - 2.23 .
+    The pressure coordinate of the day is given by pressure (HybridLevel).
+    The integral is streamed from the surface to the TOA. Instead of a 4D array,
+    a generator is returned which yields the geopotential level by level, and
+    only the geopotential of the running half level is kept in memory.
     '''
     # extract variables
     print "Start extracting variables for the calculation of geopotential on model level."
-    T = var_key.variables['T'][:]
-    q = var_key.variables['QV'][:]
-    ps = var_key.variables['PS'][:]
-    z = var_key.variables['PHIS'][:]
+    T = field_cache.get(var_key, 'T')
+    q = field_cache.get(var_key, 'QV')
+    z = field_cache.get(var_key, 'PHIS')
     print 'Extracting variables successfully!'
     logging.info("Extracting variables successfully!")
-    print 'Start calculating geopotential on model level'
-    # calculate the surface pressure
     # the unit of pressure here is Pa!!!
-    # define the half level pressure matrix
-    p_half_plus = np.zeros((len(time),len(level),len(latitude),len(longitude)),dtype = float)
-    p_half_minus = np.zeros((len(time),len(level),len(latitude),len(longitude)),dtype = float)
-    # calculate the index of pressure levels
-    index_level = np.arange(len(level))
-    # calculate the pressure at each half level
-    for i in index_level:
-        p_half_plus[:,i,:,:] = A[i+1]*100 + B[i+1] * ps
-        p_half_minus[:,i,:,:] = A[i]*100 + B[i] * ps
-    # calculate full pressure level
-    #level_full = (p_half_plus + p_half_minus) / 2
-    # compute the moist temperature (virtual temperature)
-    Tv = T * (1 + (constant['R_vap'] / constant['R_dry'] - 1) * q)
-    # initialize the first half level geopotential
-    gz_half = np.zeros((len(time),len(latitude),len(longitude)),dtype =float)
-    # initialize the full level geopotential
-    gz = np.zeros((len(time),len(level),len(latitude),len(longitude)),dtype = float)
-    # Calculate the geopotential at each level
-    # The integral should be taken from surface level to the TOA
-    for i in index_level:
-        # reverse the index to make it from surface to the TOA
-        i_inverse = len(level) -1 - i
-        # the ln(p_plus/p_minus) is calculated, alpha is defined
-        # an exception lies in the TOA
-        # see equation 2.23 in ECMWF IFS 9220
-        if i_inverse == 0:
-            ln_p = np.log(p_half_plus[:,i_inverse,:,:]/10)
-            alpha = np.log(2)
-        else:
-            ln_p = np.log(p_half_plus[:,i_inverse,:,:]/p_half_minus[:,i_inverse,:,:])
-            delta_p = p_half_plus[:,i_inverse,:,:] - p_half_minus[:,i_inverse,:,:]
-            alpha = 1 - p_half_minus[:,i_inverse,:,:] / delta_p * ln_p
-        # calculate the geopotential of the full level (exclude surface geopotential)
-        # see equation 2.22 in ECMWF IFS 9220
-        gz_full = gz_half + alpha * constant['R_dry'] * Tv[:,i_inverse,:,:]
-        # add surface geopotential to the full level
-        # see equation 2.21 in ECMWF IFS 9220
-        gz[:,i_inverse,:,:] = z + gz_full
-        # renew the half level geopotential for next loop step (from p_half_minus level to p_half_plus level)
-        # see equation 2.20 in ECMWF IFS 9220
-        gz_half = gz_half + ln_p * constant['R_dry'] * Tv[:,i_inverse,:,:]
-    print '*******************************************************************'
-    print "***Computation of geopotential on each pressure level is finished**"
-    print '*******************************************************************'
-    logging.info("Computation of geopotential on model level is finished!")
-
-    return gz
+    # the geopotential of each level is computed when it is requested by the energy flux
+    return wizard.geopotential.full_level(T, q, z, pressure, constant)
 
-def meridional_energy_transport(var_key, gz):
+def meridional_energy_transport(var_key, gz, pressure, dtype=np.float64):
     '''
     This module calculate the energy flux which are the componets of meridional
     energy transport in the atmosphere.
@@ -413,52 +395,41 @@ def meridional_energy_transport(var_key, gz):
     latent heat flux
     geoptential heat flux
     kinetic energy flux
+    The pressure coordinate of the day is given by pressure (HybridLevel).
+    The geopotential gz is the level by level generator from calc_geopotential.
+    The energy flux is computed in dtype, either np.float64 or np.float32.
     '''
     # extract variables
     print "Start extracting variables for the quantification of meridional energy transport."
-    T = var_key.variables['T'][:]
-    q = var_key.variables['QV'][:]
-    ps = var_key.variables['PS'][:]
-    u = var_key.variables['U'][:]
-    v = var_key.variables['V'][:]
+    T = field_cache.get(var_key, 'T')
+    q = field_cache.get(var_key, 'QV')
+    u = field_cache.get(var_key, 'U')
+    v = field_cache.get(var_key, 'V')
     print 'Extracting variables successfully!'
     logging.info("Extracting variables successfully!")
 
     print 'Start calculating meridional energy transport on model level'
-    # calculate dp based on mean value of surface pressure
-    dp_level = np.zeros((len(time),len(level),len(latitude),len(longitude)),dtype = float)
-    # calculate the index of pressure levels
-    index_level = np.arange(len(level))
-    for i in index_level:
-        dp_level[:,i,:,:] = (A[i+1]*100 + B[i+1] * ps) - (A[i]*100 + B[i] * ps)
-    # calculate each component of total energy
-    # take the vertical integral
-    # mass correction component
-    # Internal Energy cpT
-    internal_flux = constant['cp'] * v * T * dp_level / constant['g']
-    internal_flux_int = np.mean(np.sum(internal_flux,1),0)
-    # Latent heat Lq
-    latent_flux = constant['Lv'] * v * q * dp_level / constant['g']
-    latent_flux_int = np.mean(np.sum(latent_flux,1),0)
-    # geopotential gz
-    geopotential_flux = v * gz * dp_level / constant['g']
-    geopotential_flux_int = np.mean(np.sum(geopotential_flux,1),0)
-    # kinetic energy
-    kinetic_flux = v * 1/2 *(u**2 + v**2) * dp_level / constant['g']
-    kinetic_flux_int = np.mean(np.sum(kinetic_flux,1),0)
-    # variables for correction
-    # for the correction of Internal Energy cpT
-    heat_flux = constant['cp'] * T * dp_level / constant['g']
-    heat_flux_int = np.mean(np.sum(heat_flux,1),0)
-    # for the correction of Latent Heat flux Lq
-    vapor_flux = constant['Lv'] * q* dp_level / constant['g']
-    vapor_flux_int = np.mean(np.sum(vapor_flux,1),0)
-    # for the correction of Geopotential flux gz
-    geo_flux = gz * dp_level / constant['g']
-    geo_flux_int = np.mean(np.sum(geo_flux,1),0)
-    # for the correction of Kinetic Energy flux u2
-    velocity_flux = 1/2 *(u**2 + v**2) * dp_level / constant['g']
-    velocity_flux_int = np.mean(np.sum(velocity_flux,1),0)
+    # the delta pressure
+    dp_level = pressure.dp
+    # calculate each component of total energy and the variables for correction
+    # all the vertical integrals are accumulated in a single pass through the levels
+    internal_flux_int, latent_flux_int, geopotential_flux_int, kinetic_flux_int,\
+    heat_flux_int, vapor_flux_int, geo_flux_int, velocity_flux_int = \
+    wizard.flux.energy_flux_int(T, q, u, v, gz, dp_level, constant, dtype=dtype,
+                                compensated=(dtype != np.float64))
+    print '*******************************************************************'
+    print "***Computation of geopotential on each pressure level is finished**"
+    print '*******************************************************************'
+    logging.info("Computation of geopotential on model level is finished!")
+    # take the daily mean
+    internal_flux_int = np.mean(internal_flux_int,0)
+    latent_flux_int = np.mean(latent_flux_int,0)
+    geopotential_flux_int = np.mean(geopotential_flux_int,0)
+    kinetic_flux_int = np.mean(kinetic_flux_int,0)
+    heat_flux_int = np.mean(heat_flux_int,0)
+    vapor_flux_int = np.mean(vapor_flux_int,0)
+    geo_flux_int = np.mean(geo_flux_int,0)
+    velocity_flux_int = np.mean(velocity_flux_int,0)
 
     print 'Complete calculating meridional energy transport on model level'
 
@@ -553,117 +524,99 @@ def visualization(E_total,E_internal,E_latent,E_geopotential,E_kinetic,output_pa
     logging.info("The generation of plots for the total meridional energy transport and each component is complete!")
 
 # save output datasets
-def create_netcdf_point (meridional_E_point_pool,meridional_E_internal_point_pool,
-                         meridional_E_latent_point_pool,meridional_E_geopotential_point_pool,
-                         meridional_E_kinetic_point_pool,uc_point_pool,vc_point_pool,output_path,year):
+def create_netcdf_point(output_path, year):
+    '''
+    Create the netCDF4 file of the meridional energy transport and each component at
+    each grid point, or open it again to resume. The months are written one by one
+    as soon as they are computed (wizard.writer), compressed and in single precision.
+    '''
     print '*******************************************************************'
     print '*********************** create netcdf file*************************'
     print '*******************************************************************'
     logging.info("Start creating netcdf file for total meridional energy transport and each component at each grid point.")
-    # wrap the datasets into netcdf file
-    # 'NETCDF3_CLASSIC', 'NETCDF3_64BIT', 'NETCDF4_CLASSIC', and 'NETCDF4'
-    data_wrap = Dataset(output_path + os.sep + 'AMET_MERRA2_model_daily_%d_E_point.nc' % (year),'w',format = 'NETCDF3_64BIT')
-    # create dimensions for netcdf data
-    month_wrap_dim = data_wrap.createDimension('month',Dim_month)
-    lat_wrap_dim = data_wrap.createDimension('latitude',Dim_latitude)
-    lon_wrap_dim = data_wrap.createDimension('longitude',Dim_longitude)
-    # create coordinate variables for 3-dimensions
-    month_warp_var = data_wrap.createVariable('month',np.int32,('month',))
-    lat_warp_var = data_wrap.createVariable('latitude',np.float32,('latitude',))
-    lon_warp_var = data_wrap.createVariable('longitude',np.float32,('longitude',))
-    # create the actual 3-d variable
-    uc_warp_var = data_wrap.createVariable('uc',np.float32,('month','latitude','longitude'))
-    vc_warp_var = data_wrap.createVariable('vc',np.float32,('month','latitude','longitude'))
-
-    E_total_wrap_var = data_wrap.createVariable('E',np.float64,('month','latitude','longitude'))
-    E_internal_wrap_var = data_wrap.createVariable('E_cpT',np.float64,('month','latitude','longitude'))
-    E_latent_wrap_var = data_wrap.createVariable('E_Lvq',np.float64,('month','latitude','longitude'))
-    E_geopotential_wrap_var = data_wrap.createVariable('E_gz',np.float64,('month','latitude','longitude'))
-    E_kinetic_wrap_var = data_wrap.createVariable('E_uv2',np.float64,('month','latitude','longitude'))
-    # global attributes
-    data_wrap.description = 'Monthly mean meridional energy transport and each component at each grid point'
-    # variable attributes
-    lat_warp_var.units = 'degree_north'
-    lon_warp_var.units = 'degree_east'
-    uc_warp_var.units = 'm/s'
-    vc_warp_var.units = 'm/s'
-    E_total_wrap_var.units = 'tera watt'
-    E_internal_wrap_var.units = 'tera watt'
-    E_latent_wrap_var.units = 'tera watt'
-    E_geopotential_wrap_var.units = 'tera watt'
-    E_kinetic_wrap_var.units = 'tera watt'
-
-    uc_warp_var.long_name = 'zonal barotropic correction wind'
-    vc_warp_var.long_name = 'meridional barotropic correction wind'
-    E_total_wrap_var.long_name = 'atmospheric meridional energy transport'
-    E_internal_wrap_var.long_name = 'atmospheric meridional internal energy transport'
-    E_latent_wrap_var.long_name = 'atmospheric meridional latent heat transport'
-    E_geopotential_wrap_var.long_name = 'atmospheric meridional geopotential transport'
-    E_kinetic_wrap_var.long_name = 'atmospheric meridional kinetic energy transport'
-    # writing data
-    lat_warp_var[:] = latitude
-    lon_warp_var[:] = longitude
-    month_warp_var[:] = index_month
-    uc_warp_var[:] = uc_point_pool
-    vc_warp_var[:] = vc_point_pool
-    E_total_wrap_var[:] = meridional_E_point_pool
-    E_internal_wrap_var[:] = meridional_E_internal_point_pool
-    E_latent_wrap_var[:] = meridional_E_latent_point_pool
-    E_geopotential_wrap_var[:] = meridional_E_geopotential_point_pool
-    E_kinetic_wrap_var[:] = meridional_E_kinetic_point_pool
-    # close the file
-    data_wrap.close()
+    # the time series at each grid point are read by the regression, the chunks hold a year of a tile of points
+    point_writer = wizard.writer.amet_point(output_path + os.sep + 'AMET_MERRA2_model_daily_%d_E_point.nc' % (year),
+                                            latitude, longitude, output_precision, output_digits)
     print "Create netcdf file successfully"
-    logging.info("The generation of netcdf files for the total meridional energy transport and each component on each grid point is complete!!")
+    logging.info("The netcdf file for the total meridional energy transport and each component on each grid point is ready!!")
+
+    return point_writer
 
 # save output datasets
-def create_netcdf_zonal_int (meridional_E_pool, meridional_E_internal_pool, meridional_E_latent_pool,
-                             meridional_E_geopotential_pool, meridional_E_kinetic_pool, output_path, year):
+def create_netcdf_zonal_int(output_path, year):
+    '''
+    Create the netCDF4 file of the zonal integral of meridional energy transport and
+    each component, or open it again to resume. The months are written one by one.
+    '''
     print '*******************************************************************'
     print '*********************** create netcdf file*************************'
     print '*******************************************************************'
     logging.info("Start creating netcdf files for the zonal integral of total meridional energy transport and each component.")
-    # wrap the datasets into netcdf file
-    # 'NETCDF3_CLASSIC', 'NETCDF3_64BIT', 'NETCDF4_CLASSIC', and 'NETCDF4'
-    data_wrap = Dataset(output_path + os.sep + 'AMET_MERRA2_model_daily_%d_E_zonal_int.nc' % (year),'w',format = 'NETCDF3_64BIT')
-    # create dimensions for netcdf data
-    month_wrap_dim = data_wrap.createDimension('month',Dim_month)
-    lat_wrap_dim = data_wrap.createDimension('latitude',Dim_latitude)
-    # create coordinate variables for 3-dimensions
-    month_warp_var = data_wrap.createVariable('month',np.int32,('month',))
-    lat_warp_var = data_wrap.createVariable('latitude',np.float32,('latitude',))
-    # create the actual 3-d variable
-    E_total_wrap_var = data_wrap.createVariable('E',np.float64,('month','latitude'))
-    E_internal_wrap_var = data_wrap.createVariable('E_cpT',np.float64,('month','latitude'))
-    E_latent_wrap_var = data_wrap.createVariable('E_Lvq',np.float64,('month','latitude'))
-    E_geopotential_wrap_var = data_wrap.createVariable('E_gz',np.float64,('month','latitude'))
-    E_kinetic_wrap_var = data_wrap.createVariable('E_uv2',np.float64,('month','latitude'))
-    # global attributes
-    data_wrap.description = 'Monthly mean zonal integral of meridional energy transport and each component'
-    # variable attributes
-    lat_warp_var.units = 'degree_north'
-    E_total_wrap_var.units = 'tera watt'
-    E_internal_wrap_var.units = 'tera watt'
-    E_latent_wrap_var.units = 'tera watt'
-    E_geopotential_wrap_var.units = 'tera watt'
-    E_kinetic_wrap_var.units = 'tera watt'
-    E_total_wrap_var.long_name = 'atmospheric meridional energy transport'
-    E_internal_wrap_var.long_name = 'atmospheric meridional internal energy transport'
-    E_latent_wrap_var.long_name = 'atmospheric meridional latent heat transport'
-    E_geopotential_wrap_var.long_name = 'atmospheric meridional geopotential transport'
-    E_kinetic_wrap_var.long_name = 'atmospheric meridional kinetic energy transport'
-    # writing data
-    lat_warp_var[:] = latitude
-    month_warp_var[:] = index_month
-    E_total_wrap_var[:] = meridional_E_pool
-    E_internal_wrap_var[:] = meridional_E_internal_pool
-    E_latent_wrap_var[:] = meridional_E_latent_pool
-    E_geopotential_wrap_var[:] = meridional_E_geopotential_pool
-    E_kinetic_wrap_var[:] = meridional_E_kinetic_pool
-    # close the file
-    data_wrap.close()
+    zonal_writer = wizard.writer.amet_zonal_int(output_path + os.sep + 'AMET_MERRA2_model_daily_%d_E_zonal_int.nc' % (year), latitude,
+                                                [name for name, definition in sectors])
     print "Create netcdf file successfully"
-    logging.info("The generation of netcdf files for the zonal integral of total meridional energy transport and each component is complete!!")
+    logging.info("The netcdf file for the zonal integral of total meridional energy transport and each component is ready!!")
+
+    return zonal_writer
+
+def daily_computation(date):
+    '''
+    This module does all the computation for a single daily file, which is
+    independent of the other days of the month. These include:
+    divergence terms and other terms in mass correction
+    geopotential
+    energy flux terms in meridional energy transport
+    It is the work of a single worker process (wizard.executor), so it takes
+    the date (year, month, day) and opens the file itself.
+    The day index, a tuple of the daily mean fields and the states (ps, precipitable
+    water) at the first and the last time step of the day are returned.
+    '''
+    year, month, day = date
+    labels = dict(year=year, month=month, day=day+1)
+    # get the key of each variable
+    with timer.stage('retrieve', **labels):
+        var_key = var_key_retrieve(datapath,year,month,day)
+        # the pressure coordinate of the day is shared by all the stages
+        # the unit of A is hPa, which should be converted to Pa
+        pressure = wizard.coordinate.HybridLevel(A*100, B, field_cache.get(var_key, 'PS'))
+    ####################################################################
+    ######                   Mass Correction                     #######
+    ####################################################################
+    # calculate divergence terms and other terms in mass correction
+    with timer.stage('divergence', **labels):
+        div_moisture_flux_u, div_moisture_flux_v, div_mass_flux_u, div_mass_flux_v, \
+        precipitable_water, ps_mean, state_first, state_last = mass_correction_divergence(var_key, pressure)
+    ####################################################################
+    ######                       Geopotential                    #######
+    ####################################################################
+    # calculate the geopotential
+    # it is streamed level by level into the energy flux below, the generator does
+    # no work until then, hence the integral is measured as part of the flux stage
+    gz = calc_geopotential(var_key, pressure)
+    ####################################################################
+    ######               Meridional Energy Transport             #######
+    ####################################################################
+    # calculate the energy flux terms in meridional energy Transport
+    with timer.stage('flux', **labels):
+        internal_flux_int, latent_flux_int, geopotential_flux_int, kinetic_flux_int,\
+        heat_flux_int, vapor_flux_int, geo_flux_int, velocity_flux_int = meridional_energy_transport(var_key, gz, pressure, precision)
+    # compare the single precision path with the double precision path
+    if precision != np.float64 and accuracy_check and day == 0:
+        reference = meridional_energy_transport(var_key, calc_geopotential(var_key, pressure), pressure)
+        report = wizard.summation.accuracy_report(['internal', 'latent', 'geopotential', 'kinetic'],
+                 reference[:4], [internal_flux_int, latent_flux_int, geopotential_flux_int, kinetic_flux_int], dx)
+        logging.info("Accuracy of the daily zonal integrals in %s against float64 (%d-%s-%s):\n%s" %
+                     (np.dtype(precision).name, year, namelist_month[month-1], namelist_day[day], '\n'.join(report)))
+    logging.info("Field cache: %d hits, %d misses, %d fields (%d MB) in memory." % (field_cache.hits,
+                 field_cache.misses, len(field_cache), field_cache.nbytes / 1024**2))
+    # the fields of this day are not used anymore
+    field_cache.release(var_key)
+    var_key.close()
+
+    return day, (div_moisture_flux_u, div_moisture_flux_v, div_mass_flux_u, div_mass_flux_v,
+                 precipitable_water, ps_mean, internal_flux_int, latent_flux_int, geopotential_flux_int,
+                 kinetic_flux_int, heat_flux_int, vapor_flux_int, geo_flux_int, velocity_flux_int), \
+           (state_first, state_last)
 
 if __name__=="__main__":
     ####################################################################
@@ -693,6 +646,8 @@ if __name__=="__main__":
     level = benchmark.variables['lev'][:]
     latitude = benchmark.variables['lat'][:]
     longitude = benchmark.variables['lon'][:]
+    # weights of the sectors on the grid, for the sector integrals
+    sector_masks = wizard.sector.masks(latitude, longitude, sectors)
     # create dimensions for saving data
     Dim_level = len(level)
     Dim_latitude = len(latitude)
@@ -712,28 +667,26 @@ if __name__=="__main__":
     meridional_E_latent_pool = np.zeros((Dim_month,Dim_latitude),dtype = float)
     meridional_E_geopotential_pool = np.zeros((Dim_month,Dim_latitude),dtype = float)
     meridional_E_kinetic_pool = np.zeros((Dim_month,Dim_latitude),dtype = float)
-    # data pool for grid point values
-    uc_point_pool = np.zeros((Dim_month,Dim_latitude,Dim_longitude),dtype = float)
-    vc_point_pool = np.zeros((Dim_month,Dim_latitude,Dim_longitude),dtype = float)
-    meridional_E_point_pool = np.zeros((Dim_month,Dim_latitude,Dim_longitude),dtype = float)
-    meridional_E_internal_point_pool = np.zeros((Dim_month,Dim_latitude,Dim_longitude),dtype = float)
-    meridional_E_latent_point_pool = np.zeros((Dim_month,Dim_latitude,Dim_longitude),dtype = float)
-    meridional_E_geopotential_point_pool = np.zeros((Dim_month,Dim_latitude,Dim_longitude),dtype = float)
-    meridional_E_kinetic_point_pool = np.zeros((Dim_month,Dim_latitude,Dim_longitude),dtype = float)
-    # Initialize the variable key of the last day of the last month for the computation of tendency terms in mass correction
-    year_last = start_year - 1
-    if year_last < 1992:
-        datapath_last = datapath + os.sep + 'merra%d' % (year_last) + os.sep + 'MERRA2_100.inst3_3d_asm_Nv.%d1231.SUB.nc4' % (year_last)
-    elif year_last < 2001:
-        datapath_last = datapath + os.sep + 'merra%d' % (year_last) + os.sep + 'MERRA2_200.inst3_3d_asm_Nv.%d1231.SUB.nc4' % (year_last)
-    elif year_last < 2011:
-        datapath_last = datapath + os.sep + 'merra%d' % (year_last) + os.sep + 'MERRA2_300.inst3_3d_asm_Nv.%d1231.SUB.nc4' % (year_last)
-    else:
-        datapath_last = datapath + os.sep + 'merra%d' % (year_last) + os.sep + 'MERRA2_400.inst3_3d_asm_Nv.%d1231.SUB.nc4' % (year_last)
-    var_last = Dataset(datapath_last)
+    # the grid point values are written to the output file month by month
     # loop for calculation
     for i in period:
+        # the output files, to which each month is written as soon as it is complete
+        point_writer = create_netcdf_point(output_path, i)
+        zonal_writer = create_netcdf_zonal_int(output_path, i)
         for j in index_month:
+            # skip the month which is completed in a previous run
+            if resume and wizard.checkpoint.completed(checkpoint_path, i, j):
+                checkpoint = wizard.checkpoint.load(checkpoint_path, i, j)
+                meridional_E_pool[j-1,:] = checkpoint['meridional_E']
+                meridional_E_internal_pool[j-1,:] = checkpoint['meridional_E_internal']
+                meridional_E_latent_pool[j-1,:] = checkpoint['meridional_E_latent']
+                meridional_E_geopotential_pool[j-1,:] = checkpoint['meridional_E_geopotential']
+                meridional_E_kinetic_pool[j-1,:] = checkpoint['meridional_E_kinetic']
+                # the output file may be new, e.g. from a run before the monthly output
+                wizard.writer.write_amet_month(point_writer, zonal_writer, j, checkpoint, sector_masks)
+                print "Resume from the checkpoint of %d (y) - %s (m)" % (i,namelist_month[j-1])
+                logging.info("Resume from the checkpoint of %d (y) - %s (m)" % (i,namelist_month[j-1]))
+                continue
             # determine how many days are there in a month
             if j in long_month_list:
                 days = index_days_long
@@ -748,37 +701,35 @@ if __name__=="__main__":
             ###  Create space for stroing intermediate variables and outputs ###
             ####################################################################
             # data pool for mass budget correction module
-            pool_div_moisture_flux_u = np.zeros((len(days),len(latitude),len(longitude)),dtype=float)
-            pool_div_moisture_flux_v = np.zeros((len(days),len(latitude),len(longitude)),dtype=float)
-            pool_div_mass_flux_u = np.zeros((len(days),len(latitude),len(longitude)),dtype=float)
-            pool_div_mass_flux_v = np.zeros((len(days),len(latitude),len(longitude)),dtype=float)
-            pool_precipitable_water = np.zeros((len(days),len(latitude),len(longitude)),dtype=float)
-            pool_ps_mean = np.zeros((len(days),len(latitude),len(longitude)),dtype=float)
+            pool_div_moisture_flux_u = np.zeros((len(days),len(latitude),len(longitude)),dtype=precision)
+            pool_div_moisture_flux_v = np.zeros((len(days),len(latitude),len(longitude)),dtype=precision)
+            pool_div_mass_flux_u = np.zeros((len(days),len(latitude),len(longitude)),dtype=precision)
+            pool_div_mass_flux_v = np.zeros((len(days),len(latitude),len(longitude)),dtype=precision)
+            pool_precipitable_water = np.zeros((len(days),len(latitude),len(longitude)),dtype=precision)
+            pool_ps_mean = np.zeros((len(days),len(latitude),len(longitude)),dtype=precision)
             # data pool for meridional energy tansport module
-            pool_internal_flux_int = np.zeros((len(days),len(latitude),len(longitude)),dtype=float)
-            pool_latent_flux_int = np.zeros((len(days),len(latitude),len(longitude)),dtype=float)
-            pool_geopotential_flux_int = np.zeros((len(days),len(latitude),len(longitude)),dtype=float)
-            pool_kinetic_flux_int = np.zeros((len(days),len(latitude),len(longitude)),dtype=float)
+            pool_internal_flux_int = np.zeros((len(days),len(latitude),len(longitude)),dtype=precision)
+            pool_latent_flux_int = np.zeros((len(days),len(latitude),len(longitude)),dtype=precision)
+            pool_geopotential_flux_int = np.zeros((len(days),len(latitude),len(longitude)),dtype=precision)
+            pool_kinetic_flux_int = np.zeros((len(days),len(latitude),len(longitude)),dtype=precision)
             # data pool for the correction of meridional energy tansport
-            pool_heat_flux_int = np.zeros((len(days),len(latitude),len(longitude)),dtype=float)
-            pool_vapor_flux_int = np.zeros((len(days),len(latitude),len(longitude)),dtype=float)
-            pool_geo_flux_int = np.zeros((len(days),len(latitude),len(longitude)),dtype=float)
-            pool_velocity_flux_int = np.zeros((len(days),len(latitude),len(longitude)),dtype=float)
+            pool_heat_flux_int = np.zeros((len(days),len(latitude),len(longitude)),dtype=precision)
+            pool_vapor_flux_int = np.zeros((len(days),len(latitude),len(longitude)),dtype=precision)
+            pool_geo_flux_int = np.zeros((len(days),len(latitude),len(longitude)),dtype=precision)
+            pool_velocity_flux_int = np.zeros((len(days),len(latitude),len(longitude)),dtype=precision)
             # days loop
-            for k in days:
-                # get the key of each variable
-                var_key = var_key_retrieve(datapath,i,j,k)
-                ####################################################################
-                ######                   Mass Correction                     #######
-                ####################################################################
-                # for the computation of tendency terms in the following function
+            # the days are independent of each other and are handed out to the worker processes
+            # the results of each day are saved to the warehouse as soon as they are ready
+            dates = [(i, j, k) for k in days]
+            for k, daily_results, daily_states in wizard.executor.map_unordered(daily_computation, dates, workers):
+                # the states at the edges of the month, for the tendency terms
                 if k == days[0]:
-                    var_start = var_key
-                elif k == days[-1]:
-                    var_end = var_key
-                # calculate divergence terms and other terms in mass correction
+                    state_start = daily_states[0]
+                if k == days[-1]:
+                    state_end = daily_states[1]
                 div_moisture_flux_u, div_moisture_flux_v, div_mass_flux_u, div_mass_flux_v, \
-                precipitable_water, ps_mean = mass_correction_divergence(var_key)
+                precipitable_water, ps_mean, internal_flux_int, latent_flux_int, geopotential_flux_int, \
+                kinetic_flux_int, heat_flux_int, vapor_flux_int, geo_flux_int, velocity_flux_int = daily_results
                 # save the divergence terms to the warehouse
                 pool_div_moisture_flux_u[k,:,:] = div_moisture_flux_u
                 pool_div_moisture_flux_v[k,:,:] = div_moisture_flux_v
@@ -786,18 +737,7 @@ if __name__=="__main__":
                 pool_div_mass_flux_v[k,:,:] = div_mass_flux_v
                 pool_precipitable_water[k,:,:] = precipitable_water
                 pool_ps_mean[k,:,:] = ps_mean
-                ####################################################################
-                ######                       Geopotential                    #######
-                ####################################################################
-                # calculate the geopotential
-                gz = calc_geopotential(var_key)
-                ####################################################################
-                ######               Meridional Energy Transport             #######
-                ####################################################################
-                # calculate the energy flux terms in meridional energy Transport
-                internal_flux_int, latent_flux_int, geopotential_flux_int, kinetic_flux_int,\
-                heat_flux_int, vapor_flux_int, geo_flux_int, velocity_flux_int = meridional_energy_transport(var_key,gz)
-                # save the divergence terms to the warehouse
+                # save the energy flux terms to the warehouse
                 pool_internal_flux_int[k,:,:] = internal_flux_int
                 pool_latent_flux_int[k,:,:] = latent_flux_int
                 pool_geopotential_flux_int[k,:,:] = geopotential_flux_int
@@ -812,71 +752,71 @@ if __name__=="__main__":
             ####################################################################
             # complete the mass correction and calculate the barotropic wind correcter
             # calculate the tendency terms in mass correction
-            moisture_tendency, ps_tendency = mass_correction_tendency(datapath,i,j,var_start,var_end,var_last,days)
-            # update the variable key of the last day of the last month
-            var_last = var_end
-            # calculate evaporation minus precipitation
-            E_P = moisture_tendency + np.mean(pool_div_moisture_flux_u,0) +np.mean(pool_div_moisture_flux_v,0)
-            print '*******************************************************************'
-            print "******  Computation of E-P on each grid point is finished   *******"
-            print '*******************************************************************'
-            logging.info("Computation of E-P on each grid point is finished!")
-            # calculate the mass residual
-            mass_residual = ps_tendency + constant['g'] * (np.mean(pool_div_mass_flux_u,0) +\
-                            np.mean(pool_div_mass_flux_v,0)) - constant['g'] * E_P
-            print '*******************************************************************'
-            print "*** Computation of mass residual on each grid point is finished ***"
-            print '*******************************************************************'
-            logging.info("Computation of mass residual on each grid point is finished!")
-            # calculate barotropic correction wind
-            print 'Begin the calculation of barotropic correction wind.'
-            uc = np.zeros((len(latitude),len(longitude)),dtype = float)
-            vc = np.zeros((len(latitude),len(longitude)),dtype = float)
-            vc = mass_residual * dy / (np.mean(pool_ps_mean,0) - constant['g'] * np.mean(pool_precipitable_water,0))
-            # extra modification for points at polor mesh
-            #vc[0,:] = 0
-            vc[-1,:] = 0
-            # Here we should avoid i,j,k as counter since they are used and will still function
-            for c in np.arange(len(latitude)):
-                uc[c,:] = mass_residual[c,:] * dx[c] / (np.mean(pool_ps_mean[:,c,:],0) - constant['g'] * np.mean(pool_precipitable_water[:,c,:],0))
-            print '********************************************************************************'
-            print "*** Computation of barotropic correction wind on each grid point is finished ***"
-            print '********************************************************************************'
-            logging.info("Computation of barotropic correction wind on each grid point is finished!")
-            ####################################################################
-            ######               Meridional Energy Transport             #######
-            ####################################################################
-            # calculate the correction terms
-            correction_internal_flux_int = vc * np.mean(pool_heat_flux_int,0)
-            correction_latent_flux_int = vc * np.mean(pool_vapor_flux_int,0)
-            correction_geopotential_flux_int = vc * np.mean(pool_geo_flux_int,0)
-            correction_kinetic_flux_int = vc * np.mean(pool_velocity_flux_int,0)
-            # calculate the total meridional energy transport and each component respectively
-            # energy on grid point
-            meridional_E_internal_point = np.zeros((len(latitude),len(longitude)),dtype=float)
-            meridional_E_latent_point = np.zeros((len(latitude),len(longitude)),dtype=float)
-            meridional_E_geopotential_point = np.zeros((len(latitude),len(longitude)),dtype=float)
-            meridional_E_kinetic_point = np.zeros((len(latitude),len(longitude)),dtype=float)
-            meridional_E_point = np.zeros((len(latitude),len(longitude)),dtype=float)
-            for c in np.arange(len(latitude)):
-                meridional_E_internal_point[c,:] = (np.mean(pool_internal_flux_int[:,c,:],0) - correction_internal_flux_int[c,:]) * dx[c]/1e+12
-                meridional_E_latent_point[c,:] = (np.mean(pool_latent_flux_int[:,c,:],0) - correction_latent_flux_int[c,:]) * dx[c]/1e+12
-                meridional_E_geopotential_point[c,:] = (np.mean(pool_geopotential_flux_int[:,c,:],0) - correction_geopotential_flux_int[c,:]) * dx[c]/1e+12
-                meridional_E_kinetic_point[c,:] = (np.mean(pool_kinetic_flux_int[:,c,:],0) - correction_kinetic_flux_int[c,:]) * dx[c]/1e+12
-            # total energy transport
-            meridional_E_point = meridional_E_internal_point + meridional_E_latent_point + meridional_E_geopotential_point + meridional_E_kinetic_point
-            # zonal integral of energy
-            meridional_E_internal = np.sum(meridional_E_internal_point,1)
-            meridional_E_latent = np.sum(meridional_E_latent_point,1)
-            meridional_E_geopotential = np.sum(meridional_E_geopotential_point,1)
-            meridional_E_kinetic = np.sum(meridional_E_kinetic_point,1)
-            # total energy transport
-            meridional_E = meridional_E_internal + meridional_E_latent + meridional_E_geopotential + meridional_E_kinetic
-            print '*****************************************************************************'
-            print "***Computation of meridional energy transport in the atmosphere is finished**"
-            print "************         The result is in tera-watt (1E+12)          ************"
-            print '*****************************************************************************'
-            logging.info("Computation of meridional energy transport on model level is finished!")
+            with timer.stage('tendency', year=i, month=j):
+                moisture_tendency, ps_tendency = mass_correction_tendency(datapath,i,j,state_start,state_end,days)
+            with timer.stage('correction', year=i, month=j):
+                # calculate evaporation minus precipitation
+                E_P = moisture_tendency + np.mean(pool_div_moisture_flux_u,0) +np.mean(pool_div_moisture_flux_v,0)
+                print '*******************************************************************'
+                print "******  Computation of E-P on each grid point is finished   *******"
+                print '*******************************************************************'
+                logging.info("Computation of E-P on each grid point is finished!")
+                # calculate the mass residual
+                mass_residual = ps_tendency + constant['g'] * (np.mean(pool_div_mass_flux_u,0) +\
+                                np.mean(pool_div_mass_flux_v,0)) - constant['g'] * E_P
+                print '*******************************************************************'
+                print "*** Computation of mass residual on each grid point is finished ***"
+                print '*******************************************************************'
+                logging.info("Computation of mass residual on each grid point is finished!")
+                # calculate barotropic correction wind
+                print 'Begin the calculation of barotropic correction wind.'
+                uc = np.zeros((len(latitude),len(longitude)),dtype = float)
+                vc = np.zeros((len(latitude),len(longitude)),dtype = float)
+                vc = mass_residual * dy / (np.mean(pool_ps_mean,0) - constant['g'] * np.mean(pool_precipitable_water,0))
+                # extra modification for points at polor mesh
+                #vc[0,:] = 0
+                vc[-1,:] = 0
+                # Here we should avoid i,j,k as counter since they are used and will still function
+                for c in np.arange(len(latitude)):
+                    uc[c,:] = mass_residual[c,:] * dx[c] / (np.mean(pool_ps_mean[:,c,:],0) - constant['g'] * np.mean(pool_precipitable_water[:,c,:],0))
+                print '********************************************************************************'
+                print "*** Computation of barotropic correction wind on each grid point is finished ***"
+                print '********************************************************************************'
+                logging.info("Computation of barotropic correction wind on each grid point is finished!")
+                ####################################################################
+                ######               Meridional Energy Transport             #######
+                ####################################################################
+                # calculate the correction terms
+                correction_internal_flux_int = vc * np.mean(pool_heat_flux_int,0)
+                correction_latent_flux_int = vc * np.mean(pool_vapor_flux_int,0)
+                correction_geopotential_flux_int = vc * np.mean(pool_geo_flux_int,0)
+                correction_kinetic_flux_int = vc * np.mean(pool_velocity_flux_int,0)
+                # calculate the total meridional energy transport and each component respectively
+                # energy on grid point
+                meridional_E_internal_point = np.zeros((len(latitude),len(longitude)),dtype=float)
+                meridional_E_latent_point = np.zeros((len(latitude),len(longitude)),dtype=float)
+                meridional_E_geopotential_point = np.zeros((len(latitude),len(longitude)),dtype=float)
+                meridional_E_kinetic_point = np.zeros((len(latitude),len(longitude)),dtype=float)
+                meridional_E_point = np.zeros((len(latitude),len(longitude)),dtype=float)
+                for c in np.arange(len(latitude)):
+                    meridional_E_internal_point[c,:] = (np.mean(pool_internal_flux_int[:,c,:],0) - correction_internal_flux_int[c,:]) * dx[c]/1e+12
+                    meridional_E_latent_point[c,:] = (np.mean(pool_latent_flux_int[:,c,:],0) - correction_latent_flux_int[c,:]) * dx[c]/1e+12
+                    meridional_E_geopotential_point[c,:] = (np.mean(pool_geopotential_flux_int[:,c,:],0) - correction_geopotential_flux_int[c,:]) * dx[c]/1e+12
+                    meridional_E_kinetic_point[c,:] = (np.mean(pool_kinetic_flux_int[:,c,:],0) - correction_kinetic_flux_int[c,:]) * dx[c]/1e+12
+                # total energy transport
+                meridional_E_point = meridional_E_internal_point + meridional_E_latent_point + meridional_E_geopotential_point + meridional_E_kinetic_point
+                # zonal integral of energy
+                meridional_E_internal = np.sum(meridional_E_internal_point,1)
+                meridional_E_latent = np.sum(meridional_E_latent_point,1)
+                meridional_E_geopotential = np.sum(meridional_E_geopotential_point,1)
+                meridional_E_kinetic = np.sum(meridional_E_kinetic_point,1)
+                # total energy transport
+                meridional_E = meridional_E_internal + meridional_E_latent + meridional_E_geopotential + meridional_E_kinetic
+                print '*****************************************************************************'
+                print "***Computation of meridional energy transport in the atmosphere is finished**"
+                print "************         The result is in tera-watt (1E+12)          ************"
+                print '*****************************************************************************'
+                logging.info("Computation of meridional energy transport on model level is finished!")
             ####################################################################
             ######                 Data Wrapping (NetCDF)                #######
             ####################################################################
@@ -886,25 +826,31 @@ if __name__=="__main__":
             meridional_E_latent_pool[j-1,:] = meridional_E_latent
             meridional_E_geopotential_pool[j-1,:] = meridional_E_geopotential
             meridional_E_kinetic_pool[j-1,:] = meridional_E_kinetic
-            # save uc and vc to the data pool
-            uc_point_pool[j-1,:,:] = uc
-            vc_point_pool[j-1,:,:] = vc
-            # save the meridional energy on each grid point to the data pool
-            meridional_E_point_pool[j-1,:,:] = meridional_E_point
-            meridional_E_internal_point_pool[j-1,:,:] = meridional_E_internal_point
-            meridional_E_latent_point_pool[j-1,:,:] = meridional_E_latent_point
-            meridional_E_geopotential_point_pool[j-1,:,:] = meridional_E_geopotential_point
-            meridional_E_kinetic_point_pool[j-1,:,:] = meridional_E_kinetic_point
+            results = dict(meridional_E = meridional_E,
+                           meridional_E_internal = meridional_E_internal,
+                           meridional_E_latent = meridional_E_latent,
+                           meridional_E_geopotential = meridional_E_geopotential,
+                           meridional_E_kinetic = meridional_E_kinetic, uc = uc, vc = vc,
+                           meridional_E_point = meridional_E_point,
+                           meridional_E_internal_point = meridional_E_internal_point,
+                           meridional_E_latent_point = meridional_E_latent_point,
+                           meridional_E_geopotential_point = meridional_E_geopotential_point,
+                           meridional_E_kinetic_point = meridional_E_kinetic_point)
+            with timer.stage('write', year=i, month=j):
+                # write this month to the netcdf files
+                wizard.writer.write_amet_month(point_writer, zonal_writer, j, results, sector_masks)
+                # save the checkpoint of this month
+                wizard.checkpoint.save(checkpoint_path, i, j, **results)
+            logging.info("Save the checkpoint of %d (y) - %s (m)" % (i,namelist_month[j-1]))
         # make plots for monthly means
-        visualization(meridional_E_pool,meridional_E_internal_pool,meridional_E_latent_pool,
-                      meridional_E_geopotential_pool,meridional_E_kinetic_pool,output_path,i)
-        # save data as netcdf file
-        create_netcdf_zonal_int(meridional_E_pool,meridional_E_internal_pool,
-                                meridional_E_latent_pool,meridional_E_geopotential_pool,
-                                meridional_E_kinetic_pool,output_path,i)
-        create_netcdf_point(meridional_E_point_pool,meridional_E_internal_point_pool,
-                            meridional_E_latent_point_pool,meridional_E_geopotential_point_pool,
-                            meridional_E_kinetic_point_pool,uc_point_pool,vc_point_pool,output_path,i)
+        with timer.stage('plot', year=i):
+            visualization(meridional_E_pool,meridional_E_internal_pool,meridional_E_latent_pool,
+                          meridional_E_geopotential_pool,meridional_E_kinetic_pool,output_path,i)
+        # all the months are in the netcdf files
+        point_writer.close()
+        zonal_writer.close()
+        print "Create netcdf file successfully"
+        logging.info("The generation of netcdf files for the total meridional energy transport and each component is complete!!")
     print 'Computation of meridional energy transport on model level for MERRA2 is complete!!!'
     print 'The output is in sleep, safe and sound!!!'
     logging.info("The full pipeline of the quantification of meridional energy transport in the atmosphere is accomplished!")
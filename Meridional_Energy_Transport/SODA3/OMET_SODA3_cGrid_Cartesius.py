@@ -11,8 +11,10 @@ Description     : The code aims to calculate the oceanic meridional energy
                   on model level (original MOM5_z50 Arakawa-B grid). All the interpolations
                   are made on the C grid. The procedure is generic and is able
                   to adapt any ocean reanalysis datasets, with some changes.
+                  The wall time, CPU time and peak memory of each stage are written as
+                  JSON lines next to the log (wizard.timing).
 Return Value    : NetCFD4 data file
-Dependencies    : os, time, numpy, netCDF4, sys, matplotlib, logging
+Dependencies    : os, time, numpy, netCDF4, sys, matplotlib, logging, wizard.timing
 variables       : Potential Temperature                     Theta
                   Zonal Current Velocity                    u
                   Meridional Current Velocity               v
@@ -48,6 +50,9 @@ import matplotlib
 # generate images without having a window appear
 matplotlib.use('Agg')
 import matplotlib.pyplot as plt
+# add the root of the toolkit to the search path for the shared kernels
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, os.pardir))
+import wizard.timing
 #from mpl_toolkits.basemap import Basemap, cm
 #import cartopy.crs as ccrs
 #from cartopy.mpl.gridliner import LONGITUDE_FORMATTER, LATITUDE_FORMATTER
@@ -78,7 +83,8 @@ sys.stdout = open('/home/lwc16308/reanalysis/SODA3/console_E.out','w')
 
 # logging level 'DEBUG' 'INFO' 'WARNING' 'ERROR' 'CRITICAL'
 #logging.basicConfig(filename = 'F:\DataBase\ORAS4\history.log', filemode = 'w',level = logging.DEBUG,format = '%(asctime)s - %(name)s - %(levelname)s - %(message)s')
-logging.basicConfig(filename = '/home/lwc16308/reanalysis/SODA3/history_E.log',
+log_file = '/home/lwc16308/reanalysis/SODA3/history_E.log'
+logging.basicConfig(filename = log_file,
                     filemode = 'w', level = logging.DEBUG,
                     format = '%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 
@@ -115,6 +121,9 @@ ff.close()
 output_path = '/home/lwc16308/reanalysis/SODA3/output'
 ####################################################################################
 
+# measurements of each stage, summarized by HPC_config/summarize_timing.py
+timer = wizard.timing.StageTimer(wizard.timing.timing_file(log_file), dataset='SODA3')
+
 def var_key(datapath, file_name):
     # get the path to each datasets
     print "Start retrieving datasets %s" % (file_name)
@@ -505,8 +514,9 @@ if __name__=="__main__":
     jj = 1070
     level = 50
     # extract the mesh_mask and coordinate information
-    grid_x_T, grid_y_T, grid_x_C, grid_y_C, x_T, y_T, x_C, y_C, zt, zb, dz, area_T, e1t,\
-    e2t, e1c, e2c, tmask, tmaskatl, cmask, mbathy_t, mbathy_c, topo_depth_t, topo_depth_c = var_coordinate(datapath_mask)
+    with timer.stage('retrieve', year=input_year, file='mesh'):
+        grid_x_T, grid_y_T, grid_x_C, grid_y_C, x_T, y_T, x_C, y_C, zt, zb, dz, area_T, e1t,\
+        e2t, e1c, e2c, tmask, tmaskatl, cmask, mbathy_t, mbathy_c, topo_depth_t, topo_depth_c = var_coordinate(datapath_mask)
     print '*******************************************************************'
     print '*******************  Partial cells correction   *******************'
     print '*******************************************************************'
@@ -543,28 +553,33 @@ if __name__=="__main__":
         #########################  Extract variables #######################
         ####################################################################
         # get the key of each variable
-        soda_key = var_key(datapath, namelist[i])
+        with timer.stage('retrieve', year=input_year, file=namelist[i]):
+            soda_key = var_key(datapath, namelist[i])
         ####################################################################
         ########  Calculate meridional overturning stream function #########
         ####################################################################
         # calculate the stokes stream function and plot
-        psi_glo, psi_atl = stream_function(soda_key,e1c)
+        with timer.stage('stream_function', year=input_year, file=namelist[i]):
+            psi_glo, psi_atl = stream_function(soda_key,e1c)
         psi_pool_zonal_glo[i,:,:] = psi_glo
         psi_pool_zonal_atl[i,:,:] = psi_atl
         ####################################################################
         ##############  Calculate meridional energy transport ##############
         ####################################################################
         # calculate the meridional energy transport in the ocean
-        E_point = meridional_energy_transport(soda_key)
+        with timer.stage('flux', year=input_year, file=namelist[i]):
+            E_point = meridional_energy_transport(soda_key)
         E_pool_point[i,:,:] = E_point
         E_pool_zonal_int[i,:] = np.sum(E_point,1)
         # plot the stream function
         #visualization_stream_function(psi_pool_zonal_glo,psi_pool_zonal_atl)
         # create NetCDF file and save the output
     # plot the zonal int of all time
-    zonal_int_plot(E_pool_zonal_int)
-    create_netcdf_point(E_pool_point,output_path)
-    create_netcdf_zonal_int(E_pool_zonal_int,psi_pool_zonal_glo,psi_pool_zonal_atl,output_path)
+    with timer.stage('plot', year=input_year):
+        zonal_int_plot(E_pool_zonal_int)
+    with timer.stage('write', year=input_year):
+        create_netcdf_point(E_pool_point,output_path)
+        create_netcdf_zonal_int(E_pool_zonal_int,psi_pool_zonal_glo,psi_pool_zonal_atl,output_path)
 
     print 'Computation of meridional energy transport on MOM5 grid for SODA3 is complete!!!'
     print 'The output is in sleep, safe and sound!!!'
@@ -0,0 +1,328 @@
+#!/usr/bin/env python
+"""
+Copyright Netherlands eScience Center
+
+Function        : Benchmark of the AMET and OMET pipelines on synthetic reanalysis files
+Author          : Yang Liu
+Date            : 2018.2.16
+Last Update     : 2018.2.16
+Description     : The code writes synthetic files in the layout of each dataset
+                  (wizard.synthetic) for a month (AMET) or a year (OMET) at several
+                  grid sizes, and runs the pipeline on them:
+                  MERRA2, ERA-Interim   reader and AMET engine (wizard.reader, wizard.engine)
+                                        and the output files (wizard.writer)
+                  ORAS4, SODA3          OMET kernels on the ORCA1 and MOM5 grids (wizard.ocean)
+                  The wall time, CPU time and peak memory of each stage are measured
+                  (wizard.timing), and the throughput of each pipeline is given in time
+                  steps per second and GB of input files per second.
+                  The results are compared against a stored baseline, e.g. of the
+                  previous version of the toolkit on the same machine, and a case which
+                  is slower (or takes more memory) than the baseline by more than the
+                  tolerance is marked.
+                  No data of the reanalysis datasets is needed.
+Return Value    : tables on the standard output, JSON file of the results
+Dependencies    : os, sys, json, shutil, tempfile, multiprocessing, numpy, netCDF4
+                  wizard.engine, wizard.ocean, wizard.reader, wizard.synthetic,
+                  wizard.timing, wizard.writer
+Caveat!!        : Each case runs in a new process, so the peak memory is that of the
+                  case alone. The synthetic files are written by another process before.
+                  The baseline is only meaningful on the machine it was made on.
+                  The AMET cases need the month before and after (tendency terms), so
+                  three months of ERA-Interim or a month and two days of MERRA2 are
+                  written. Keep the scales small on a laptop, the full MERRA2 grid
+                  (scale 1.0) takes about 3 GB a day.
+"""
+import os
+import sys
+import json
+import shutil
+import tempfile
+import multiprocessing
+import time as tttt
+import numpy as np
+from netCDF4 import Dataset
+# add the root of the toolkit to the search path for the shared kernels
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+import wizard.engine
+import wizard.ocean
+import wizard.reader
+import wizard.synthetic
+import wizard.timing
+import wizard.writer
+
+# define the constant:
+constant ={'g' : 9.80616,      # gravititional acceleration [m / s2]
+           'R' : 6371009,      # radius of the earth [m]
+           'cp': 1004.64,      # heat capacity of air [J/(Kg*K)]
+           'Lv': 2264670,      # Latent heat of vaporization [J/Kg]
+           'R_dry' : 286.9,    # gas constant of dry air [J/(kg*K)]
+           'R_vap' : 461.5,    # gas constant for water vapour [J/(kg*K)]
+            }
+constant_ocean ={'g' : 9.80616,      # gravititional acceleration [m / s2]
+                 'R' : 6371009,      # radius of the earth [m]
+                 'cp': 3987,         # heat capacity of sea water [J/(Kg*C)]
+                 'rho': 1027,        # sea water density [Kg/m3]
+                 }
+
+################################   Input zone  ######################################
+# path of the synthetic files and the measurements
+work_path = os.path.join(tempfile.gettempdir(), 'AMET_OMET_benchmark')
+# the month (AMET) and year (OMET) of the synthetic files
+year = 1980
+month = 2
+# grid sizes of each dataset, as a fraction of the grid of the dataset (1.0)
+scales = {'MERRA2': (0.05, 0.1),
+          'ERAI'  : (0.1, 0.2),
+          'ORAS4' : (0.25, 0.5),
+          'SODA3' : (0.1, 0.2),
+          }
+# number of time steps of each ERA-Interim file (None for the whole month)
+erai_steps = 16
+# number of 5-daily SODA3 files (73 for the whole year)
+soda3_files = 6
+# stored baseline, it is written if it does not exist or if update_baseline is True
+baseline_file = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'benchmark_baseline.json')
+update_baseline = False
+# relative change of the wall time and peak memory which is reported
+tolerance = 0.2
+# keep the synthetic files after the benchmark
+keep_files = False
+####################################################################################
+
+def case_path(dataset, scale):
+    return work_path + os.sep + '%s_%g' % (dataset, scale)
+
+def generate(case):
+    '''
+    Write the synthetic files of the case (dataset, scale). The input files of the
+    pipeline and the number of time steps are returned.
+    '''
+    dataset, scale = case
+    path = case_path(dataset, scale)
+    if dataset == 'MERRA2':
+        return wizard.synthetic.merra2(path, year, month, scale)
+    elif dataset == 'ERAI':
+        return wizard.synthetic.erai(path, year, month, scale, steps=erai_steps)
+    elif dataset == 'ORAS4':
+        return wizard.synthetic.orca1(path, year, scale)
+    elif dataset == 'SODA3':
+        return wizard.synthetic.mom5(path, path, year, scale, files=soda3_files)
+    raise ValueError("Unknown dataset %s." % (dataset))
+
+def amet(dataset, path, timer):
+    '''
+    Monthly AMET of the synthetic files with the reader and engine of the dataset.
+    '''
+    readers = {'MERRA2': wizard.reader.MERRA2Reader,
+               'ERAI'  : wizard.reader.ERAInterimReader}
+    reader = readers[dataset](path)
+    engine = wizard.engine.AMETEngine(reader, constant, timer=timer)
+    result = engine.month(year, month)
+    with timer.stage('write', year=year, month=month):
+        point_writer = wizard.writer.amet_point(path + os.sep + 'AMET_point.nc', reader.latitude, reader.longitude)
+        zonal_writer = wizard.writer.amet_zonal_int(path + os.sep + 'AMET_zonal_int.nc', reader.latitude)
+        fields = dict([(name, result[name + '_point']) for name, long_name in wizard.writer.amet_components])
+        point_writer.write(month - 1, month, uc = result['uc'], vc = result['vc'], **fields)
+        zonal_writer.write(month - 1, month, **dict([(name, result[name]) for name, long_name in
+                                                     wizard.writer.amet_components]))
+        point_writer.close()
+        zonal_writer.close()
+
+def omet_write(path, latitude, E_zonal_int, psi_glo, psi_atl, timer):
+    # zonal integral of OMET and the stream functions of each time step
+    with timer.stage('write', year=year):
+        data_writer = wizard.writer.RecordWriter(path + os.sep + 'OMET_zonal_int.nc', 'time',
+                                                 [('latitude_aux', latitude, 'row'),
+                                                  ('lev', np.arange(psi_glo.shape[1]), 'level')])
+        data_writer.variable('E', ('latitude_aux',), 'tera watt', 'Meridional energy transport', dtype=np.float64)
+        data_writer.variable('Psi_glo', ('lev', 'latitude_aux'), 'Sv',
+                             'Meridional overturning stream function of global ocean', dtype=np.float64)
+        data_writer.variable('Psi_atl', ('lev', 'latitude_aux'), 'Sv',
+                             'Meridional overturning stream function of Atlantic ocean', dtype=np.float64)
+        for n in np.arange(len(E_zonal_int)):
+            data_writer.write(n, n + 1, E = E_zonal_int[n], Psi_glo = psi_glo[n], Psi_atl = psi_atl[n])
+        data_writer.close()
+
+def oras4(path, timer):
+    '''
+    OMET and stream function of a year of ORAS4 on the ORCA1 grid, as in
+    Meridional_Energy_Transport/ORAS4/OMET_ORAS4_vGrid_HPC.py.
+    '''
+    with timer.stage('retrieve', year=year, file='mesh_mask.nc'):
+        mesh_mask_key = Dataset(path + os.sep + 'mesh_mask.nc')
+        subbasin_mesh_key = Dataset(path + os.sep + 'basinmask_050308_UKMO.nc')
+        vmask = mesh_mask_key.variables['vmask'][0,:,:,:]
+        tmaskatl = subbasin_mesh_key.variables['tmaskatl'][:]
+        e1v = mesh_mask_key.variables['e1v'][0,:,:]
+        mbathy = mesh_mask_key.variables['mbathy'][0,:,:]
+        e3t_0 = mesh_mask_key.variables['e3t_0'][0,:]
+        e3t_ps = mesh_mask_key.variables['e3t_ps'][0,:,:]
+        mesh_mask_key.close()
+        subbasin_mesh_key.close()
+    with timer.stage('partial_cell', year=year):
+        e3t_adjust = wizard.ocean.nemo_partial_cell(e3t_0, e3t_ps, mbathy)
+    with timer.stage('retrieve', year=year, file='thetao'):
+        theta_key = Dataset(path + os.sep + 'theta' + os.sep + 'thetao_oras4_1m_%d_grid_T.nc' % (year))
+        theta = theta_key.variables['thetao'][:]
+        theta_key.close()
+    with timer.stage('retrieve', year=year, file='vo'):
+        v_key = Dataset(path + os.sep + 'v' + os.sep + 'vo_oras4_1m_%d_grid_V.nc' % (year))
+        v = v_key.variables['vo'][:]
+        v_key.close()
+    with timer.stage('stream_function', year=year):
+        psi_glo = wizard.ocean.stream_function(v, e1v, e3t_0, e3t_adjust, vmask)
+        psi_atl = wizard.ocean.stream_function(v, e1v, e3t_0, e3t_adjust, vmask, tmaskatl)
+    with timer.stage('flux', year=year):
+        E_point = wizard.ocean.energy_transport(v, wizard.ocean.nemo_v_grid(theta), e1v, e3t_0,
+                                                e3t_adjust, vmask, constant_ocean)
+        E_zonal_int = np.sum(E_point, -1)
+    omet_write(path, np.arange(E_point.shape[1]), E_zonal_int, psi_glo, psi_atl, timer)
+
+def soda3(path, timer):
+    '''
+    OMET and stream function of the 5-daily SODA3 files on the MOM5 grid, as in
+    Meridional_Energy_Transport/SODA3/OMET_SODA3_cGrid_Cartesius.py.
+    '''
+    with timer.stage('retrieve', year=year, file='topog.nc'):
+        mesh_mask_key = Dataset(path + os.sep + 'topog.nc')
+        zb = mesh_mask_key.variables['zb'][:]
+        y_T = mesh_mask_key.variables['y_T'][:]
+        x_T = mesh_mask_key.variables['x_T'][:]
+        e1c = mesh_mask_key.variables['ds_01_21_C'][:]
+        cmask = mesh_mask_key.variables['wet_c'][:]
+        mbathy_c = mesh_mask_key.variables['num_levels_c'][:]
+        topo_depth_c = mesh_mask_key.variables['depth_c'][:]
+        mesh_mask_key.close()
+        dz = np.zeros(zb.shape)
+        dz[0] = zb[0]
+        dz[1:] = zb[1:] - zb[:-1]
+        # the Atlantic between 30S and 70N
+        tmaskatl = cmask * ((x_T > -70) & (x_T < 20) & (y_T > -30) & (y_T < 70))
+    with timer.stage('partial_cell', year=year):
+        dz_adjust_c = wizard.ocean.mom_partial_cell(zb, topo_depth_c, mbathy_c)
+    namelist = open(path + os.sep + 'soda%d' % (year) + os.sep + 'namelist.txt', 'r').read().splitlines()
+    E_zonal_int = []
+    psi_glo = []
+    psi_atl = []
+    for name in namelist:
+        with timer.stage('retrieve', year=year, file=name):
+            soda_key = Dataset(path + os.sep + 'soda%d' % (year) + os.sep + name)
+            temp = soda_key.variables['temp'][0,:,:,:]
+            v = soda_key.variables['v'][0,:,:,:]
+            soda_key.close()
+        with timer.stage('stream_function', year=year, file=name):
+            psi_glo.append(wizard.ocean.stream_function(v, e1c, dz, dz_adjust_c, cmask))
+            psi_atl.append(wizard.ocean.stream_function(v, e1c, dz, dz_adjust_c, cmask, tmaskatl))
+        with timer.stage('flux', year=year, file=name):
+            E_point = wizard.ocean.energy_transport(v, wizard.ocean.mom_c_grid(temp, cmask), e1c, dz,
+                                                    dz_adjust_c, cmask, constant_ocean)
+            E_zonal_int.append(np.sum(E_point, -1))
+    omet_write(path, np.arange(E_point.shape[0]), np.array(E_zonal_int), np.array(psi_glo),
+               np.array(psi_atl), timer)
+
+def run(case):
+    '''
+    Run the pipeline of the case (dataset, scale, input files, time steps) with the
+    measurements written to the timing file. The wall time of the pipeline is returned.
+    '''
+    dataset, scale, filenames, steps = case
+    path = case_path(dataset, scale)
+    timer = wizard.timing.StageTimer(work_path + os.sep + 'benchmark_timing.jsonl', dataset=dataset, scale=scale)
+    start_time = tttt.time()
+    if dataset in ('MERRA2', 'ERAI'):
+        amet(dataset, path, timer)
+    elif dataset == 'ORAS4':
+        oras4(path, timer)
+    else:
+        soda3(path, timer)
+    return tttt.time() - start_time
+
+def compare(results, baseline):
+    '''
+    Table of the results against the baseline as a list of lines. The change of the
+    wall time and the peak memory is marked if it is larger than the tolerance.
+    '''
+    lines = ['%-16s %12s %12s %8s %12s %12s %8s  %s' % ('case', 'wall [s]', 'baseline', 'ratio',
+                                                        'peak [MB]', 'baseline', 'ratio', 'status')]
+    for key in sorted(results):
+        if key not in baseline:
+            lines.append('%-16s %12.2f %12s %8s %12.0f %12s %8s  %s' % (key, results[key]['wall'], '-', '-',
+                                                                       results[key]['peak_rss_mb'], '-', '-', 'new'))
+            continue
+        wall_ratio = results[key]['wall'] / max(baseline[key]['wall'], 1e-9)
+        peak_ratio = results[key]['peak_rss_mb'] / max(baseline[key]['peak_rss_mb'], 1e-9)
+        status = []
+        if wall_ratio > 1 + tolerance:
+            status.append('SLOWER')
+        elif wall_ratio < 1 - tolerance:
+            status.append('faster')
+        if peak_ratio > 1 + tolerance:
+            status.append('MORE MEMORY')
+        elif peak_ratio < 1 - tolerance:
+            status.append('less memory')
+        lines.append('%-16s %12.2f %12.2f %8.2f %12.0f %12.0f %8.2f  %s' % (key, results[key]['wall'], baseline[key]['wall'],
+                                                                           wall_ratio, results[key]['peak_rss_mb'],
+                                                                           baseline[key]['peak_rss_mb'], peak_ratio,
+                                                                           ' '.join(status) or 'ok'))
+    return lines
+
+if __name__=="__main__":
+    if not os.path.exists(work_path):
+        os.makedirs(work_path)
+    timing_file = work_path + os.sep + 'benchmark_timing.jsonl'
+    if os.path.exists(timing_file):
+        os.remove(timing_file)
+    cases = [(dataset, scale) for dataset in ('MERRA2', 'ERAI', 'ORAS4', 'SODA3') for scale in scales[dataset]]
+    results = {}
+    for dataset, scale in cases:
+        print 'Benchmark %s at scale %g' % (dataset, scale)
+        # a new process for each task, the peak memory of the pipeline is of its own
+        pool = multiprocessing.Pool(processes=1, maxtasksperchild=1)
+        try:
+            filenames, steps = pool.apply(generate, ((dataset, scale),))
+            wall = pool.apply(run, ((dataset, scale, filenames, steps),))
+            pool.close()
+        except:
+            pool.terminate()
+            raise
+        finally:
+            pool.join()
+        size = sum([os.path.getsize(filename) for filename in filenames])
+        results['%s/%g' % (dataset, scale)] = {'wall': wall, 'steps': steps, 'bytes': size,
+                                               'steps_per_s': steps / wall, 'gb_per_s': size / 1024.0**3 / wall}
+        if not keep_files:
+            shutil.rmtree(case_path(dataset, scale))
+    # measurements of each stage
+    keys = ('dataset', 'scale', 'stage')
+    summary = wizard.timing.summarize([timing_file], keys)
+    for dataset, scale, stage in summary:
+        result = results['%s/%g' % (dataset, scale)]
+        result['peak_rss_mb'] = max(result.get('peak_rss_mb', 0.0), summary[(dataset, scale, stage)]['peak_rss_mb'])
+        result.setdefault('stages', {})[stage] = summary[(dataset, scale, stage)]['wall']
+    print '*******************************************************************'
+    print '************************  time of each stage  *********************'
+    print '*******************************************************************'
+    for line in wizard.timing.report(summary, keys):
+        print line
+    print '*******************************************************************'
+    print '***************************  throughput  **************************'
+    print '*******************************************************************'
+    print '%-16s %8s %10s %12s %12s %12s' % ('case', 'steps', 'input [GB]', 'wall [s]', 'steps/s', 'GB/s')
+    for key in sorted(results):
+        result = results[key]
+        print '%-16s %8d %10.3f %12.2f %12.2f %12.4f' % (key, result['steps'], result['bytes'] / 1024.0**3,
+                                                           result['wall'], result['steps_per_s'], result['gb_per_s'])
+    with open(work_path + os.sep + 'benchmark_results.json', 'w') as results_file:
+        json.dump(results, results_file, indent=1, sort_keys=True)
+    print '*******************************************************************'
+    print '****************************  baseline  ***************************'
+    print '*******************************************************************'
+    if update_baseline or not os.path.exists(baseline_file):
+        with open(baseline_file, 'w') as baseline_wrap:
+            json.dump(results, baseline_wrap, indent=1, sort_keys=True)
+        print 'The baseline is written to %s' % (baseline_file)
+    else:
+        with open(baseline_file, 'r') as baseline_wrap:
+            baseline = json.load(baseline_wrap)
+        for line in compare(results, baseline):
+            print line
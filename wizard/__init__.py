@@ -0,0 +1,16 @@
+"""
+Copyright Netherlands eScience Center
+
+Function        : Shared kernels for the quantification of meridional energy transport
+Author          : Yang Liu
+Date            : 2018.1.8
+Last Update     : 2018.1.8
+Description     : This package collects the numerical kernels which are shared by
+                  the AMET and OMET scripts in this toolkit. The scripts add the root
+                  of the toolkit to their search path and import the modules they need,
+                  for instance:
+                  import wizard.divergence
+                  All the modules work with numpy arrays and are independent of the
+                  reanalysis dataset, hence a fix in here benefits every dataset.
+Dependencies    : numpy
+"""
@@ -0,0 +1,89 @@
+"""
+Copyright Netherlands eScience Center
+
+Function        : Energy flux terms integrated over pressure bands
+Author          : Yang Liu
+Date            : 2018.2.19
+Last Update     : 2018.2.19
+Description     : The vertical integral of the energy flux collapses all the model
+                  levels at once, so the transport in a part of the column (e.g.
+                  below 700 hPa) needed another run with its own code. The module
+                  splits the vertical integral into pressure bands, e.g.
+                  surface - 850 hPa, 850 - 500 hPa, 500 - 200 hPa, 200 hPa - TOA
+                  while the full integral is taken (wizard.flux.energy_flux_int).
+                  Each model layer contributes to a band by the fraction of its
+                  pressure thickness which lies in the band, so a layer which crosses
+                  an edge is shared by two bands and the sum over the bands is the
+                  full vertical integral.
+                  Only the time sums of the bands (band, lat, lon) are kept, and a
+                  band which a layer does not reach in the block is skipped.
+Return Value    : numpy arrays (band, lat, lon)
+Dependencies    : numpy
+Caveat!!        : The edges are given in Pa, from the surface to TOA. Where the surface
+                  pressure is lower than an edge (e.g. the Tibetan Plateau below 850 hPa),
+                  the bands below the surface are empty.
+"""
+import numpy as np
+
+# edges of the default bands [Pa], surface - 850 hPa, 850 - 500 hPa, 500 - 200 hPa, 200 hPa - TOA
+edges = (85000.0, 50000.0, 20000.0)
+
+def names(edges=edges):
+    '''
+    Name of each band, e.g. surface-850hPa, ... 200hPa-TOA.
+    '''
+    bounds = ['surface'] + ['%ghPa' % (edge / 100.0) for edge in edges] + ['TOA']
+    return ['%s-%s' % (bounds[k], bounds[k+1]) for k in np.arange(len(edges) + 1)]
+
+def top(edges=edges):
+    '''
+    Pressure at the top of each band [hPa], the coordinate of the bands in the output.
+    '''
+    return np.array(list(edges) + [0.0]) / 100.0
+
+def fractions(p_half_plus, p_half_minus, edges=edges):
+    '''
+    Fraction of the pressure thickness of a layer, between p_half_plus (surface side)
+    and p_half_minus (TOA side), which lies in each band, as a list of
+    (band index, fraction). The bands which the layer does not reach are left out.
+    '''
+    bounds = [np.inf] + list(edges) + [-np.inf]
+    dp = p_half_plus - p_half_minus
+    # the thickness of the layer at the top of the model may vanish
+    dp = np.where(dp > 0, dp, np.inf)
+    band_fractions = []
+    for k in np.arange(len(bounds) - 1):
+        overlap = np.minimum(p_half_plus, bounds[k]) - np.maximum(p_half_minus, bounds[k+1])
+        if np.any(overlap > 0):
+            band_fractions.append((k, np.maximum(overlap, 0) / dp))
+
+    return band_fractions
+
+class BandSums(object):
+    '''
+    Time sums (band, lat, lon) of the terms of the vertical integral over each band.
+    For each block, start gives the pressure coordinate (wizard.coordinate.HybridLevel),
+    and for each level, level gives its index, before its terms are added.
+    '''
+    def __init__(self, edges=edges):
+        self.edges = edges
+        self.sums = {}
+        self.pressure = None
+        self._fractions = None
+
+    def start(self, pressure):
+        self.pressure = pressure
+
+    def level(self, i):
+        p_half_plus, p_half_minus = self.pressure.half_level(i)
+        self._fractions = fractions(p_half_plus, p_half_minus, self.edges)
+
+    def add(self, name, term):
+        '''
+        Add the term (time, lat, lon) of the current level to the bands of the given name.
+        '''
+        if name not in self.sums:
+            self.sums[name] = np.zeros((len(self.edges) + 1,) + term.shape[1:], dtype=np.float64)
+        band_sum = self.sums[name]
+        for k, fraction in self._fractions:
+            band_sum[k] += np.sum(term * fraction, 0, dtype=np.float64)
@@ -0,0 +1,115 @@
+"""
+Copyright Netherlands eScience Center
+
+Function        : Read-once cache for fields from reanalysis files
+Author          : Yang Liu
+Date            : 2018.1.12
+Last Update     : 2018.1.12
+Description     : The module keeps the fields extracted from the reanalysis files
+                  (NetCDF4/HDF5) in memory, so that each variable of a file is
+                  decompressed only once, even though it is requested by several
+                  stages (mass correction, geopotential and energy flux).
+                  The fields are identified by (file, variable, hyperslab). The
+                  cache has a memory budget and the least recently used fields are
+                  dropped when the budget is exceeded.
+                  A hyperslab of a variable is taken from the whole field if the
+                  whole field is already in the cache.
+Return Value    : numpy arrays (read-only)
+Dependencies    : numpy
+Caveat!!        : The returned arrays are shared by all the stages and therefore set
+                  to read-only. Make a copy before modifying them in place.
+"""
+import numpy as np
+from collections import OrderedDict
+
+class FieldCache(object):
+    '''
+    LRU cache for the fields of the reanalysis files, with a memory budget in
+    bytes. The fields are requested with
+    cache.get(var_key, 'QV')          the whole field
+    cache.get(var_key, 'QV', (-1,))   a hyperslab, e.g. the last time step
+    where var_key is the Dataset of the file.
+    '''
+    def __init__(self, budget):
+        self.budget = budget
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._fields = OrderedDict()
+
+    def __len__(self):
+        return len(self._fields)
+
+    def _file_key(self, var_key):
+        # the path of the file identifies the dataset
+        try:
+            return var_key.filepath()
+        except (AttributeError, ValueError):
+            return id(var_key)
+
+    def _slab_key(self, index):
+        # slice objects are not hashable, which is replaced by their bounds
+        if index is None:
+            return None
+        if not isinstance(index, tuple):
+            index = (index,)
+        return tuple((s.start, s.stop, s.step) if isinstance(s, slice) else s
+                     for s in index)
+
+    def _lookup(self, key):
+        field = self._fields.pop(key)
+        # move to the end, the most recently used
+        self._fields[key] = field
+        return field
+
+    def _store(self, key, field):
+        # protect the shared field against modification in place
+        if isinstance(field, np.ndarray):
+            field.flags.writeable = False
+        size = getattr(field, 'nbytes', 0)
+        if size > self.budget:
+            # a field larger than the budget is passed on without caching
+            return
+        self._fields[key] = field
+        self.nbytes += size
+        # drop the least recently used fields until the budget is met
+        while self.nbytes > self.budget:
+            key_old, field_old = self._fields.popitem(last=False)
+            self.nbytes -= getattr(field_old, 'nbytes', 0)
+
+    def get(self, var_key, name, index=None):
+        '''
+        Get the variable name of the file var_key. The whole field is returned
+        if index is None, otherwise the hyperslab var_key.variables[name][index].
+        '''
+        file_key = self._file_key(var_key)
+        key = (file_key, name, self._slab_key(index))
+        if key in self._fields:
+            self.hits += 1
+            return self._lookup(key)
+        key_whole = (file_key, name, None)
+        if index is not None and key_whole in self._fields:
+            self.hits += 1
+            return self._lookup(key_whole)[index]
+        self.misses += 1
+        if index is None:
+            field = var_key.variables[name][:]
+        else:
+            field = var_key.variables[name][index]
+        self._store(key, field)
+        return field
+
+    def release(self, var_key):
+        '''
+        Drop all the fields of the file var_key, e.g. when the file is closed.
+        '''
+        file_key = self._file_key(var_key)
+        for key in [key for key in self._fields if key[0] == file_key]:
+            self.nbytes -= getattr(self._fields.pop(key), 'nbytes', 0)
+
+    def clear(self):
+        '''
+        Drop all the fields.
+        '''
+        self._fields.clear()
+        self.nbytes = 0
@@ -0,0 +1,68 @@
+"""
+Copyright Netherlands eScience Center
+
+Function        : Monthly checkpoint and restart for long AMET jobs
+Author          : Yang Liu
+Date            : 2018.1.22
+Last Update     : 2018.2.23
+Description     : The module stores the results of each month, together with the state
+                  which is carried over to the next month (e.g. the last time step of
+                  the month for the tendency terms in mass correction), in a numpy
+                  archive (.npz) per month. A job which is stopped (e.g. by the wall time
+                  limit) can resume from the last completed month, instead of starting
+                  the year again.
+                  The archive is first written to a temporary file, which is then renamed,
+                  so that a job stopped while writing never leaves a broken checkpoint.
+Return Value    : dictionary of numpy arrays
+Dependencies    : os, numpy
+Caveat!!        : The checkpoints are identified only by year and month. Remove them
+                  (or use a new checkpoint path) after changing the settings of a job.
+"""
+import os
+import numpy as np
+
+def checkpoint_file(checkpoint_path, year, month):
+    '''
+    Path of the checkpoint of the given year and month.
+    '''
+    return os.path.join(checkpoint_path, 'checkpoint_%d_%02d.npz' % (year, month))
+
+def completed(checkpoint_path, year, month):
+    '''
+    Check whether the given year and month has a checkpoint.
+    '''
+    return os.path.exists(checkpoint_file(checkpoint_path, year, month))
+
+def save(checkpoint_path, year, month, **fields):
+    '''
+    Save the fields (name = array) of the given year and month.
+    '''
+    if not os.path.exists(checkpoint_path):
+        try:
+            os.makedirs(checkpoint_path)
+        except OSError:
+            # created by another job in the meantime
+            if not os.path.isdir(checkpoint_path):
+                raise
+    filename = checkpoint_file(checkpoint_path, year, month)
+    filename_temp = filename + '.%d.tmp' % (os.getpid())
+    with open(filename_temp, 'wb') as checkpoint:
+        np.savez(checkpoint, **fields)
+    # the rename is atomic, the checkpoint is either complete or absent
+    os.rename(filename_temp, filename)
+
+def load(checkpoint_path, year, month):
+    '''
+    Load the fields of the given year and month as a dictionary. None is
+    returned if there is no checkpoint.
+    '''
+    filename = checkpoint_file(checkpoint_path, year, month)
+    if not os.path.exists(filename):
+        return None
+    checkpoint = np.load(filename)
+    try:
+        fields = dict((name, checkpoint[name]) for name in checkpoint.files)
+    finally:
+        checkpoint.close()
+
+    return fields
@@ -0,0 +1,145 @@
+"""
+Copyright Netherlands eScience Center
+
+Function        : Hybrid sigma-pressure coordinate on model levels
+Author          : Yang Liu
+Date            : 2018.1.10
+Last Update     : 2018.1.15
+Description     : The module describes the pressure on the hybrid sigma-pressure
+                  model levels for given surface pressure fields. The half level
+                  pressure is defined by the A and B values:
+                  p_half = A + B * ps
+                  From it the layer thickness dp, the logarithmic pressure ratio
+                  ln(p_half_plus / p_half_minus) and the coefficient alpha (see
+                  equation 2.22 and 2.23 in ECMWF IFS 9220) are derived. Each of
+                  them is computed only once, with broadcasting instead of a loop
+                  over levels, and then reused by the mass correction, geopotential
+                  and energy flux stages.
+                  The module is generic and works with any table of A and B values,
+                  for instance:
+                  MERRA2        72 levels
+                  ERA-Interim   60 levels
+                  JRA55         60 levels
+                  EC-Earth      91 levels
+Return Value    : numpy arrays with axes (..., level, lat, lon)
+Dependencies    : numpy
+Caveat!!        : A must be given in Pa (the A values of MERRA2 are in hPa!).
+                  The order of the A and B values must follow the order of the model
+                  levels in the dataset, either from TOA to surface (MERRA2, ERA-Interim,
+                  EC-Earth) or from surface to TOA (JRA55). The order is recognized
+                  from B, which is 0 at TOA and 1 at the surface.
+"""
+import numpy as np
+
+class HybridLevel(object):
+    '''
+    Pressure coordinate of the hybrid sigma-pressure model levels for the
+    surface pressure ps. The surface pressure can be a single field (lat, lon)
+    or a series of fields (time, lat, lon). The level axis is inserted right
+    before the (lat, lon) axes of all the derived variables.
+    '''
+    def __init__(self, A, B, ps):
+        self.A = np.asarray(A, dtype=float)
+        self.B = np.asarray(B, dtype=float)
+        self.ps = np.asarray(ps)
+        # the levels are from TOA to surface if B increases with the index
+        self.toa_first = self.B[0] < self.B[-1]
+        self._p_half = None
+        self._dp = None
+        self._ln_p = None
+        self._alpha = None
+
+    def __len__(self):
+        # number of full levels
+        return len(self.A) - 1
+
+    def _expand(self, coeff):
+        # reshape the A or B values to broadcast against ps[...,np.newaxis,:,:]
+        return coeff[:,np.newaxis,np.newaxis]
+
+    @property
+    def p_half(self):
+        '''
+        Pressure at each half level [Pa].
+        '''
+        if self._p_half is None:
+            self._p_half = self._expand(self.A) + self._expand(self.B) * self.ps[...,np.newaxis,:,:]
+        return self._p_half
+
+    @property
+    def p_half_plus(self):
+        '''
+        Pressure at the lower (surface side) half level of each layer [Pa].
+        '''
+        if self.toa_first:
+            return self.p_half[...,1:,:,:]
+        else:
+            return self.p_half[...,:-1,:,:]
+
+    @property
+    def p_half_minus(self):
+        '''
+        Pressure at the upper (TOA side) half level of each layer [Pa].
+        '''
+        if self.toa_first:
+            return self.p_half[...,:-1,:,:]
+        else:
+            return self.p_half[...,1:,:,:]
+
+    @property
+    def index_toa(self):
+        '''
+        Index of the top level.
+        '''
+        if self.toa_first:
+            return 0
+        else:
+            return len(self) - 1
+
+    def half_level(self, i):
+        '''
+        Pressure at the lower and upper half level of the layer i [Pa], as
+        (p_half_plus, p_half_minus). Only the two surfaces are computed, so no
+        array with the level axis is created.
+        '''
+        p_current = self.A[i] + self.B[i] * self.ps
+        p_next = self.A[i+1] + self.B[i+1] * self.ps
+        if self.toa_first:
+            return p_next, p_current
+        else:
+            return p_current, p_next
+
+    @property
+    def dp(self):
+        '''
+        Pressure thickness of each layer [Pa].
+        '''
+        if self._dp is None:
+            self._dp = self.p_half_plus - self.p_half_minus
+        return self._dp
+
+    @property
+    def ln_p(self):
+        '''
+        Logarithmic pressure ratio ln(p_half_plus / p_half_minus) of each layer.
+        An exception lies in the TOA, where ln(p_half_plus / 10) is taken.
+        See equation 2.23 in ECMWF IFS 9220.
+        '''
+        if self._ln_p is None:
+            # the pressure at the top half level can be 0, which is replaced below
+            with np.errstate(divide='ignore', invalid='ignore'):
+                self._ln_p = np.log(self.p_half_plus / self.p_half_minus)
+            self._ln_p[...,self.index_toa,:,:] = np.log(self.p_half_plus[...,self.index_toa,:,:] / 10)
+        return self._ln_p
+
+    @property
+    def alpha(self):
+        '''
+        Coefficient alpha for the geopotential on full levels. An exception lies
+        in the TOA, where alpha = ln(2). See equation 2.23 in ECMWF IFS 9220.
+        '''
+        if self._alpha is None:
+            with np.errstate(divide='ignore', invalid='ignore'):
+                self._alpha = 1 - self.p_half_minus / self.dp * self.ln_p
+            self._alpha[...,self.index_toa,:,:] = np.log(2)
+        return self._alpha
@@ -0,0 +1,94 @@
+"""
+Copyright Netherlands eScience Center
+
+Function        : Time sums of the vertical integrals for each day of a month
+Author          : Yang Liu
+Date            : 2018.2.20
+Last Update     : 2018.2.20
+Description     : The AMET scripts reduce the vertical integrals of all the time steps
+                  to the monthly means, so the daily AMET for the study of synoptic
+                  events needed modified scripts which keep (days, lat, lon) pools of
+                  every component. The module collects the time sums of the blocks of
+                  the AMET engine (wizard.engine) by their day (wizard.reader.Block),
+                  together with the state (ps, precipitable water) at the first and the
+                  last time step of each day, for the tendency terms of the daily mass
+                  budget correction.
+                  A day is handed over by the engine as soon as it is complete and the
+                  sums of the day are released, hence only the days which wait for the
+                  state of the next day (daily correction) or for the correction wind
+                  of the month (monthly correction) are kept.
+Return Value    : dictionary of numpy arrays (lat, lon)
+Dependencies    : numpy
+Caveat!!        : With the monthly correction, the sums of all the days of a month are
+                  kept until the end of the month, e.g. 0.4 GB for MERRA2 (361 x 576).
+"""
+import numpy as np
+
+class DailySums(object):
+    '''
+    Time sums (lat, lon) of the given names (e.g. wizard.engine.terms) for each day
+    of a month, as a list of records (dictionaries) in order of time with:
+    day                     day of the month (from 1)
+    sums                    dictionary of the time sums, None once released
+    steps                   number of time steps
+    state_start, state_end  state (ps, precipitable water) at the first and the
+                            last time step
+    '''
+    def __init__(self, names):
+        self.names = names
+        self.days = []
+
+    def add(self, day, sums, steps, state_first, state_last):
+        '''
+        Add the time sums of a block, all of whose time steps are in the given day.
+        '''
+        if day is None:
+            raise ValueError("The day of the block is not given by the reader.")
+        if self.days and self.days[-1]['day'] == day:
+            record = self.days[-1]
+            for name in self.names:
+                record['sums'][name] += sums[name]
+            record['steps'] += steps
+            record['state_end'] = state_last
+        else:
+            # the sums of the block are not shared with the month
+            self.days.append({'day': day,
+                              'sums': dict((name, np.array(sums[name], dtype=np.float64)) for name in self.names),
+                              'steps': steps,
+                              'state_start': state_first,
+                              'state_end': state_last})
+
+    def mean(self, index):
+        '''
+        Daily mean of the fields of the day (index in days).
+        '''
+        record = self.days[index]
+        return dict((name, record['sums'][name] / record['steps']) for name in self.names)
+
+    def neighbours(self, index, state_before=None, state_after=None):
+        '''
+        The state at the last time step of the previous day and at the first time
+        step of the next day, the given states for the first and the last day.
+        '''
+        if index > 0:
+            state_before = self.days[index - 1]['state_end']
+        if index < len(self.days) - 1:
+            state_after = self.days[index + 1]['state_start']
+        return state_before, state_after
+
+    def complete(self):
+        '''
+        Index of the days which are complete and whose neighbours are both known
+        in the month, which are not released yet.
+        '''
+        return [index for index in np.arange(1, len(self.days) - 1) if self.days[index]['sums'] is not None]
+
+    def pending(self):
+        '''
+        Index of the days which are not released yet.
+        '''
+        return [index for index in np.arange(len(self.days)) if self.days[index]['sums'] is not None]
+
+    def release(self, index):
+        # only the states at the edges of the day are kept
+        self.days[index]['sums'] = None
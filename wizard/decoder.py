@@ -0,0 +1,104 @@
+"""
+Copyright Netherlands eScience Center
+
+Function        : Concurrent decoding of GRIB files into shared buffers
+Author          : Yang Liu
+Date            : 2018.1.29
+Last Update     : 2018.2.5
+Description     : Decoding GRIB messages (unpacking of the values) is CPU bound and the
+                  variables are independent of each other. The module decodes the
+                  files of several variables (e.g. hgt, tmp, ugrd, vgrd and spfh of a
+                  JRA55 chunk) at the same time, one worker per file.
+                  The decoder of pygrib holds the global interpreter lock, therefore
+                  worker processes are used by default. The decoded values are written
+                  in place into buffers in shared memory, which are allocated once and
+                  reused for every chunk, so no array is sent back through a pipe.
+                  With threads = True a thread pool and plain arrays are used instead,
+                  which is worth it only for a decoder which releases the lock.
+                  The messages are located through the message index (wizard.gribindex).
+                  A chunk which spans several files is filled file by file, with the
+                  offset of the messages of each file in the buffers.
+                  With several buffer sets, a chunk can be decoded into one set while
+                  the previous chunk in another set is still in use (wizard.prefetch).
+Return Value    : numpy arrays (views of the shared buffers)
+Dependencies    : multiprocessing, numpy, wizard.gribindex
+Caveat!!        : The arrays returned by decode are views of the buffers and are
+                  overwritten by the next call. Copy the fields which must outlive
+                  the chunk.
+"""
+import multiprocessing
+import multiprocessing.dummy
+import numpy as np
+import wizard.gribindex
+
+# shared buffers of the worker processes, passed at the start of the pool
+_buffers = None
+
+def _init_worker(buffers):
+    global _buffers
+    _buffers = buffers
+
+def _as_array(buffer, shape):
+    # numpy view of a shared buffer
+    return np.frombuffer(buffer, dtype=np.float64).reshape(shape)
+
+def _decode(task):
+    # decode the messages of a single file into the buffer k, from the given offset
+    k, filename, numbers, offset, index_path = task
+    buffer, shape = _buffers[k]
+    values = _as_array(buffer, shape).reshape((-1,) + shape[-2:])
+    grib = wizard.gribindex.MessageIndex(filename, index_path)
+    try:
+        grib.values(numbers, out=values[offset:offset+len(numbers)])
+    finally:
+        grib.close()
+    return k
+
+class ParallelDecoder(object):
+    '''
+    Decoder of the given number of variables, with a buffer for each of them which
+    holds a field of the given shape (e.g. (time, level, lat, lon) of the largest
+    chunk). The index_path is the directory of the GRIB message index (None to
+    keep it next to the GRIB files). Each of the given number of buffer sets
+    holds a buffer for every variable.
+    '''
+    def __init__(self, variables, shape, index_path=None, threads=False, sets=1):
+        self.variables = variables
+        self.shape = tuple(shape)
+        self.index_path = index_path
+        self.threads = threads
+        size = int(np.prod(self.shape))
+        if threads:
+            self._buffers = [(np.empty(size, dtype=np.float64), self.shape) for k in range(variables * sets)]
+            _init_worker(self._buffers)
+            self._pool = multiprocessing.dummy.Pool(processes=variables)
+        else:
+            self._buffers = [(multiprocessing.RawArray('d', size), self.shape) for k in range(variables * sets)]
+            self._pool = multiprocessing.Pool(processes=variables, initializer=_init_worker,
+                                              initargs=(self._buffers,))
+        # numpy views of the buffers, set after set
+        self.arrays = [_as_array(buffer, shape) for buffer, shape in self._buffers]
+
+    def decode(self, filenames, numbers, shape, offset=0, buffer_set=0):
+        '''
+        Decode the messages with the given numbers (from 1) of each file into the
+        buffer of each variable in the given buffer set, starting at the message
+        offset in the buffer. The fields are returned as arrays with the given
+        shape, which must not be larger than the buffers in the first axis and
+        must hold the messages up to the offset plus the decoded ones.
+        '''
+        if len(filenames) > self.variables:
+            raise ValueError("%d files for %d buffers." % (len(filenames), self.variables))
+        if buffer_set * self.variables >= len(self.arrays):
+            raise ValueError("No buffer set %d." % (buffer_set))
+        if shape[0] > self.shape[0] or int(np.prod(shape)) < (offset + len(numbers)) * int(np.prod(self.shape[-2:])):
+            raise ValueError("The shape %s does not fit the buffers %s." % (shape, self.shape))
+        first = buffer_set * self.variables
+        tasks = [(first + k, filename, numbers, offset, self.index_path) for k, filename in enumerate(filenames)]
+        for k in self._pool.imap_unordered(_decode, tasks):
+            pass
+        return [array[:shape[0]].reshape(shape) for array in self.arrays[first:first+len(filenames)]]
+
+    def close(self):
+        self._pool.close()
+        self._pool.join()
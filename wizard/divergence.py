@@ -0,0 +1,53 @@
+"""
+Copyright Netherlands eScience Center
+
+Function        : Horizontal divergence on regular latitude-longitude grid
+Author          : Yang Liu
+Date            : 2018.1.8
+Last Update     : 2018.1.8
+Description     : The module provides the finite difference operators for the zonal
+                  and meridional divergence of vertically integrated fluxes, which are
+                  used in the mass budget correction. Instead of looping over each grid
+                  point, the whole field is handled in a single numpy expression.
+                  The operators reproduce the scheme used in the AMET scripts:
+                  zonal      - central difference, periodic in longitude
+                  meridional - central difference, one-sided at the first and last
+                               latitude (polar rows)
+Return Value    : numpy arrays with the same shape as the input
+Dependencies    : numpy
+Caveat!!        : The last two axes of the input field must be (latitude, longitude).
+                  Any leading axes (e.g. time) are carried along.
+"""
+import numpy as np
+
+def zonal(flux_int, dx):
+    '''
+    Zonal divergence of a vertically integrated flux. The longitude is
+    wrapped periodically, so the first and last columns are neighbours.
+    dx is the zonal grid length at each latitude [m].
+    '''
+    flux_int = np.asarray(flux_int)
+    dx = np.asarray(dx, dtype=float)
+    # the longitude could be from 0 to 360 or -180 to 180, but the index remains the same
+    # roll by -1 gives the value at j+1 and roll by 1 gives the value at j-1
+    return (np.roll(flux_int, -1, axis=-1) - np.roll(flux_int, 1, axis=-1)) / (2 * dx[:,np.newaxis])
+
+def meridional(flux_int, dy, descending=False):
+    '''
+    Meridional divergence of a vertically integrated flux. A central difference
+    is used in the interior and the polar rows take the one-sided difference with
+    their only neighbour (still divided by 2*dy, as in the original scheme).
+    dy is the meridional grid length [m]. For datasets with latitude from north
+    to south (e.g. ERA-Interim, JRA55) set descending = True to flip the sign.
+    '''
+    flux_int = np.asarray(flux_int)
+    div_flux = np.empty(flux_int.shape, dtype=np.result_type(flux_int, float))
+    # interior points
+    div_flux[...,1:-1,:] = (flux_int[...,2:,:] - flux_int[...,:-2,:]) / (2 * dy)
+    # polar rows
+    div_flux[...,0,:] = (flux_int[...,1,:] - flux_int[...,0,:]) / (2 * dy)
+    div_flux[...,-1,:] = (flux_int[...,-1,:] - flux_int[...,-2,:]) / (2 * dy)
+    if descending:
+        np.negative(div_flux, out=div_flux)
+
+    return div_flux
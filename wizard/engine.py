@@ -0,0 +1,429 @@
+"""
+Copyright Netherlands eScience Center
+
+Function        : AMET engine shared by all the reanalysis datasets
+Author          : Yang Liu
+Date            : 2018.1.24
+Last Update     : 2018.2.23
+Description     : The module quantifies the monthly mean atmospheric meridional energy
+                  transport, including the mass budget correction, from the blocks of
+                  fields handed over by a dataset adapter (wizard.reader). The complete
+                  procedure is:
+                  1. vertical integrals of the moisture and mass flux, and the
+                     precipitable water, for each block (wizard.flux)
+                  2. geopotential on model levels, unless it is given by the dataset
+                     (wizard.geopotential)
+                  3. vertical integrals of the energy flux terms (wizard.flux)
+                  4. tendency terms, E-P, mass residual and barotropic correction wind
+                  5. corrected energy transport on each grid point and zonal integral
+                  Only the time sums of the vertically integrated fields (lat, lon) are
+                  kept between the blocks. The divergence operators are linear, hence
+                  they are applied once to the monthly mean fluxes instead of to each
+                  time step.
+                  The next block is read by a background thread while the current one
+                  is processed (wizard.prefetch), with at most two blocks in memory.
+                  With a snapshot path, the states (ps, precipitable water) at the first
+                  and the last time step of each month are kept in a store (wizard.snapshot),
+                  where the tendency terms of the adjacent months take them from.
+                  With a timer (wizard.timing), the stages retrieve (waiting for each
+                  block), flux, tendency, divergence and correction are measured.
+                  With mean2int, the vertical integrals of the monthly mean fields are
+                  taken from the same blocks as well (wizard.ordering), and the AMET of
+                  both orderings and their difference (int2mean - mean2int) are given.
+                  With sectors, the energy transport at each grid point is integrated
+                  over each longitude sector or basin as well (wizard.sector).
+                  With bands, the vertical integrals are split into pressure bands on
+                  the way through the levels (wizard.bands), and the AMET of each band
+                  is given along with the full column.
+                  With a daily callback, the corrected AMET of each day is handed over
+                  as soon as it is known (wizard.daily), or with prefetch as soon as
+                  the reading of the month is finished, with either the barotropic
+                  correction wind of the month or a correction of its own, which takes
+                  the daily mean fluxes and the tendency terms over the day.
+                  The barotropic correction wind is either taken at each grid point from
+                  the mass residual (local), or as the divergent wind of Trenberth (1991)
+                  from the Poisson equation of the mass residual (poisson, wizard.poisson).
+                  Mass correction is accmpolished through the correction of barotropic wind:
+                  mass residual = surface pressure tendency + divergence of mass flux (u,v) - (E-P)
+                  E-P = evaporation - precipitation = moisture tendency - divergence of moisture flux(u,v)
+Return Value    : dictionary of numpy arrays
+Dependencies    : calendar, numpy
+                  wizard.bands, wizard.coordinate, wizard.daily, wizard.divergence, wizard.flux,
+                  wizard.geopotential, wizard.ordering, wizard.poisson, wizard.prefetch, wizard.sector, wizard.snapshot,
+                  wizard.timing
+Caveat!!        : The meridional barotropic correction wind is set to 0 on the polar
+                  rows of the reader (e.g. the first and the last latitude), as in the
+                  AMET script of each dataset.
+                  The geopotential is streamed level by level into the energy flux, so
+                  it is measured as part of the flux stage.
+                  The netCDF4 and HDF5 libraries are not thread safe, so with prefetch
+                  the daily callback is not called while the next block is being read.
+"""
+import calendar
+import numpy as np
+import wizard.bands
+import wizard.coordinate
+import wizard.daily
+import wizard.divergence
+import wizard.flux
+import wizard.geopotential
+import wizard.ordering
+import wizard.poisson
+import wizard.prefetch
+import wizard.sector
+import wizard.snapshot
+import wizard.timing
+
+# name of the time sums kept through a month
+terms = ('moisture_flux_u_int', 'moisture_flux_v_int', 'mass_flux_u_int', 'mass_flux_v_int',
+         'precipitable_water', 'ps',
+         'internal_flux_int', 'latent_flux_int', 'geopotential_flux_int', 'kinetic_flux_int',
+         'heat_flux_int', 'vapor_flux_int', 'geo_flux_int', 'velocity_flux_int')
+
+# energy components: (output name, energy flux, energy for the correction)
+components = (('E_cpT', 'internal_flux_int', 'heat_flux_int'),
+              ('E_Lvq', 'latent_flux_int', 'vapor_flux_int'),
+              ('E_gz', 'geopotential_flux_int', 'geo_flux_int'),
+              ('E_uv2', 'kinetic_flux_int', 'velocity_flux_int'))
+
+class AMETEngine(object):
+    '''
+    Monthly AMET of the dataset behind the reader (wizard.reader.Reader).
+    The constant dictionary must contain 'g', 'R', 'cp', 'Lv', 'R_dry' and 'R_vap'.
+    The energy flux is computed in dtype, either np.float64 or np.float32, and
+    in single precision with compensated summation.
+    With prefetch, the blocks are read ahead in a background thread. With a
+    snapshot_path, the states at the edges of the months are kept in a store.
+    The stages of each month are measured by the timer (wizard.timing.StageTimer).
+    With mean2int, the AMET of the vertical integrals of the monthly mean fields
+    is computed in the same pass. The sectors are given as a list of (name, (west, east))
+    or (name, weights (lat, lon)), see wizard.sector. The bands are given by the
+    edges of the pressure bands [Pa] from the surface to TOA, see wizard.bands.
+    With daily_correction, the daily AMET (see month) is corrected with the mass
+    budget of each day, otherwise with the correction wind of the month.
+    The correction wind is 'local' (mass residual * dy / column mass at each grid
+    point) or 'poisson' (the divergent wind which balances the mass residual).
+    '''
+    def __init__(self, reader, constant, dtype=np.float64, prefetch=True, snapshot_path=None,
+                 timer=None, mean2int=False, sectors=None, bands=None, daily_correction=False,
+                 correction='local'):
+        self.reader = reader
+        self.constant = constant
+        self.dtype = dtype
+        self.prefetch = prefetch
+        self.snapshot_path = snapshot_path
+        if timer is None:
+            # nothing is recorded
+            timer = wizard.timing.StageTimer()
+        self.timer = timer
+        self.mean2int = mean2int
+        self.sectors = sectors
+        self.sector_masks = None
+        self.bands = bands
+        self.daily_correction = daily_correction
+        if correction not in ('local', 'poisson'):
+            raise ValueError("Unknown barotropic correction %s." % (correction))
+        self.correction = correction
+        self.solver = None
+        self.dx = None
+        self.dy = None
+
+    def _grid(self):
+        # the earth is taken as a perfect sphere, instead of a ellopsoid
+        latitude = np.asarray(self.reader.latitude, dtype=float)
+        self.dx = 2 * np.pi * self.constant['R'] * np.cos(2 * np.pi * latitude / 360) / len(self.reader.longitude)
+        self.dy = self.reader.dy(self.constant['R'])
+        if self.correction == 'poisson':
+            # the elimination of the solver is done once for the grid
+            self.solver = wizard.poisson.PoissonSolver(latitude, self.reader.longitude, self.constant['R'])
+
+    def _moisture(self, ps, q):
+        # precipitable water of a single time step
+        dp_level = wizard.coordinate.HybridLevel(self.reader.A, self.reader.B, ps).dp
+        return np.sum(q * dp_level, 0) / self.constant['g']
+
+    def accumulate(self, block, level_sums=None, band_sums=None):
+        '''
+        Vertical integrals of a single block. The time sums of the fields (lat, lon)
+        are returned as a dictionary, together with the state (ps, precipitable water)
+        at the first and the last time step of the block. With level_sums
+        (wizard.ordering.LevelSums), the fields on each level are added to it.
+        With band_sums (wizard.bands.BandSums), the energy flux terms are added to
+        the pressure bands.
+        '''
+        constant = self.constant
+        pressure = wizard.coordinate.HybridLevel(self.reader.A, self.reader.B, block.ps)
+        dp_level = pressure.dp
+        mass_terms = wizard.flux.mass_flux_int(block.q, block.u, block.v, dp_level, constant)
+        if block.gz is None:
+            # the geopotential is streamed level by level into the energy flux
+            gz = wizard.geopotential.full_level(block.T, block.q, block.z, pressure, constant)
+        else:
+            gz = block.gz
+        if level_sums is not None:
+            level_sums.add(block.T, block.q, block.u, block.v, block.ps)
+            gz = level_sums.geopotential(gz, block.v)
+        if band_sums is not None:
+            band_sums.start(pressure)
+        energy_terms = wizard.flux.energy_flux_int(block.T, block.q, block.u, block.v, gz, dp_level,
+                                                   constant, dtype=self.dtype,
+                                                   compensated=(self.dtype != np.float64),
+                                                   bands=band_sums)
+        fields = mass_terms + (np.asarray(block.ps),) + energy_terms
+        sums = dict((name, np.sum(field, 0, dtype=np.float64)) for name, field in zip(terms, fields))
+        precipitable_water = mass_terms[4]
+        state_first = (block.ps[0], precipitable_water[0])
+        state_last = (block.ps[-1], precipitable_water[-1])
+
+        return sums, state_first, state_last
+
+    def edge_states(self, year, month, state_start, state_end):
+        '''
+        The state (ps, precipitable water) at the last time step of the previous
+        month and at the first time step of the next month. With a snapshot path,
+        the states of the given month are saved, the states of the adjacent months
+        are taken from the store, and only the missing ones are read by the reader.
+        Every reader provides the states of the adjacent months within the period of
+        the dataset, so the tendency terms do not depend on the order of the runs.
+        '''
+        state_before = None
+        state_after = None
+        if self.snapshot_path is not None:
+            wizard.snapshot.save(self.snapshot_path, year, month, 'first', *state_start)
+            wizard.snapshot.save(self.snapshot_path, year, month, 'last', *state_end)
+            state_before, state_after = wizard.snapshot.neighbours(self.snapshot_path, year, month)
+        if state_before is None or state_after is None:
+            edge_before, edge_after = self.reader.edge_states(year, month)
+            if state_before is None and edge_before is not None:
+                state_before = (edge_before[0], self._moisture(*edge_before))
+                if self.snapshot_path is not None:
+                    year_before, month_before = wizard.snapshot.previous_month(year, month)
+                    wizard.snapshot.save(self.snapshot_path, year_before, month_before, 'last', *state_before)
+            if state_after is None and edge_after is not None:
+                state_after = (edge_after[0], self._moisture(*edge_after))
+                if self.snapshot_path is not None:
+                    year_after, month_after = wizard.snapshot.next_month(year, month)
+                    wizard.snapshot.save(self.snapshot_path, year_after, month_after, 'first', *state_after)
+
+        return state_before, state_after
+
+    def month(self, year, month, daily=None):
+        '''
+        Monthly mean AMET of the given month. The dictionary contains (TW for energy):
+        E, E_cpT, E_Lvq, E_gz, E_uv2                zonal integral (lat)
+        E_point, E_cpT_point, ... E_uv2_point      each grid point (lat, lon)
+        uc, vc                                     barotropic correction wind [m/s]
+        E_P, mass_residual                         terms of the mass budget (lat, lon)
+        With mean2int, the same fields of the mean2int ordering are added with the
+        suffix _mean2int (e.g. E_mean2int, E_mean2int_point, uc_mean2int), and the
+        difference int2mean - mean2int of the energy transport with the suffix
+        _difference (e.g. E_difference, E_difference_point).
+        With sectors, the integral over each sector of every field of the energy
+        transport is added with the name of the sector (e.g. E_cpT_Atlantic,
+        E_mean2int_Pacific).
+        With bands, the zonal integral of the energy transport in each pressure band
+        is added with the suffix _band (band, lat), e.g. E_band, E_cpT_band.
+        With daily, a function daily(day, results) is called for each day of the month
+        (from 1) as soon as its AMET is known, with prefetch only once all the blocks of
+        the month are read, since the function may write files. The results of a day
+        contain the energy transport (E, E_cpT, ... E_point, ... and the sectors), and
+        with the daily correction the terms of the daily mass budget (uc, vc, E_P,
+        mass_residual).
+        The days are not given in order, the first day waits for the end of the month.
+        '''
+        sums = None
+        steps = 0
+        state_start = None
+        if self.mean2int:
+            level_sums = wizard.ordering.LevelSums()
+        else:
+            level_sums = None
+        if self.bands:
+            band_sums = wizard.bands.BandSums(self.bands)
+        else:
+            band_sums = None
+        if daily is None:
+            daily_sums = None
+        elif self.daily_correction:
+            daily_sums = wizard.daily.DailySums(terms)
+        else:
+            # the correction wind of the month is applied to the energy of each day
+            daily_sums = wizard.daily.DailySums(sum([component[1:] for component in components], ()))
+        # days which are complete, but wait for the end of the reading to be handed over
+        finished = []
+        blocks = self.reader.blocks(year, month)
+        if self.prefetch:
+            # read the next block while the current one is processed
+            blocks = wizard.prefetch.background(blocks, buffers=2)
+        blocks = self.timer.iterate('retrieve', blocks, year=year, month=month)
+        for n, block in enumerate(blocks):
+            if self.dx is None:
+                self._grid()
+            with self.timer.stage('flux', year=year, month=month, block=n):
+                block_sums, state_first, state_last = self.accumulate(block, level_sums, band_sums)
+            if sums is None:
+                sums = block_sums
+                state_start = state_first
+            else:
+                for name in terms:
+                    sums[name] += block_sums[name]
+            state_end = state_last
+            steps += len(block)
+            if daily_sums is not None:
+                daily_sums.add(block.day, block_sums, len(block), state_first, state_last)
+                if self.daily_correction:
+                    for index in daily_sums.complete():
+                        finished.append((daily_sums.days[index]['day'], self.day(daily_sums, index, year=year, month=month)))
+                # the callback may write files, which must not happen while the
+                # background thread is reading (wizard.prefetch)
+                if not self.prefetch:
+                    while finished:
+                        daily(*finished.pop(0))
+        while finished:
+            daily(*finished.pop(0))
+        if sums is None:
+            raise ValueError("No data for %d (y) - %d (m)." % (year, month))
+        mean = dict((name, sums[name] / steps) for name in terms)
+        # tendency terms (one day has 86400s)
+        # centred differences over the edges of the month if the states are available
+        period = calendar.monthrange(year, month)[1] * 86400
+        with self.timer.stage('tendency', year=year, month=month):
+            state_before, state_after = self.edge_states(year, month, state_start, state_end)
+            ps_tendency, moisture_tendency = wizard.snapshot.tendency(state_before, state_start, state_end,
+                                                                      state_after, period)
+        results = self.budget(mean, ps_tendency, moisture_tendency, year=year, month=month)
+        if daily_sums is not None:
+            # the first and the last day of the month, or all of them
+            for index in daily_sums.pending():
+                if self.daily_correction:
+                    day_results = self.day(daily_sums, index, state_before, state_after, year=year, month=month)
+                else:
+                    day_results = self.day(daily_sums, index, vc=results['vc'], year=year, month=month)
+                daily(daily_sums.days[index]['day'], day_results)
+        if band_sums is not None:
+            with self.timer.stage('correction', year=year, month=month, band=True):
+                results.update(self.band_transport(band_sums, steps, results['vc']))
+        if level_sums is not None:
+            with self.timer.stage('flux', year=year, month=month, ordering='mean2int'):
+                mean = level_sums.integrals(self.reader.A, self.reader.B, self.constant)
+            results_mean2int = self.budget(mean, ps_tendency, moisture_tendency,
+                                           year=year, month=month, ordering='mean2int')
+            for name, value in results_mean2int.items():
+                if name.endswith('_point'):
+                    results[name[:-len('_point')] + '_mean2int_point'] = value
+                else:
+                    results[name + '_mean2int'] = value
+            # contribution of the sub-monthly covariance
+            for name in ('E',) + tuple([component[0] for component in components]):
+                results[name + '_difference'] = results[name] - results_mean2int[name]
+                results[name + '_difference_point'] = results[name + '_point'] - results_mean2int[name + '_point']
+        self.sector_integrals(results, year=year, month=month)
+
+        return results
+
+    def sector_integrals(self, results, **labels):
+        '''
+        Add the integral over each sector of the energy transport at each grid point
+        (e.g. E_point, E_cpT_mean2int_point) to the results, if sectors are given.
+        '''
+        if not self.sectors:
+            return
+        with self.timer.stage('correction', sector=True, **labels):
+            if self.sector_masks is None:
+                self.sector_masks = wizard.sector.masks(self.reader.latitude, self.reader.longitude, self.sectors)
+            for name in [name for name in results if name.startswith('E') and name.endswith('_point')]:
+                for sector, weights in self.sector_masks:
+                    results[name[:-len('_point')] + '_' + sector] = wizard.sector.integral(results[name], weights)
+
+    def day(self, daily_sums, index, state_before=None, state_after=None, vc=None, **labels):
+        '''
+        AMET of a single day (index in the days of wizard.daily.DailySums), either with
+        the given barotropic correction wind vc (e.g. of the month), or with the mass
+        budget of the day. The tendency terms of the day are taken over the edges
+        of the day, the states at the edges of the month are given for the first
+        and the last day. The sums of the day are released.
+        '''
+        labels['day'] = daily_sums.days[index]['day']
+        mean = daily_sums.mean(index)
+        if vc is None:
+            state_before, state_after = daily_sums.neighbours(index, state_before, state_after)
+            record = daily_sums.days[index]
+            # one day has 86400s
+            ps_tendency, moisture_tendency = wizard.snapshot.tendency(state_before, record['state_start'],
+                                                                      record['state_end'], state_after, 86400)
+            results = self.budget(mean, ps_tendency, moisture_tendency, **labels)
+        else:
+            with self.timer.stage('correction', **labels):
+                results = self.transport(mean, vc)
+        daily_sums.release(index)
+        self.sector_integrals(results, **labels)
+
+        return results
+
+    def budget(self, mean, ps_tendency, moisture_tendency, **labels):
+        '''
+        Mass budget correction and corrected AMET of the monthly means of the
+        vertical integrals (named as terms), with the tendency terms of the month.
+        The labels (e.g. year and month) are given to the stages of the timer.
+        '''
+        constant = self.constant
+        # divergence of the monthly mean fluxes
+        descending = self.reader.latitude_descending
+        with self.timer.stage('divergence', **labels):
+            div_moisture_flux = wizard.divergence.zonal(mean['moisture_flux_u_int'], self.dx) +\
+                                wizard.divergence.meridional(mean['moisture_flux_v_int'], self.dy, descending)
+            div_mass_flux = wizard.divergence.zonal(mean['mass_flux_u_int'], self.dx) +\
+                            wizard.divergence.meridional(mean['mass_flux_v_int'], self.dy, descending)
+        with self.timer.stage('correction', **labels):
+            # calculate evaporation minus precipitation
+            E_P = moisture_tendency + div_moisture_flux
+            # calculate the mass residual
+            mass_residual = ps_tendency + constant['g'] * div_mass_flux - constant['g'] * E_P
+            # calculate barotropic correction wind
+            column_mass = mean['ps'] - constant['g'] * mean['precipitable_water']
+            if self.solver is None:
+                uc = mass_residual * self.dx[:,np.newaxis] / column_mass
+                vc = mass_residual * self.dy / column_mass
+            else:
+                uc, vc = wizard.poisson.correction_wind(self.solver, mass_residual, column_mass, constant['g'])
+            # extra modification for points at polor mesh (reader.polar_rows)
+            vc[list(self.reader.polar_rows),:] = 0
+            results = {'uc': uc, 'vc': vc, 'E_P': E_P, 'mass_residual': mass_residual}
+            results.update(self.transport(mean, vc))
+
+        return results
+
+    def transport(self, mean, vc):
+        '''
+        Energy transport on each grid point and zonal integral [TW], corrected with
+        the meridional barotropic correction wind vc, from the means of the vertical
+        integrals of the energy flux and the energy (named as terms).
+        '''
+        results = {}
+        E_point = np.zeros(vc.shape, dtype=float)
+        for name, flux, energy in components:
+            point = (mean[flux] - vc * mean[energy]) * self.dx[:,np.newaxis] / 1e+12
+            results[name + '_point'] = point
+            results[name] = np.sum(point, 1)
+            E_point += point
+        results['E_point'] = E_point
+        results['E'] = np.sum(E_point, 1)
+
+        return results
+
+    def band_transport(self, band_sums, steps, vc):
+        '''
+        Zonal integral of the corrected AMET in each pressure band (band, lat), from
+        the time sums of the bands (wizard.bands.BandSums). The barotropic correction
+        wind vc of the full column is applied to the energy in each band, hence the
+        sum over the bands is the AMET of the full column.
+        '''
+        results = {}
+        E_band = 0
+        for name, flux, energy in components:
+            point = (band_sums.sums[flux] - vc * band_sums.sums[energy]) / steps * self.dx[:,np.newaxis] / 1e+12
+            results[name + '_band'] = np.sum(point, -1)
+            E_band = E_band + results[name + '_band']
+        results['E_band'] = E_band
+
+        return results
@@ -0,0 +1,92 @@
+"""
+Copyright Netherlands eScience Center
+
+Function        : Process pool for the daily computation in the AMET scripts
+Author          : Yang Liu
+Date            : 2018.1.19
+Last Update     : 2018.2.23
+Description     : The module fans independent pieces of work (e.g. the mass correction
+                  divergence, geopotential and energy flux of each daily file) out to
+                  a pool of worker processes. The results are handed back to the main
+                  process as soon as they are ready, where they are reduced into the
+                  monthly data pools.
+                  The number of workers is derived from a memory budget and the memory
+                  needed by a single worker, instead of being tuned by hand. The budget
+                  is the memory of the node (as allocated by Slurm, or the physical
+                  memory) shared by the jobs which run on the node at the same time.
+                  The number of these jobs is derived from the same memory, so that
+                  each job has room for its main process and at least one worker.
+Return Value    : results of the work function
+Dependencies    : os, multiprocessing
+Caveat!!        : The work function and its arguments are sent to the worker processes,
+                  so they must be picklable. Pass the date (year, month, day) and open
+                  the files in the worker, instead of passing the netCDF4 Dataset.
+                  The work function must be defined at the top level of the module.
+                  Each worker process fills its own copy of the caches of the module
+                  (e.g. wizard.cache.FieldCache), which belongs to the memory per worker.
+"""
+import os
+import multiprocessing
+
+def node_memory(jobs=1, reserved=0):
+    '''
+    Memory [bytes] available to each of the given number of jobs on the node, after
+    the reserved memory of each job (e.g. its main process). The memory of the node
+    is taken from SLURM_MEM_PER_NODE [MB] if the job is started by Slurm with a
+    memory request, otherwise it is the physical memory.
+    '''
+    if os.environ.get('SLURM_MEM_PER_NODE'):
+        memory = int(os.environ['SLURM_MEM_PER_NODE']) * 1024**2
+    else:
+        memory = os.sysconf('SC_PHYS_PAGES') * os.sysconf('SC_PAGE_SIZE')
+    return max(memory // max(jobs, 1) - reserved, 0)
+
+def job_count(memory_per_job, memory_per_worker, max_jobs=None):
+    '''
+    Number of jobs (e.g. one year each) which can run on the node at the same time,
+    each with the memory of its main process [bytes] and at least one worker. It is
+    limited by the memory of the node (node_memory), the number of processors and
+    max_jobs, and is at least 1.
+    '''
+    jobs = int(node_memory() // (memory_per_job + memory_per_worker))
+    jobs = min(jobs, multiprocessing.cpu_count())
+    if max_jobs is not None:
+        jobs = min(jobs, max_jobs)
+
+    return max(jobs, 1)
+
+def worker_count(memory_budget, memory_per_worker, max_workers=None):
+    '''
+    Number of worker processes which fit in the memory budget [bytes], given
+    the memory needed by each worker [bytes]. It is limited by the number of
+    processors and max_workers, and is at least 1.
+    '''
+    workers = int(memory_budget // memory_per_worker)
+    workers = min(workers, multiprocessing.cpu_count())
+    if max_workers is not None:
+        workers = min(workers, max_workers)
+
+    return max(workers, 1)
+
+def map_unordered(function, tasks, workers, maxtasksperchild=1):
+    '''
+    Apply function to each of the tasks with the given number of worker processes
+    and yield the results in the order they are finished. Each worker process is
+    replaced after maxtasksperchild tasks, which returns its memory to the system.
+    With a single worker, the tasks are done in the current process.
+    '''
+    if workers <= 1:
+        for task in tasks:
+            yield function(task)
+        return
+    pool = multiprocessing.Pool(processes=workers, maxtasksperchild=maxtasksperchild)
+    try:
+        for result in pool.imap_unordered(function, tasks):
+            yield result
+        pool.close()
+    except:
+        # stop the remaining tasks if anything goes wrong
+        pool.terminate()
+        raise
+    finally:
+        pool.join()
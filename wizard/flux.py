@@ -0,0 +1,154 @@
+"""
+Copyright Netherlands eScience Center
+
+Function        : Vertical integral of the energy flux terms on model levels
+Author          : Yang Liu
+Date            : 2018.1.9
+Last Update     : 2018.2.19
+Description     : The module computes the vertically integrated energy flux terms
+                  which are the components of the atmospheric meridional energy
+                  transport, together with the vertically integrated energy used
+                  for the barotropic (mass budget) correction:
+                  internal energy flux      cp * v * T * dp / g
+                  latent heat flux          Lv * v * q * dp / g
+                  geopotential flux         v * gz * dp / g
+                  kinetic energy flux       v * 1/2 * (u2 + v2) * dp / g
+                  internal energy           cp * T * dp / g
+                  latent heat               Lv * q * dp / g
+                  geopotential              gz * dp / g
+                  kinetic energy            1/2 * (u2 + v2) * dp / g
+                  The vertically integrated moisture and mass flux, and the precipitable
+                  water, for the mass budget correction are taken in the same manner.
+                  All eight terms are accumulated in a single walk through the
+                  model levels. Only (time, lat, lon) accumulators are kept, so no
+                  4D product array is ever created. The geopotential can be fed
+                  level by level while it is being integrated (wizard.geopotential).
+                  The terms of each level can be split into pressure bands on the
+                  way (wizard.bands).
+Return Value    : numpy arrays (time, lat, lon)
+Dependencies    : numpy
+                  wizard.summation
+variables       : Absolute Temperature              T         [K]
+                  Specific Humidity                 q         [kg/kg]
+                  Zonal Wind                        u         [m/s]
+                  Meridional Wind                   v         [m/s]
+                  Geopotential                      gz        [m2/s2]
+                  Pressure thickness of each layer  dp        [Pa]
+Caveat!!        : The input fields must have the axes (time, level, lat, lon).
+"""
+import numpy as np
+from wizard.summation import RunningSum, CompensatedSum
+
+def energy_flux_int(T, q, u, v, gz, dp_level, constant, dtype=float, compensated=False, bands=None):
+    '''
+    Take the vertical integral of the eight energy flux terms in one pass.
+    The constant dictionary must contain 'g', 'cp' and 'Lv'.
+    gz is either the geopotential (time, level, lat, lon) or an iterator which
+    yields (level index, geopotential of the level), e.g. the streamed integral
+    wizard.geopotential.full_level, so that the 4D geopotential is never stored.
+    The fields are computed in dtype. For single precision (np.float32) set
+    compensated = True to take the vertical integrals with compensated summation.
+    With bands (wizard.bands.BandSums, started with the pressure of the block),
+    the terms of each level are added to the pressure bands as well.
+    The return values are in the same order as in the AMET scripts:
+    internal_flux_int, latent_flux_int, geopotential_flux_int, kinetic_flux_int,
+    heat_flux_int, vapor_flux_int, geo_flux_int, velocity_flux_int
+    '''
+    shape = (T.shape[0],) + T.shape[2:]
+    # accumulators for the vertical integral
+    if compensated:
+        running_sum = CompensatedSum
+    else:
+        running_sum = RunningSum
+    internal_flux_int = running_sum(shape, dtype=dtype)
+    latent_flux_int = running_sum(shape, dtype=dtype)
+    geopotential_flux_int = running_sum(shape, dtype=dtype)
+    kinetic_flux_int = running_sum(shape, dtype=dtype)
+    heat_flux_int = running_sum(shape, dtype=dtype)
+    vapor_flux_int = running_sum(shape, dtype=dtype)
+    geo_flux_int = running_sum(shape, dtype=dtype)
+    velocity_flux_int = running_sum(shape, dtype=dtype)
+    # work space for a single level, reused through the loop
+    mass = np.empty(shape, dtype=dtype)
+    term = np.empty(shape, dtype=dtype)
+    if isinstance(gz, np.ndarray):
+        gz_levels = ((i, gz[:,i,:,:]) for i in np.arange(T.shape[1]))
+    else:
+        gz_levels = gz
+    def add(name, running):
+        # add the term of the level to the vertical integral and to the bands
+        running.add(term)
+        if bands is not None:
+            bands.add(name, term)
+    for i, gz_level in gz_levels:
+        if bands is not None:
+            bands.level(i)
+        T_level = np.asarray(T[:,i,:,:], dtype=dtype)
+        q_level = np.asarray(q[:,i,:,:], dtype=dtype)
+        u_level = np.asarray(u[:,i,:,:], dtype=dtype)
+        v_level = np.asarray(v[:,i,:,:], dtype=dtype)
+        gz_level = np.asarray(gz_level, dtype=dtype)
+        # mass of the layer per unit area dp / g
+        np.divide(dp_level[:,i,:,:], constant['g'], out=mass)
+        # internal energy cpT
+        np.multiply(T_level, mass, out=term)
+        term *= constant['cp']
+        add('heat_flux_int', heat_flux_int)
+        term *= v_level
+        add('internal_flux_int', internal_flux_int)
+        # latent heat Lvq
+        np.multiply(q_level, mass, out=term)
+        term *= constant['Lv']
+        add('vapor_flux_int', vapor_flux_int)
+        term *= v_level
+        add('latent_flux_int', latent_flux_int)
+        # geopotential gz
+        np.multiply(gz_level, mass, out=term)
+        add('geo_flux_int', geo_flux_int)
+        term *= v_level
+        add('geopotential_flux_int', geopotential_flux_int)
+        # kinetic energy 1/2 * (u2 + v2)
+        np.multiply(u_level, u_level, out=term)
+        term += v_level * v_level
+        term *= 0.5
+        term *= mass
+        add('velocity_flux_int', velocity_flux_int)
+        term *= v_level
+        add('kinetic_flux_int', kinetic_flux_int)
+
+    return internal_flux_int.value(), latent_flux_int.value(), geopotential_flux_int.value(),\
+           kinetic_flux_int.value(), heat_flux_int.value(), vapor_flux_int.value(),\
+           geo_flux_int.value(), velocity_flux_int.value()
+
+def mass_flux_int(q, u, v, dp_level, constant):
+    '''
+    Take the vertical integral of the terms in the mass budget correction in one
+    pass. The constant dictionary must contain 'g'. The return values are:
+    moisture_flux_u_int     u * q * dp / g
+    moisture_flux_v_int     v * q * dp / g
+    mass_flux_u_int         u * dp / g
+    mass_flux_v_int         v * dp / g
+    precipitable_water      q * dp / g
+    '''
+    shape = (q.shape[0],) + q.shape[2:]
+    moisture_flux_u_int = np.zeros(shape, dtype=float)
+    moisture_flux_v_int = np.zeros(shape, dtype=float)
+    mass_flux_u_int = np.zeros(shape, dtype=float)
+    mass_flux_v_int = np.zeros(shape, dtype=float)
+    precipitable_water = np.zeros(shape, dtype=float)
+    # work space for a single level, reused through the loop
+    mass = np.empty(shape, dtype=float)
+    term = np.empty(shape, dtype=float)
+    for i in np.arange(q.shape[1]):
+        # mass of the layer per unit area dp / g
+        np.divide(dp_level[:,i,:,:], constant['g'], out=mass)
+        np.multiply(u[:,i,:,:], mass, out=term)
+        mass_flux_u_int += term
+        np.multiply(v[:,i,:,:], mass, out=term)
+        mass_flux_v_int += term
+        np.multiply(q[:,i,:,:], mass, out=term)
+        precipitable_water += term
+        moisture_flux_u_int += term * u[:,i,:,:]
+        moisture_flux_v_int += term * v[:,i,:,:]
+
+    return moisture_flux_u_int, moisture_flux_v_int, mass_flux_u_int, mass_flux_v_int, precipitable_water
@@ -0,0 +1,63 @@
+"""
+Copyright Netherlands eScience Center
+
+Function        : Geopotential on hybrid sigma-pressure model levels
+Author          : Yang Liu
+Date            : 2018.1.15
+Last Update     : 2018.1.15
+Description     : The module integrates the hydrostatic equation from the surface
+                  to the TOA to get the geopotential on the full model levels. The
+                  procedure and relevant equations can be found in ECMWF IFS 9220,
+                  see equation 2.20 - 2.23 .
+                  The integral is streamed level by level. Only the geopotential
+                  on the running half level is kept in memory, and the geopotential
+                  of each full level is handed over as soon as it is known, e.g. to
+                  the vertical integral of energy flux (wizard.flux). No array with
+                  the level axis is created.
+Return Value    : generator of (level index, geopotential (time, lat, lon))
+Dependencies    : numpy
+                  wizard.coordinate
+variables       : Absolute Temperature              T         [K]
+                  Specific Humidity                 q         [kg/kg]
+                  Surface Geopotential              z         [m2/s2]
+Caveat!!        : The input fields must have the axes (time, level, lat, lon). The
+                  level order is taken from the pressure coordinate (HybridLevel).
+"""
+import numpy as np
+
+def full_level(T, q, z, pressure, constant):
+    '''
+    Yield (i, gz) for each model level i from the surface to the TOA, where gz
+    is the geopotential on the full level [m2/s2]. The pressure coordinate is
+    a wizard.coordinate.HybridLevel and the constant dictionary must contain
+    'R_dry' and 'R_vap'.
+    '''
+    if pressure.toa_first:
+        index_level = np.arange(len(pressure) - 1, -1, -1)
+    else:
+        index_level = np.arange(len(pressure))
+    # initialize the first half level geopotential
+    gz_half = np.zeros((T.shape[0],) + T.shape[2:], dtype=float)
+    for i in index_level:
+        # compute the moist temperature (virtual temperature)
+        Tv = T[:,i,:,:] * (1 + (constant['R_vap'] / constant['R_dry'] - 1) * q[:,i,:,:])
+        # the ln(p_plus/p_minus) is calculated, alpha is defined
+        # an exception lies in the TOA
+        # see equation 2.23 in ECMWF IFS 9220
+        p_half_plus, p_half_minus = pressure.half_level(i)
+        if i == pressure.index_toa:
+            ln_p = np.log(p_half_plus / 10)
+            alpha = np.log(2)
+        else:
+            ln_p = np.log(p_half_plus / p_half_minus)
+            delta_p = p_half_plus - p_half_minus
+            alpha = 1 - p_half_minus / delta_p * ln_p
+        # calculate the geopotential of the full level (exclude surface geopotential)
+        # see equation 2.22 in ECMWF IFS 9220
+        gz_full = gz_half + alpha * constant['R_dry'] * Tv
+        # add surface geopotential to the full level
+        # see equation 2.21 in ECMWF IFS 9220
+        yield i, z + gz_full
+        # renew the half level geopotential for next level (from p_half_minus level to p_half_plus level)
+        # see equation 2.20 in ECMWF IFS 9220
+        gz_half += ln_p * constant['R_dry'] * Tv
@@ -0,0 +1,189 @@
+"""
+Copyright Netherlands eScience Center
+
+Function        : Persistent message index of GRIB files
+Author          : Yang Liu
+Date            : 2018.1.26
+Last Update     : 2018.2.23
+Description     : pygrib walks through a GRIB file message by message, hence it is
+                  only efficient to read the messages monotonically and each jump
+                  backward starts the walk again from the beginning of the file.
+                  The module scans a GRIB file once and records for each message the
+                  byte offset and length, together with the variable (shortName),
+                  the valid time (YYYYMMDDHHMM) and the level. The index is saved
+                  next to the GRIB file (<file>.index.npz) and is reused as long as
+                  the size and modification time of the file are unchanged.
+                  A message is decoded straight from its bytes, so the messages can
+                  be read in any order and only the messages which are needed are
+                  touched. MessageIndex mimics pygrib.open (message, messages, close),
+                  hence it can replace it in the scripts directly.
+Return Value    : pygrib messages or numpy arrays
+Dependencies    : os, struct, numpy, pygrib
+Caveat!!        : The length of GRIB1 messages larger than 8 MB is encoded in a special
+                  way by ECMWF, which is not supported. The messages of JRA55 (TL319)
+                  and EC-Earth (T255) are far below this limit.
+                  If the directory of the GRIB file is not writable, give index_path.
+"""
+import os
+import struct
+import numpy as np
+
+def scan(filename):
+    '''
+    Find the byte offset and length of each message in the GRIB file.
+    Both GRIB edition 1 and 2 are recognized.
+    '''
+    offsets = []
+    lengths = []
+    with open(filename, 'rb') as grib:
+        offset = 0
+        while True:
+            grib.seek(offset)
+            header = grib.read(16)
+            if len(header) < 8:
+                break
+            start = header.find(b'GRIB')
+            if start < 0:
+                # skip the padding between messages
+                offset += len(header) - 3
+                continue
+            if start > 0:
+                offset += start
+                continue
+            edition = struct.unpack('>B', header[7:8])[0]
+            if edition == 1:
+                length = struct.unpack('>I', b'\x00' + header[4:7])[0]
+            elif edition == 2:
+                length = struct.unpack('>Q', header[8:16])[0]
+            else:
+                raise ValueError("Unknown GRIB edition %d at byte %d of %s" % (edition, offset, filename))
+            # every message ends with 7777
+            grib.seek(offset + length - 4)
+            if grib.read(4) != b'7777':
+                raise ValueError("Broken GRIB message at byte %d of %s" % (offset, filename))
+            offsets.append(offset)
+            lengths.append(length)
+            offset += length
+
+    return np.array(offsets, dtype=np.int64), np.array(lengths, dtype=np.int64)
+
+class MessageIndex(object):
+    '''
+    Index of the messages in a GRIB file. The messages are numbered from 1
+    in the order of the file, as in pygrib.
+    '''
+    def __init__(self, filename, index_path=None):
+        self.filename = filename
+        if index_path is None:
+            self.index_file = filename + '.index.npz'
+        else:
+            self.index_file = os.path.join(index_path, os.path.basename(filename) + '.index.npz')
+        self._grib = open(filename, 'rb')
+        if not self._load():
+            self._build()
+            self._save()
+
+    def _stamp(self):
+        # size and modification time of the GRIB file
+        status = os.stat(self.filename)
+        return np.array([status.st_size, int(status.st_mtime)], dtype=np.int64)
+
+    def _load(self):
+        if not os.path.exists(self.index_file):
+            return False
+        index = np.load(self.index_file)
+        try:
+            if not np.array_equal(index['stamp'], self._stamp()):
+                return False
+            self.offset = index['offset']
+            self.length = index['length']
+            self.name = index['name']
+            self.valid = index['valid']
+            self.level = index['level']
+        finally:
+            index.close()
+        return True
+
+    def _build(self):
+        import pygrib
+        self.offset, self.length = scan(self.filename)
+        name = []
+        valid = []
+        level = []
+        for offset, length in zip(self.offset, self.length):
+            # only the header is used, the values are not decoded
+            message = pygrib.fromstring(self._read(offset, length))
+            name.append(message['shortName'])
+            valid.append(message['validityDate'] * 10000 + message['validityTime'])
+            level.append(message['level'])
+        self.name = np.array(name, dtype=str)
+        self.valid = np.array(valid, dtype=np.int64)
+        self.level = np.array(level, dtype=np.int64)
+
+    def _save(self):
+        # the jobs which index the same file at the same time write their own file
+        filename_temp = self.index_file + '.%d.tmp' % (os.getpid())
+        try:
+            index_dir = os.path.dirname(self.index_file)
+            if index_dir and not os.path.exists(index_dir):
+                os.makedirs(index_dir)
+            with open(filename_temp, 'wb') as index:
+                np.savez(index, stamp=self._stamp(), offset=self.offset, length=self.length,
+                         name=self.name, valid=self.valid, level=self.level)
+            os.rename(filename_temp, self.index_file)
+        except (IOError, OSError):
+            # the index is kept in memory only, e.g. for a read-only data directory
+            pass
+
+    def _read(self, offset, length):
+        self._grib.seek(offset)
+        return self._grib.read(length)
+
+    @property
+    def messages(self):
+        '''
+        Number of messages in the file.
+        '''
+        return len(self.offset)
+
+    def __len__(self):
+        return len(self.offset)
+
+    def select(self, name=None, valid=None, level=None):
+        '''
+        Message numbers (from 1, in the order of the file) of the given variable,
+        valid time (a single value or a (first, last) range, YYYYMMDDHHMM) and level.
+        '''
+        mask = np.ones(len(self.offset), dtype=bool)
+        if name is not None:
+            mask &= self.name == name
+        if valid is not None:
+            if isinstance(valid, tuple):
+                mask &= (self.valid >= valid[0]) & (self.valid <= valid[1])
+            else:
+                mask &= self.valid == valid
+        if level is not None:
+            mask &= self.level == level
+        return np.nonzero(mask)[0] + 1
+
+    def message(self, number):
+        '''
+        Decode the message with the given number (from 1), as pygrib.open.message.
+        '''
+        import pygrib
+        return pygrib.fromstring(self._read(self.offset[number-1], self.length[number-1]))
+
+    def values(self, numbers, out=None):
+        '''
+        Decode the values of the given messages into an array (message, lat, lon).
+        If out is given, the values are written into it.
+        '''
+        for i, number in enumerate(numbers):
+            values = self.message(number).values
+            if out is None:
+                out = np.empty((len(numbers),) + values.shape, dtype=float)
+            out[i] = values
+        return out
+
+    def close(self):
+        self._grib.close()
@@ -0,0 +1,154 @@
+"""
+Copyright Netherlands eScience Center
+
+Function        : A and B values of the hybrid sigma-pressure levels of each dataset
+Author          : Yang Liu
+Date            : 2018.1.24
+Last Update     : 2018.1.24
+Description     : The module collects the tables of A and B values, which define the
+                  half levels of the hybrid sigma-pressure coordinate (p = A + B * ps),
+                  of the datasets supported by the toolkit. The tables are given in the
+                  order of the model levels in the files of each dataset, and the unit
+                  of A is Pa for all of them, so that they can be fed to
+                  wizard.coordinate.HybridLevel directly:
+                  MERRA2        72 levels   TOA to surface
+                  ERA-Interim   60 levels   TOA to surface
+                  JRA55         60 levels   surface to TOA
+                  EC-Earth      91 levels   TOA to surface
+Return Value    : numpy arrays
+Dependencies    : numpy
+Caveat!!        : The values are copied from the AMET scripts of each dataset. Keep them
+                  in line when a table is changed there.
+"""
+import numpy as np
+
+# MERRA2
+# Since there are 72 model levels, there are 73 half levels, so it is for A and B values
+# the table is from surface to TOA and A is in hPa, see the conversion below
+MERRA2_A = np.array([
+      0.000000e+00, 4.804826e-02, 6.593752e+00, 1.313480e+01, 1.961311e+01, 2.609201e+01,
+      3.257081e+01, 3.898201e+01, 4.533901e+01, 5.169611e+01, 5.805321e+01, 6.436264e+01,
+      7.062198e+01, 7.883422e+01, 8.909992e+01, 9.936521e+01, 1.091817e+02, 1.189586e+02,
+      1.286959e+02, 1.429100e+02, 1.562600e+02, 1.696090e+02, 1.816190e+02, 1.930970e+02,
+      2.032590e+02, 2.121500e+02, 2.187760e+02, 2.238980e+02, 2.243630e+02, 2.168650e+02,
+      2.011920e+02, 1.769300e+02, 1.503930e+02, 1.278370e+02, 1.086630e+02, 9.236572e+01,
+      7.851231e+01, 6.660341e+01, 5.638791e+01, 4.764391e+01, 4.017541e+01, 3.381001e+01,
+      2.836781e+01, 2.373041e+01, 1.979160e+01, 1.645710e+01, 1.364340e+01, 1.127690e+01,
+      9.292942e+00, 7.619842e+00, 6.216801e+00, 5.046801e+00, 4.076571e+00, 3.276431e+00,
+      2.620211e+00, 2.084970e+00, 1.650790e+00, 1.300510e+00, 1.019440e+00, 7.951341e-01,
+      6.167791e-01, 4.758061e-01, 3.650411e-01, 2.785261e-01, 2.113490e-01, 1.594950e-01,
+      1.197030e-01, 8.934502e-02, 6.600001e-02, 4.758501e-02, 3.270000e-02, 2.000000e-02,
+      1.000000e-02,],dtype=float)
+MERRA2_B = np.array([
+      1.000000e+00, 9.849520e-01, 9.634060e-01, 9.418650e-01, 9.203870e-01, 8.989080e-01,
+      8.774290e-01, 8.560180e-01, 8.346609e-01, 8.133039e-01, 7.919469e-01, 7.706375e-01,
+      7.493782e-01, 7.211660e-01, 6.858999e-01, 6.506349e-01, 6.158184e-01, 5.810415e-01,
+      5.463042e-01, 4.945902e-01, 4.437402e-01, 3.928911e-01, 3.433811e-01, 2.944031e-01,
+      2.467411e-01, 2.003501e-01, 1.562241e-01, 1.136021e-01, 6.372006e-02, 2.801004e-02,
+      6.960025e-03, 8.175413e-09, 0.000000e+00, 0.000000e+00, 0.000000e+00, 0.000000e+00,
+      0.000000e+00, 0.000000e+00, 0.000000e+00, 0.000000e+00, 0.000000e+00, 0.000000e+00,
+      0.000000e+00, 0.000000e+00, 0.000000e+00, 0.000000e+00, 0.000000e+00, 0.000000e+00,
+      0.000000e+00, 0.000000e+00, 0.000000e+00, 0.000000e+00, 0.000000e+00, 0.000000e+00,
+      0.000000e+00, 0.000000e+00, 0.000000e+00, 0.000000e+00, 0.000000e+00, 0.000000e+00,
+      0.000000e+00, 0.000000e+00, 0.000000e+00, 0.000000e+00, 0.000000e+00, 0.000000e+00,
+      0.000000e+00, 0.000000e+00, 0.000000e+00, 0.000000e+00, 0.000000e+00, 0.000000e+00,
+      0.000000e+00,],dtype=float)
+# reverse A and B to follow the model levels (TOA to surface), and A from hPa to Pa
+MERRA2_A = MERRA2_A[::-1] * 100
+MERRA2_B = MERRA2_B[::-1]
+
+# ERA-Interim
+# Since there are 60 model levels, there are 61 half levels, so it is for A and B values
+# the unit of A is Pa, from TOA to surface
+ERAI_A = np.array([
+      0.0000000000e+000, 2.0000000000e+001, 3.8425338745e+001, 6.3647796631e+001, 9.5636962891e+001,
+      1.3448330688e+002, 1.8058435059e+002, 2.3477905273e+002, 2.9849584961e+002, 3.7397192383e+002,
+      4.6461816406e+002, 5.7565112305e+002, 7.1321801758e+002, 8.8366040039e+002, 1.0948347168e+003,
+      1.3564746094e+003, 1.6806403809e+003, 2.0822739258e+003, 2.5798886719e+003, 3.1964216309e+003,
+      3.9602915039e+003, 4.9067070313e+003, 6.0180195313e+003, 7.3066328125e+003, 8.7650546875e+003,
+      1.0376125000e+004, 1.2077445313e+004, 1.3775324219e+004, 1.5379804688e+004, 1.6819472656e+004,
+      1.8045183594e+004, 1.9027695313e+004, 1.9755109375e+004, 2.0222203125e+004, 2.0429863281e+004,
+      2.0384480469e+004, 2.0097402344e+004, 1.9584328125e+004, 1.8864750000e+004, 1.7961359375e+004,
+      1.6899468750e+004, 1.5706449219e+004, 1.4411125000e+004, 1.3043218750e+004, 1.1632757813e+004,
+      1.0209500000e+004, 8.8023554688e+003, 7.4388046875e+003, 6.1443164063e+003, 4.9417773438e+003,
+      3.8509133301e+003, 2.8876965332e+003, 2.0637797852e+003, 1.3859125977e+003, 8.5536181641e+002,
+      4.6733349609e+002, 2.1039389038e+002, 6.5889236450e+001, 7.3677425385e+000, 0.0000000000e+000,
+      0.0000000000e+000,],dtype=float)
+ERAI_B = np.array([
+      0.0000000000e+000, 0.0000000000e+000, 0.0000000000e+000, 0.0000000000e+000, 0.0000000000e+000,
+      0.0000000000e+000, 0.0000000000e+000, 0.0000000000e+000, 0.0000000000e+000, 0.0000000000e+000,
+      0.0000000000e+000, 0.0000000000e+000, 0.0000000000e+000, 0.0000000000e+000, 0.0000000000e+000,
+      0.0000000000e+000, 0.0000000000e+000, 0.0000000000e+000, 0.0000000000e+000, 0.0000000000e+000,
+      0.0000000000e+000, 0.0000000000e+000, 0.0000000000e+000, 0.0000000000e+000, 7.5823496445e-005,
+      4.6139489859e-004, 1.8151560798e-003, 5.0811171532e-003, 1.1142909527e-002, 2.0677875727e-002,
+      3.4121163189e-002, 5.1690407097e-002, 7.3533833027e-002, 9.9674701691e-002, 1.3002252579e-001,
+      1.6438430548e-001, 2.0247590542e-001, 2.4393314123e-001, 2.8832298517e-001, 3.3515489101e-001,
+      3.8389211893e-001, 4.3396294117e-001, 4.8477154970e-001, 5.3570991755e-001, 5.8616840839e-001,
+      6.3554745913e-001, 6.8326860666e-001, 7.2878581285e-001, 7.7159661055e-001, 8.1125342846e-001,
+      8.4737491608e-001, 8.7965691090e-001, 9.0788388252e-001, 9.3194031715e-001, 9.5182150602e-001,
+      9.6764522791e-001, 9.7966271639e-001, 9.8827010393e-001, 9.9401944876e-001, 9.9763011932e-001,
+      1.0000000000e+000,],dtype=float)
+
+# JRA55
+# Since there are 60 model levels, there are 61 half levels, so it is for A and B values
+# the unit of A is Pa, from surface to TOA
+JRA55_A = np.array([0.00000000E+00, 0.00000000E+00, 0.00000000E+00, 0.00000000E+00, 0.00000000E+00,
+                    0.00000000E+00, 0.00000000E+00, 0.00000000E+00, 1.33051011E+02, 3.64904149E+02,
+                    6.34602716E+02, 9.59797167E+02, 1.34768004E+03, 1.79090740E+03, 2.29484169E+03,
+                    2.84748478E+03, 3.46887149E+03, 4.16295646E+03, 4.89188083E+03, 5.67182424E+03,
+                    6.47671300E+03, 7.29746989E+03, 8.12215979E+03, 8.91408220E+03, 9.65618191E+03,
+                    1.03294362E+04, 1.09126384E+04, 1.13696478E+04, 1.16953716E+04, 1.18612531E+04,
+                    1.18554343E+04, 1.16633554E+04, 1.12854041E+04, 1.07299494E+04, 1.00146151E+04,
+                    9.16724704E+03, 8.22624491E+03, 7.20156898E+03, 6.08867301E+03, 4.95000000E+03,
+                    4.00000000E+03, 3.23000000E+03, 2.61000000E+03, 2.10500000E+03, 1.70000000E+03,
+                    1.37000000E+03, 1.10500000E+03, 8.93000000E+02, 7.20000000E+02, 5.81000000E+02,
+                    4.69000000E+02, 3.77000000E+02, 3.01000000E+02, 2.37000000E+02, 1.82000000E+02,
+                    1.36000000E+02, 9.70000000E+01, 6.50000000E+01, 3.90000000E+01, 2.00000000E+01,
+                    0.00000000E+00],dtype=float)
+JRA55_B = np.array([1.00000000E+00, 9.97000000E-01, 9.94000000E-01, 9.89000000E-01, 9.82000000E-01,
+                    9.72000000E-01, 9.60000000E-01, 9.46000000E-01, 9.26669490E-01, 9.04350959E-01,
+                    8.79653973E-01, 8.51402028E-01, 8.19523200E-01, 7.85090926E-01, 7.48051583E-01,
+                    7.09525152E-01, 6.68311285E-01, 6.24370435E-01, 5.80081192E-01, 5.34281758E-01,
+                    4.88232870E-01, 4.42025301E-01, 3.95778402E-01, 3.50859178E-01, 3.07438181E-01,
+                    2.65705638E-01, 2.25873616E-01, 1.89303522E-01, 1.55046284E-01, 1.24387469E-01,
+                    9.64456568E-02, 7.23664463E-02, 5.21459594E-02, 3.57005059E-02, 2.28538495E-02,
+                    1.33275296E-02, 6.73755092E-03, 2.48431020E-03, 1.13269915E-04, 0.00000000E+00,
+                    0.00000000E+00, 0.00000000E+00, 0.00000000E+00, 0.00000000E+00, 0.00000000E+00,
+                    0.00000000E+00, 0.00000000E+00, 0.00000000E+00, 0.00000000E+00, 0.00000000E+00,
+                    0.00000000E+00, 0.00000000E+00, 0.00000000E+00, 0.00000000E+00, 0.00000000E+00,
+                    0.00000000E+00, 0.00000000E+00, 0.00000000E+00, 0.00000000E+00, 0.00000000E+00,
+                    0.00000000E+00],dtype=float)
+
+# EC-Earth
+# Since there are 91 model levels, there are 92 half levels, so it is for A and B values
+# the unit of A is Pa, from TOA to surface
+ECEARTH_A = np.array([0.0, 2.00004, 3.980832, 7.387186, 12.908319, 21.413612, 33.952858,
+                      51.746601, 76.167656, 108.715561, 150.986023, 204.637451, 271.356506,
+                      352.824493, 450.685791, 566.519226, 701.813354, 857.945801, 1036.166504,
+                      1237.585449, 1463.16394, 1713.709595, 1989.87439, 2292.155518, 2620.898438,
+                      2976.302246, 3358.425781, 3767.196045, 4202.416504, 4663.776367, 5150.859863,
+                      5663.15625, 6199.839355, 6759.727051, 7341.469727, 7942.92627, 8564.624023,
+                      9208.305664, 9873.560547, 10558.881836, 11262.484375, 11982.662109, 12713.897461,
+                      13453.225586,14192.009766, 14922.685547, 15638.053711, 16329.560547,16990.623047,
+                      17613.28125, 18191.029297, 18716.96875, 19184.544922, 19587.513672, 19919.796875,
+                      20175.394531, 20348.916016, 20434.158203, 20426.21875, 20319.011719, 20107.03125,
+                      19785.357422, 19348.775391, 18798.822266, 18141.296875, 17385.595703, 16544.585938,
+                      15633.566406, 14665.645508, 13653.219727, 12608.383789, 11543.166992, 10471.310547,
+                      9405.222656, 8356.25293, 7335.164551, 6353.920898, 5422.802734, 4550.21582,
+                      3743.464355, 3010.146973, 2356.202637, 1784.854614, 1297.656128, 895.193542,
+                      576.314148, 336.772369, 162.043427, 54.208336, 6.575628, 0.00316, 0.0],dtype=float)
+ECEARTH_B = np.array([0.0, 0.0, 0.0, 0.0, 0.0, 0.0,
+                      0.0, 0.0, 0.0, 0.0, 0.0, 0.0,
+                      0.0, 0.0, 0.0, 0.0, 0.0, 0.0,
+                      0.0, 0.0, 0.0, 0.0, 0.0, 0.0,
+                      0.0, 0.0, 0.0, 0.0, 0.0, 0.0,
+                      0.0, 0.0, 0.0, 0.0, 0.0, 1.4e-005,
+                      5.5e-005, 0.000131, 0.000279, 0.000548, 0.001, 0.001701,
+                      0.002765, 0.004267, 0.006322, 0.009035, 0.012508, 0.01686,
+                      0.022189, 0.02861, 0.036227, 0.045146, 0.055474, 0.067316,
+                      0.080777, 0.095964, 0.112979, 0.131935, 0.152934, 0.176091,
+                      0.20152, 0.229315, 0.259554, 0.291993, 0.326329, 0.362203,
+                      0.399205, 0.436906, 0.475016, 0.51328, 0.551458, 0.589317,
+                      0.626559, 0.662934, 0.698224, 0.732224, 0.764679, 0.795385,
+                      0.824185, 0.85095, 0.875518, 0.897767, 0.917651, 0.935157,
+                      0.950274, 0.963007, 0.973466, 0.982238, 0.989153, 0.994204, 0.99763, 1.0],dtype=float)
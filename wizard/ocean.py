@@ -0,0 +1,111 @@
+"""
+Copyright Netherlands eScience Center
+
+Function        : Kernels of the meridional energy transport in the ocean (OMET)
+Author          : Yang Liu
+Date            : 2018.2.16
+Last Update     : 2018.2.16
+Description     : The module collects the kernels of the OMET scripts as loop-free
+                  numpy operations, for the NEMO ORCA grids (ORAS4, GLORYS2V3) and
+                  the MOM5 grid (SODA3):
+                  1. partial cells at the bottom of each column, as the thickness
+                     which is taken off the full cell (nemo_partial_cell, mom_partial_cell)
+                  2. temperature on the grid of the meridional velocity, the V grid
+                     of NEMO (nemo_v_grid) or the C grid of MOM5 (mom_c_grid)
+                  3. vertical integral of the meridional energy transport
+                     rho * cp * v * T * dx * dz at each grid point [TW]
+                  4. meridional overturning stream function, integrated from the
+                     bottom upwards and summed along the rows of the grid [Sv]
+                  The fields may have a leading time axis (time, level, jj, ji).
+Return Value    : numpy arrays
+Dependencies    : numpy
+Caveat!!        : The rows of the curvilinear grids are not latitude circles in the
+                  north, so the sums along the rows are not zonal integrals there.
+                  The masks are either 3D (level, jj, ji), or 2D (jj, ji) for all the
+                  levels.
+"""
+import numpy as np
+
+def nemo_partial_cell(e3t_0, e3t_ps, mbathy):
+    '''
+    Thickness [m] taken off the full cells (level, jj, ji) of the NEMO grid, which
+    is e3t_0 - e3t_ps in the bottom cell (level mbathy, from 1) of each column.
+    '''
+    level = len(e3t_0)
+    jj, ji = mbathy.shape
+    bottom = np.asarray(mbathy, dtype=int) - 1
+    adjust = np.zeros((level, jj, ji), dtype=float)
+    # columns which are land (0) or reach the deepest level are not adjusted
+    column = (bottom >= 0) & (bottom < level - 1)
+    j, i = np.nonzero(column)
+    adjust[bottom[j, i], j, i] = e3t_0[bottom[j, i]] - e3t_ps[j, i]
+
+    return adjust
+
+def mom_partial_cell(zb, depth, num_levels):
+    '''
+    Thickness [m] taken off the full cells (level, jj, ji) of the MOM5 grid, which
+    is the depth of the bottom edge zb minus the topographic depth in the bottom
+    cell (num_levels, from 1) of each column.
+    '''
+    level = len(zb)
+    jj, ji = num_levels.shape
+    bottom = np.asarray(num_levels, dtype=int) - 1
+    adjust = np.zeros((level, jj, ji), dtype=float)
+    j, i = np.nonzero(bottom >= 0)
+    adjust[bottom[j, i], j, i] = zb[bottom[j, i]] - depth[j, i]
+
+    return adjust
+
+def nemo_v_grid(theta):
+    '''
+    Temperature on the V grid of NEMO, the mean of the T points j and j+1. The
+    last row is taken as it is.
+    '''
+    theta = np.asarray(theta, dtype=float)
+    T_vgrid = theta.copy()
+    T_vgrid[...,:-1,:] = (theta[...,:-1,:] + theta[...,1:,:]) / 2
+
+    return T_vgrid
+
+def mom_c_grid(temp, cmask):
+    '''
+    Temperature on the C grid of MOM5 (the corner of the T cells), the mean of the
+    four surrounding T points. The grid is periodic in the zonal direction and the
+    last row takes the mean along the row only.
+    '''
+    temp = np.asarray(temp, dtype=float)
+    # mean of the points i and i+1, with the first column after the last one
+    row_mean = (temp + np.roll(temp, -1, axis=-1)) / 2
+    T_cgrid = row_mean.copy()
+    T_cgrid[...,:-1,:] = (row_mean[...,:-1,:] + row_mean[...,1:,:]) / 2
+
+    return T_cgrid * cmask
+
+def energy_transport(v, T, dx, dz, dz_adjust, mask, constant):
+    '''
+    Vertical integral of the meridional energy transport [TW] at each grid point,
+    on the grid of v (level, jj, ji), with the temperature T on the same grid.
+    dx is the zonal grid length (jj, ji), dz the thickness of the full cells
+    (level) and dz_adjust the thickness taken off the partial cells (level, jj, ji).
+    The constant dictionary must contain 'rho' and 'cp'.
+    '''
+    thickness = np.asarray(dz, dtype=float)[:,np.newaxis,np.newaxis] - dz_adjust
+    flux = constant['rho'] * constant['cp'] * v * T * (dx * thickness * mask)
+
+    return np.sum(flux, -3) / 1e+12
+
+def stream_function(v, dx, dz, dz_adjust, mask, basin=None):
+    '''
+    Meridional overturning stream function [Sv] (level, jj), the transport of v
+    integrated from the bottom up to each level and summed along each row.
+    With a basin mask (jj, ji), e.g. the Atlantic, only the basin is included.
+    '''
+    thickness = np.asarray(dz, dtype=float)[:,np.newaxis,np.newaxis] - dz_adjust
+    transport = v * (dx * thickness * mask)
+    if basin is not None:
+        transport = transport * basin
+    # cumulative sum from the bottom
+    psi = np.cumsum(transport[...,::-1,:,:], axis=-3)[...,::-1,:,:]
+
+    return np.sum(psi, -1) / 1e+6
@@ -0,0 +1,121 @@
+"""
+Copyright Netherlands eScience Center
+
+Function        : Vertical integral of the monthly mean fields (mean2int ordering)
+Author          : Yang Liu
+Date            : 2018.2.17
+Last Update     : 2018.2.17
+Description     : The AMET of ERA-Interim was computed by two scripts which differ only
+                  in the order of the vertical integral and the time mean:
+                  int2mean   vertical integral of each time step, then the monthly
+                             mean (AMET_ERAI_int2mean, the AMET engine)
+                  mean2int   monthly mean of the products on each model level, then
+                             the vertical integral with the layer thickness of the
+                             monthly mean surface pressure (AMET_ERAI_mean2int)
+                  Both orderings need the same fields, which were read twice. The
+                  module keeps the time sums of the fields and their products on
+                  each model level, while the AMET engine (wizard.engine) takes the
+                  int2mean integrals of the same blocks, so that both orderings come
+                  from a single read of each month. The difference of the two is the
+                  contribution of the sub-monthly covariance of the layer thickness
+                  and the fluxes.
+                  The vertical integrals of the monthly means are named as the time
+                  means of the engine, hence the mass budget correction of the engine
+                  is applied to either of them.
+Return Value    : dictionary of numpy arrays (lat, lon)
+Dependencies    : numpy
+                  wizard.coordinate
+Caveat!!        : The time sums are kept for each level, 11 fields (level, lat, lon) in
+                  double precision, e.g. 0.6 GB for ERA-Interim (60 x 241 x 480).
+"""
+import numpy as np
+import wizard.coordinate
+
+# time sums on each model level, k is the kinetic energy 1/2 * (u2 + v2)
+level_terms = ('T', 'q', 'u', 'v', 'k', 'gz', 'u_q', 'v_q', 'v_T', 'v_gz', 'v_k')
+
+class LevelSums(object):
+    '''
+    Time sums (level, lat, lon) of the fields and their products on each model
+    level, over the blocks (time, level, lat, lon) of a month.
+    '''
+    def __init__(self):
+        self.sums = None
+        self.ps = None
+        self.steps = 0
+
+    def _allocate(self, shape):
+        self.sums = dict((name, np.zeros(shape, dtype=np.float64)) for name in level_terms)
+        self.ps = np.zeros(shape[1:], dtype=np.float64)
+
+    def add(self, T, q, u, v, ps):
+        '''
+        Add the time steps of a block, except the geopotential, which is added
+        level by level through geopotential.
+        '''
+        if self.sums is None:
+            self._allocate(T.shape[1:])
+        sums = self.sums
+        # a single level at a time, no 4D product array is created
+        for i in np.arange(T.shape[1]):
+            u_level = np.asarray(u[:,i,:,:], dtype=np.float64)
+            v_level = np.asarray(v[:,i,:,:], dtype=np.float64)
+            k_level = 0.5 * (u_level * u_level + v_level * v_level)
+            sums['T'][i] += np.sum(T[:,i,:,:], 0, dtype=np.float64)
+            sums['q'][i] += np.sum(q[:,i,:,:], 0, dtype=np.float64)
+            sums['u'][i] += np.sum(u_level, 0)
+            sums['v'][i] += np.sum(v_level, 0)
+            sums['k'][i] += np.sum(k_level, 0)
+            sums['u_q'][i] += np.sum(u_level * q[:,i,:,:], 0)
+            sums['v_q'][i] += np.sum(v_level * q[:,i,:,:], 0)
+            sums['v_T'][i] += np.sum(v_level * T[:,i,:,:], 0)
+            sums['v_k'][i] += np.sum(v_level * k_level, 0)
+        self.ps += np.sum(ps, 0, dtype=np.float64)
+        self.steps += T.shape[0]
+
+    def geopotential(self, gz, v):
+        '''
+        Yield (level index, geopotential of the level) of gz, which is either the
+        geopotential (time, level, lat, lon) or an iterator of the levels (e.g.
+        wizard.geopotential.full_level), and add each level to the time sums.
+        The levels are handed over unchanged, e.g. to wizard.flux.energy_flux_int.
+        '''
+        if isinstance(gz, np.ndarray):
+            gz_levels = ((i, gz[:,i,:,:]) for i in np.arange(gz.shape[1]))
+        else:
+            gz_levels = gz
+        for i, gz_level in gz_levels:
+            self.sums['gz'][i] += np.sum(gz_level, 0, dtype=np.float64)
+            self.sums['v_gz'][i] += np.sum(v[:,i,:,:] * gz_level, 0, dtype=np.float64)
+            yield i, gz_level
+
+    def integrals(self, A, B, constant):
+        '''
+        Vertical integrals of the monthly mean fields with the layer thickness of
+        the monthly mean surface pressure (mean2int), named as the monthly means
+        of the AMET engine (wizard.engine.terms). The constant dictionary must
+        contain 'g', 'cp' and 'Lv'.
+        '''
+        steps = float(self.steps)
+        ps_mean = self.ps / steps
+        dp_level = wizard.coordinate.HybridLevel(A, B, ps_mean).dp
+        mass = dp_level / constant['g']
+
+        def integral(name, factor=1.0):
+            # vertical integral of the monthly mean of the term
+            return factor * np.sum(self.sums[name] / steps * mass, 0)
+
+        return {'moisture_flux_u_int': integral('u_q'),
+                'moisture_flux_v_int': integral('v_q'),
+                'mass_flux_u_int': integral('u'),
+                'mass_flux_v_int': integral('v'),
+                'precipitable_water': integral('q'),
+                'ps': ps_mean,
+                'internal_flux_int': integral('v_T', constant['cp']),
+                'latent_flux_int': integral('v_q', constant['Lv']),
+                'geopotential_flux_int': integral('v_gz'),
+                'kinetic_flux_int': integral('v_k'),
+                'heat_flux_int': integral('T', constant['cp']),
+                'vapor_flux_int': integral('q', constant['Lv']),
+                'geo_flux_int': integral('gz'),
+                'velocity_flux_int': integral('k')}
@@ -0,0 +1,185 @@
+"""
+Copyright Netherlands eScience Center
+
+Function        : Streaming packer of the yearly or monthly output into one multi-year file
+Author          : Yang Liu
+Date            : 2018.2.12
+Last Update     : 2018.2.12
+Description     : The packing scripts in Postprocessing loaded the output of every
+                  year into (year, month, ...) arrays before they wrote the packed
+                  file, which takes tens of GB for the fields at each grid point.
+                  The module creates the packed NetCDF4 file first, with an unlimited
+                  year dimension, and copies the variables year by year. Only one
+                  year of one variable is in memory at a time.
+                  The coordinates of every input file are checked against the
+                  template (the first file), so a file on a different grid is not
+                  packed silently.
+                  The year coordinate is written after all the variables of the year,
+                  so a year is complete on disk if its year is set. A packing job
+                  which is stopped continues the same file and skips the years which
+                  are packed already.
+Return Value    : NetCDF4 data file
+Dependencies    : os, numpy, netCDF4
+Caveat!!        : The input files hold either all the months of a year, with 'month'
+                  as the first dimension of the variables, or a single month without
+                  the month dimension. The data type, units and long name of each
+                  variable are taken from the template.
+"""
+import os
+import numpy as np
+from netCDF4 import Dataset
+
+class YearPacker(object):
+    '''
+    NetCDF4 file (year, month, ...) with an unlimited year dimension, which holds the
+    given coordinates (e.g. ['latitude', 'longitude']) and variables (e.g. ['E', 'E_cpT'])
+    of the template file. The record of a year is year - start_year.
+    Each chunk holds all the months of a year of a tile of tile x tile grid points.
+    '''
+    def __init__(self, filename, template, coordinates, variables, start_year,
+                 description=None, months=12, complevel=4, tile=32):
+        self.filename = filename
+        self.coordinates = coordinates
+        self.variables = variables
+        self.start_year = start_year
+        self.months = months
+        template_wrap = Dataset(template)
+        try:
+            # the coordinates of all the input files must be the same
+            self.coordinate_values = dict([(name, template_wrap.variables[name][:])
+                                           for name in coordinates])
+            if os.path.exists(filename):
+                # continue the file of a previous run
+                self.data_wrap = Dataset(filename, 'a')
+                self.check(self.data_wrap, filename)
+                return
+            self.data_wrap = Dataset(filename, 'w', format='NETCDF4')
+            self.create(template_wrap, description, complevel, tile)
+        finally:
+            template_wrap.close()
+
+    def create(self, template_wrap, description, complevel, tile):
+        '''
+        Create the dimensions, the coordinates and the variables of the packed file
+        from the template.
+        '''
+        # create dimensions for netcdf data
+        self.data_wrap.createDimension('year', None)
+        self.data_wrap.createDimension('month', self.months)
+        year_wrap_var = self.data_wrap.createVariable('year', np.int32, ('year',))
+        month_wrap_var = self.data_wrap.createVariable('month', np.int32, ('month',))
+        month_wrap_var[:] = np.arange(1, self.months + 1, 1)
+        for name in self.coordinates + self.variables:
+            for dimension in self.dimensions(template_wrap.variables[name]):
+                if dimension not in self.data_wrap.dimensions:
+                    self.data_wrap.createDimension(dimension, len(template_wrap.dimensions[dimension]))
+        # coordinate variables
+        for name in self.coordinates:
+            template_var = template_wrap.variables[name]
+            coordinate_var = self.data_wrap.createVariable(name, template_var.dtype, template_var.dimensions)
+            coordinate_var.setncatts(template_var.__dict__)
+            coordinate_var[:] = self.coordinate_values[name]
+        # the packed variables
+        for name in self.variables:
+            template_var = template_wrap.variables[name]
+            dimensions = self.dimensions(template_var)
+            chunksizes = [1, self.months]
+            for dimension in dimensions:
+                chunksizes.append(min(tile, len(self.data_wrap.dimensions[dimension])))
+            # the zonal integrals (year, month, lat) are small, a chunk holds all the latitudes
+            if len(dimensions) == 1:
+                chunksizes[-1] = len(self.data_wrap.dimensions[dimensions[0]])
+            var_wrap = self.data_wrap.createVariable(name, template_var.dtype, ('year', 'month') + dimensions,
+                                                     zlib=True, complevel=complevel, shuffle=True,
+                                                     chunksizes=tuple(chunksizes))
+            for attribute in ('units', 'long_name'):
+                if attribute in template_var.ncattrs():
+                    var_wrap.setncattr(attribute, template_var.getncattr(attribute))
+        # global attributes
+        if description is not None:
+            self.data_wrap.description = description
+
+    @staticmethod
+    def dimensions(var):
+        '''
+        Dimensions of a variable of an input file, without the month dimension.
+        '''
+        if len(var.dimensions) and var.dimensions[0] == 'month':
+            return tuple(var.dimensions[1:])
+        return tuple(var.dimensions)
+
+    def check(self, dataset, filename):
+        '''
+        Raise ValueError if the coordinates of the dataset differ from the template.
+        '''
+        for name in self.coordinates:
+            if name not in dataset.variables or \
+               not np.allclose(dataset.variables[name][:], self.coordinate_values[name]):
+                raise ValueError("The coordinate %s of %s does not match the first file." % (name, filename))
+
+    def packed(self, year):
+        '''
+        True if the year is packed completely.
+        '''
+        record = year - self.start_year
+        year_var = self.data_wrap.variables['year']
+        if record >= len(year_var):
+            return False
+        value = year_var[record]
+        return not np.ma.is_masked(value) and int(value) == year
+
+    def pack(self, year, filenames):
+        '''
+        Copy the variables of the year from the input files, which are either a
+        single file with all the months or one file for each month.
+        '''
+        record = year - self.start_year
+        datasets = []
+        try:
+            for filename in filenames:
+                dataset = Dataset(filename)
+                datasets.append(dataset)
+                self.check(dataset, filename)
+            for name in self.variables:
+                var_wrap = self.data_wrap.variables[name]
+                if len(datasets) == 1:
+                    # hyperslab copy of all the months of the year
+                    var_wrap[record] = datasets[0].variables[name][:self.months]
+                else:
+                    # assemble the year of the variable, the chunks hold all the months
+                    pool = np.zeros((self.months,) + var_wrap.shape[2:], dtype=var_wrap.dtype)
+                    for i, dataset in enumerate(datasets):
+                        var = dataset.variables[name]
+                        if len(var.dimensions) and var.dimensions[0] == 'month':
+                            pool[i] = var[0]
+                        else:
+                            pool[i] = var[:]
+                    var_wrap[record] = pool
+                    del pool
+        finally:
+            for dataset in datasets:
+                dataset.close()
+        # the year is complete on disk once it is set
+        self.data_wrap.variables['year'][record] = year
+        self.data_wrap.sync()
+
+    def close(self):
+        self.data_wrap.close()
+
+def pack_years(filename, template, coordinates, variables, start_year, end_year,
+               filenames, description=None):
+    '''
+    Pack the years from start_year to end_year (included) into the file. filenames(year)
+    gives the list of input files of the year (one for the year, or one per month).
+    The years which are packed already are skipped.
+    '''
+    packer = YearPacker(filename, template, coordinates, variables, start_year, description)
+    try:
+        for year in np.arange(start_year, end_year + 1, 1):
+            if packer.packed(year):
+                print ('Year %d is packed already.' % (year))
+                continue
+            packer.pack(year, filenames(year))
+            print ('Packing year %d complete.' % (year))
+    finally:
+        packer.close()
@@ -0,0 +1,68 @@
+"""
+Copyright Netherlands eScience Center
+
+Function        : Planner of the time chunks for the memory-wise AMET scripts
+Author          : Yang Liu
+Date            : 2018.2.2
+Last Update     : 2018.2.2
+Description     : The fields of a whole month do not fit in the memory of a node, so
+                  the month is processed in chunks of time steps. Instead of a fixed
+                  split (e.g. day 1-10, 11-20, 21-end for JRA55), the planner takes
+                  the memory limit and the size of the fields, and chooses the largest
+                  chunk which fits. The chunks have about the same length and are
+                  aligned to whole days.
+                  The chunks are independent of the files of the dataset, a chunk
+                  may span the boundary between two files. split gives the part of
+                  a chunk which lies in each file.
+Return Value    : list of (start, stop) time step index
+Dependencies    : numpy
+Caveat!!        : The memory of a chunk is estimated as the number of fields with
+                  the axes (time, level, lat, lon) alive at the same time (input
+                  fields and temporaries) times their size. Leave room in the limit
+                  for the monthly data pools.
+"""
+import numpy as np
+
+def chunk_steps(memory_limit, levels, latitude, longitude, fields, itemsize=8):
+    '''
+    Largest number of time steps of which the given number of fields (level, lat, lon),
+    with itemsize bytes per value, fit in the memory limit [bytes].
+    '''
+    step_size = fields * levels * latitude * longitude * itemsize
+    steps = int(memory_limit // step_size)
+    if steps < 1:
+        raise ValueError("A single time step takes %d MB, which exceeds the memory limit of %d MB."
+                         % (step_size // 1024**2, memory_limit // 1024**2))
+    return steps
+
+def plan(total_steps, max_steps, align=1):
+    '''
+    Split total_steps time steps into the fewest chunks of at most max_steps steps.
+    The chunks have about the same length, which is a multiple of align (e.g. the
+    number of time steps per day) if max_steps allows. A list of (start, stop) is
+    returned.
+    '''
+    if max_steps >= align:
+        unit = align
+    else:
+        unit = 1
+    units = -(-total_steps // unit)
+    max_units = max(max_steps // unit, 1)
+    chunks = -(-units // max_units)
+    # distribute the units evenly over the chunks
+    bounds = [min(int(round(float(units) * c / chunks)) * unit, total_steps) for c in np.arange(chunks + 1)]
+    return [(bounds[c], bounds[c+1]) for c in np.arange(chunks) if bounds[c+1] > bounds[c]]
+
+def split(start, stop, spans):
+    '''
+    Parts of the chunk (start, stop) in each of the files, which cover the time
+    steps spans = [(first, last), ...] (last excluded). A list of (file index,
+    start, stop) is returned for each file which overlaps the chunk.
+    '''
+    parts = []
+    for k, (first, last) in enumerate(spans):
+        part_start = max(start, first)
+        part_stop = min(stop, last)
+        if part_stop > part_start:
+            parts.append((k, part_start, part_stop))
+    return parts
@@ -0,0 +1,94 @@
+"""
+Copyright Netherlands eScience Center
+
+Function        : Read-ahead of the next piece of data in a background thread
+Author          : Yang Liu
+Date            : 2018.2.5
+Last Update     : 2018.2.5
+Description     : The AMET scripts read a piece of data (a day, a month or a chunk of
+                  time steps) and compute on it, strictly one after the other. On the
+                  parallel file system the reading takes about as long as the
+                  computation. The module reads the next piece in a background thread
+                  while the current one is processed, so the two overlap.
+                  The number of pieces in memory is bounded: with buffers = 2, the
+                  next piece is read only after the piece before the current one is
+                  released, i.e. one piece is processed while one is read or waiting
+                  in the queue.
+                  Reading netCDF files and the decoding in the worker processes of
+                  wizard.decoder release the global interpreter lock, so a thread
+                  is sufficient.
+Return Value    : generator of the pieces of data
+Dependencies    : threading, Queue (queue), sys
+Caveat!!        : A piece is released when the next one is requested, so it must not
+                  be used anymore after that. This matters for the pieces which are
+                  views of reused buffers (e.g. wizard.decoder), which need as many
+                  buffer sets as buffers here.
+                  The netCDF4 and HDF5 libraries are not thread safe. Do not read
+                  files in the main thread while the background thread is reading.
+"""
+import sys
+import threading
+try:
+    import Queue as queue
+except ImportError:
+    import queue
+
+# marks the end of the pieces in the queue
+_end = object()
+
+def background(iterable, buffers=2):
+    '''
+    Iterate over the iterable (e.g. the blocks of a reader) in a background thread
+    and yield its items, with at most the given number of items in memory.
+    An exception raised by the iterable is raised again in the main thread.
+    '''
+    if buffers < 2:
+        # nothing to overlap
+        for item in iterable:
+            yield item
+        return
+    slots = threading.Semaphore(buffers)
+    # the slots bound the memory, the queue never blocks the reader
+    pieces = queue.Queue(maxsize=buffers)
+    stop = threading.Event()
+
+    def read():
+        try:
+            for item in iterable:
+                pieces.put((item, None))
+                # wait until the item before the current one is released
+                slots.acquire()
+                if stop.is_set():
+                    return
+        except Exception:
+            pieces.put((None, sys.exc_info()[1]))
+            return
+        pieces.put((_end, None))
+
+    # the item which is processed takes one of the slots
+    slots.acquire()
+    thread = threading.Thread(target=read)
+    thread.daemon = True
+    thread.start()
+    try:
+        while True:
+            item, error = pieces.get()
+            if error is not None:
+                raise error
+            if item is _end:
+                break
+            yield item
+            # the previous item is not used anymore
+            slots.release()
+    finally:
+        # stop the reader if the loop of the caller ends early
+        stop.set()
+        slots.release()
+        thread.join()
+
+def read_ahead(function, tasks, buffers=2):
+    '''
+    Apply function (e.g. the retrieval of a chunk) to each of the tasks in order,
+    in a background thread, and yield the results in the same order.
+    '''
+    return background((function(*task) for task in tasks), buffers)
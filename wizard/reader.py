@@ -0,0 +1,452 @@
+"""
+Copyright Netherlands eScience Center
+
+Function        : Dataset adapters for the AMET engine
+Author          : Yang Liu
+Date            : 2018.1.24
+Last Update     : 2018.2.23
+Description     : Each reanalysis dataset comes with its own file layout:
+                  MERRA2        daily netCDF4 files (stream 100/200/300/400)
+                  ERA-Interim   monthly netCDF files T_q, u_v and z_lnsp
+                  JRA55         GRIB files of 10 days per variable, and a yearly
+                                GRIB file of surface pressure
+                  EC-Earth      monthly GRIB output ICMSH (spectral fields, either
+                                converted to the grid by CDO or transformed in
+                                memory) and ICMGG (Gaussian grid)
+                  A reader hides the layout and hands the fields of a month to the
+                  AMET engine (wizard.engine) as a series of blocks with the axes
+                  (time, level, lat, lon). The orientation of the dataset is given
+                  as metadata of the reader:
+                  A, B                  half level table in the order of the model
+                                        levels, A in Pa (see wizard.levels)
+                  latitude_descending   True if latitude is from north to south
+                  polar_rows            rows of latitude where the meridional
+                                        correction wind is set to 0
+                  Hence every optimization of the engine benefits all the datasets.
+                  Each block carries the day of the month of its time steps, if they
+                  are all from the same day, for the daily AMET of the engine.
+Return Value    : generator of Block
+Dependencies    : os, calendar, numpy, netCDF4, pygrib (JRA55 and EC-Earth only)
+                  wizard.gribindex, wizard.levels, wizard.spectral
+variables       : Absolute Temperature              T         [K]
+                  Specific Humidity                 q         [kg/kg]
+                  Surface Pressure                  ps        [Pa]
+                  Zonal Wind                        u         [m/s]
+                  Meridional Wind                   v         [m/s]
+                  Surface geopotential              z         [m2/s2]
+                  Geopotential on model levels      gz        [m2/s2]
+Caveat!!        : The coordinates (latitude, longitude) of a reader are known once the
+                  first block has been read.
+                  GRIB files are read through their message index (wizard.gribindex).
+"""
+import os
+import calendar
+import numpy as np
+from netCDF4 import Dataset
+import wizard.gribindex
+import wizard.levels
+import wizard.spectral
+
+class Block(object):
+    '''
+    A block of consecutive time steps (time, level, lat, lon) of the fields
+    needed by the AMET engine. Either the surface geopotential z (time, lat, lon)
+    or the geopotential on the model levels gz (time, level, lat, lon) is given.
+    The day of the month (from 1) of the time steps is given if they are all from
+    the same day, otherwise it is None.
+    '''
+    def __init__(self, T, q, u, v, ps, z=None, gz=None, day=None):
+        if z is None and gz is None:
+            raise ValueError("Either the surface geopotential z or the geopotential gz must be given.")
+        self.T = T
+        self.q = q
+        self.u = u
+        self.v = v
+        self.ps = ps
+        self.z = z
+        self.gz = gz
+        self.day = day
+
+    def __len__(self):
+        # number of time steps
+        return self.T.shape[0]
+
+class Reader(object):
+    '''
+    Base class of the dataset adapters. A subclass sets the A and B values,
+    the orientation of latitude and the polar rows, and implements
+        blocks(year, month)
+    which yields the fields of the given month as Block, in order of time, and
+    sets the coordinates (latitude, longitude) with the first block, and
+        edge_states(year, month)
+    which reads the states just before and after the month, for the tendency terms
+    as centred differences.
+    '''
+    A = None
+    B = None
+    latitude_descending = False
+    # the first and the last latitude are the polar rows (or the rows next to the
+    # poles on a Gaussian grid), where the meridional correction wind is set to 0
+    polar_rows = (0, -1)
+
+    def __init__(self, datapath):
+        self.datapath = datapath
+        self.latitude = None
+        self.longitude = None
+
+    @property
+    def toa_first(self):
+        '''
+        True if the model levels are from TOA to surface.
+        '''
+        return self.B[0] < self.B[-1]
+
+    def dy(self, radius):
+        '''
+        Meridional grid length [m] on the sphere of the given radius [m], for a grid
+        from pole to pole.
+        '''
+        return np.pi * radius / (len(self.latitude) - 1)
+
+    def edge_states(self, year, month):
+        '''
+        The state (ps, q) at the last time step of the previous month and at the
+        first time step of the next month. A state beyond the period of the dataset
+        (e.g. the month after the last file) is None.
+        '''
+        return None, None
+
+def _netcdf_slab(var_key, name, index):
+    # take a hyperslab of a netCDF variable as a plain numpy array
+    return np.ma.filled(var_key.variables[name][index], np.nan)
+
+class MERRA2Reader(Reader):
+    '''
+    MERRA2 daily files, one block per day (8 time steps).
+    '''
+    A = wizard.levels.MERRA2_A
+    B = wizard.levels.MERRA2_B
+    latitude_descending = False
+    # the subset starts from 20N, only the north pole is a polar row
+    polar_rows = (-1,)
+
+    def dy(self, radius):
+        # the subset (20N - 90N) keeps the meridional grid length of the full grid
+        return np.pi * radius / 361
+
+    def filename(self, year, month, day):
+        '''
+        Path to the daily file of the given date (day starts from 1).
+        '''
+        if year < 1992:
+            stream = 100
+        elif year < 2001:
+            stream = 200
+        elif year < 2011:
+            stream = 300
+        else:
+            stream = 400
+        return self.datapath + os.sep + 'merra%d' % (year) + os.sep +\
+               'MERRA2_%d.inst3_3d_asm_Nv.%d%02d%02d.SUB.nc4' % (stream, year, month, day)
+
+    def _state(self, year, month, day, index):
+        if not os.path.exists(self.filename(year, month, day)):
+            return None
+        var_key = Dataset(self.filename(year, month, day))
+        try:
+            ps = _netcdf_slab(var_key, 'PS', index)
+            q = _netcdf_slab(var_key, 'QV', index)
+        finally:
+            var_key.close()
+        return ps, q
+
+    def blocks(self, year, month):
+        days = calendar.monthrange(year, month)[1]
+        for day in np.arange(1, days + 1):
+            var_key = Dataset(self.filename(year, month, day))
+            if self.latitude is None:
+                self.latitude = var_key.variables['lat'][:]
+                self.longitude = var_key.variables['lon'][:]
+            block = Block(T = _netcdf_slab(var_key, 'T', slice(None)),
+                          q = _netcdf_slab(var_key, 'QV', slice(None)),
+                          u = _netcdf_slab(var_key, 'U', slice(None)),
+                          v = _netcdf_slab(var_key, 'V', slice(None)),
+                          ps = _netcdf_slab(var_key, 'PS', slice(None)),
+                          z = _netcdf_slab(var_key, 'PHIS', slice(None)),
+                          day = day)
+            var_key.close()
+            yield block
+
+    def edge_states(self, year, month):
+        if month == 1:
+            state_last = self._state(year - 1, 12, 31, -1)
+        else:
+            state_last = self._state(year, month - 1, calendar.monthrange(year, month - 1)[1], -1)
+        if month == 12:
+            state_next = self._state(year + 1, 1, 1, 0)
+        else:
+            state_next = self._state(year, month + 1, 1, 0)
+        return state_last, state_next
+
+class ERAInterimReader(Reader):
+    '''
+    ERA-Interim monthly files, one block per day (4 time steps).
+    '''
+    A = wizard.levels.ERAI_A
+    B = wizard.levels.ERAI_B
+    latitude_descending = True
+
+    def filename(self, year, month, fields):
+        '''
+        Path to the monthly file of the given fields ('T_q', 'u_v' or 'z_lnsp').
+        '''
+        return self.datapath + os.sep + 'era%d' % (year) + os.sep +\
+               'model_daily_075_%d_%d_%s.nc' % (year, month, fields)
+
+    def _state(self, year, month, index):
+        if not os.path.exists(self.filename(year, month, 'T_q')):
+            return None
+        T_q_key = Dataset(self.filename(year, month, 'T_q'))
+        z_lnsp_key = Dataset(self.filename(year, month, 'z_lnsp'))
+        try:
+            ps = np.exp(_netcdf_slab(z_lnsp_key, 'lnsp', index))
+            q = _netcdf_slab(T_q_key, 'q', index)
+        finally:
+            T_q_key.close()
+            z_lnsp_key.close()
+        return ps, q
+
+    def blocks(self, year, month):
+        T_q_key = Dataset(self.filename(year, month, 'T_q'))
+        u_v_key = Dataset(self.filename(year, month, 'u_v'))
+        z_lnsp_key = Dataset(self.filename(year, month, 'z_lnsp'))
+        if self.latitude is None:
+            self.latitude = T_q_key.variables['latitude'][:]
+            self.longitude = T_q_key.variables['longitude'][:]
+        try:
+            steps = len(T_q_key.variables['time'][:])
+            # 4 time steps (00:00 - 18:00) is a day
+            for t in np.arange(0, steps, 4):
+                index = slice(t, min(t + 4, steps))
+                yield Block(T = _netcdf_slab(T_q_key, 't', index),
+                            q = _netcdf_slab(T_q_key, 'q', index),
+                            u = _netcdf_slab(u_v_key, 'u', index),
+                            v = _netcdf_slab(u_v_key, 'v', index),
+                            ps = np.exp(_netcdf_slab(z_lnsp_key, 'lnsp', index)),
+                            z = _netcdf_slab(z_lnsp_key, 'z', index),
+                            day = t // 4 + 1)
+        finally:
+            T_q_key.close()
+            u_v_key.close()
+            z_lnsp_key.close()
+
+    def edge_states(self, year, month):
+        if month == 1:
+            state_last = self._state(year - 1, 12, -1)
+        else:
+            state_last = self._state(year, month - 1, -1)
+        if month == 12:
+            state_next = self._state(year + 1, 1, 0)
+        else:
+            state_next = self._state(year, month + 1, 0)
+        return state_last, state_next
+
+class JRA55Reader(Reader):
+    '''
+    JRA55 GRIB files of 10 days (the last chunk takes the rest of the month),
+    one block per day (4 time steps). The geopotential height on the model
+    levels [gpm] is converted to geopotential with the gravitational
+    acceleration g.
+    '''
+    A = wizard.levels.JRA55_A
+    B = wizard.levels.JRA55_B
+    latitude_descending = True
+    # name of the variables in the filename
+    fields = ('007_hgt', '011_tmp', '033_ugrd', '034_vgrd', '051_spfh')
+
+    def __init__(self, datapath, g=9.80616, index_path=None):
+        super(JRA55Reader, self).__init__(datapath)
+        self.g = g
+        # directory of the GRIB message index (None to save it next to the GRIB files)
+        self.index_path = index_path
+
+    def filename(self, year, month, field, first_day, last_day):
+        '''
+        Path to the GRIB file of the given field covering first_day - last_day.
+        '''
+        return self.datapath + os.sep + 'jra%d' % (year) + os.sep +\
+               'anl_mdl.%s.reg_tl319.%d%02d%02d00_%d%02d%02d18' % (field, year, month, first_day,
+                                                                    year, month, last_day)
+
+    def filename_surface(self, year):
+        '''
+        Path to the GRIB file of the surface pressure of the given year.
+        '''
+        return self.datapath + os.sep + 'jra_surf' + os.sep +\
+               'anl_surf.001_pres.reg_tl319.%d010100_%d123118' % (year, year)
+
+    def _day(self, grib, year, month, day):
+        # message numbers of the given day (00:00 - 18:00), by time and then level
+        first = ((year * 100 + month) * 100 + day) * 10000
+        return grib.select(valid=(first, first + 1800))
+
+    def _state(self, year, month, day, hour):
+        # the state (ps, q) at the given time step, from the surface pressure of the
+        # year and the specific humidity of the 10 days which contain the day
+        days = calendar.monthrange(year, month)[1]
+        first_day, last_day = ((1, 10), (11, 20), (21, days))[min((day - 1) // 10, 2)]
+        filename = self.filename(year, month, '051_spfh', first_day, last_day)
+        filename_surface = self.filename_surface(year)
+        if not (os.path.exists(filename) and os.path.exists(filename_surface)):
+            return None
+        valid = ((year * 100 + month) * 100 + day) * 10000 + hour * 100
+        grib_q = wizard.gribindex.MessageIndex(filename, self.index_path)
+        grib_sp = wizard.gribindex.MessageIndex(filename_surface, self.index_path)
+        try:
+            q = grib_q.values(grib_q.select(valid=valid))
+            ps = grib_sp.values(grib_sp.select(valid=valid))[0]
+        finally:
+            grib_q.close()
+            grib_sp.close()
+        return ps, q
+
+    def blocks(self, year, month):
+        levels = len(self.A) - 1
+        days = calendar.monthrange(year, month)[1]
+        grib_sp = wizard.gribindex.MessageIndex(self.filename_surface(year), self.index_path)
+        try:
+            for first_day, last_day in ((1, 10), (11, 20), (21, days)):
+                gribs = [wizard.gribindex.MessageIndex(self.filename(year, month, field, first_day, last_day),
+                                                       self.index_path) for field in self.fields]
+                try:
+                    if self.latitude is None:
+                        lats, lons = gribs[0].message(1).latlons()
+                        self.latitude = lats[:,0]
+                        self.longitude = lons[0,:]
+                    for day in np.arange(first_day, last_day + 1):
+                        fields = []
+                        for grib in gribs:
+                            values = grib.values(self._day(grib, year, month, day))
+                            fields.append(values.reshape((-1, levels) + values.shape[1:]))
+                        ps = grib_sp.values(self._day(grib_sp, year, month, day))
+                        gz, T, u, v, q = fields
+                        yield Block(T, q, u, v, ps, gz = gz * self.g, day = day)
+                finally:
+                    for grib in gribs:
+                        grib.close()
+        finally:
+            grib_sp.close()
+
+    def edge_states(self, year, month):
+        # 4 time steps a day (00:00 - 18:00)
+        if month == 1:
+            state_last = self._state(year - 1, 12, 31, 18)
+        else:
+            state_last = self._state(year, month - 1, calendar.monthrange(year, month - 1)[1], 18)
+        if month == 12:
+            state_next = self._state(year + 1, 1, 1, 0)
+        else:
+            state_next = self._state(year, month + 1, 1, 0)
+        return state_last, state_next
+
+class ECEarthReader(Reader):
+    '''
+    EC-Earth monthly GRIB output, one block per record (a single time step).
+    The geopotential on the model levels is given in the output.
+    Per record the messages are:
+    ICMSH   u (91), v (91), T (91), gz (91), w (91) and 2 surface fields
+    ICMGG   34 surface and land fields, q (91), sp and 10 other fields
+    The first record of ICMSH comes after a single extra message.
+    With spectral, ICMSH is the spectral output of the model, whose fields are
+    transformed to the Gaussian grid of ICMGG in memory (wizard.spectral), otherwise
+    it is converted to the grid already (cdo sp2gpl).
+    '''
+    A = wizard.levels.ECEARTH_A
+    B = wizard.levels.ECEARTH_B
+    latitude_descending = True
+    # number of messages for one record
+    num_SH_per = 457
+    num_GG_per = 136
+
+    def __init__(self, datapath, index_path=None, spectral=False):
+        super(ECEarthReader, self).__init__(datapath)
+        # directory of the GRIB message index (None to save it next to the GRIB files)
+        self.index_path = index_path
+        self.spectral = spectral
+        self.transform = None
+
+    def to_grid(self, values):
+        '''
+        Transform the spectral fields (field, GRIB values) to the grid (field, lat, lon).
+        The Legendre functions are computed for the first field and kept.
+        '''
+        if self.transform is None:
+            self.transform = wizard.spectral.SpectralTransform(wizard.spectral.truncation(values),
+                                                               wizard.spectral.gaussian_latitudes(len(self.latitude)),
+                                                               len(self.longitude))
+        return self.transform.grid(values)
+
+    def filename(self, year, month, grid):
+        '''
+        Path to the output on the given grid ('SH' or 'GG') of the given month.
+        '''
+        return self.datapath + os.sep + 'ICM%sECE3+%d%02d' % (grid, year, month)
+
+    def _state(self, year, month, record):
+        # the state (ps, q) of the given record (negative from the end) of ICMGG
+        filename = self.filename(year, month, 'GG')
+        if not os.path.exists(filename):
+            return None
+        levels = len(self.A) - 1
+        ICMGGECE = wizard.gribindex.MessageIndex(filename, self.index_path)
+        try:
+            if record < 0:
+                record += ICMGGECE.messages // self.num_GG_per
+            first_GG = 35 + record * self.num_GG_per
+            q = ICMGGECE.values(np.arange(first_GG, first_GG + levels))
+            ps = ICMGGECE.values([first_GG + levels])[0]
+        finally:
+            ICMGGECE.close()
+        return ps, q
+
+    def blocks(self, year, month):
+        levels = len(self.A) - 1
+        ICMSHECE = wizard.gribindex.MessageIndex(self.filename(year, month, 'SH'), self.index_path)
+        ICMGGECE = wizard.gribindex.MessageIndex(self.filename(year, month, 'GG'), self.index_path)
+        try:
+            lats, lons = ICMGGECE.message(1).latlons()
+            self.latitude = lats[:,0]
+            self.longitude = lons[0,:]
+            num_record = ICMGGECE.messages // self.num_GG_per
+            # 8 records a day, the first record (00:00) of the year is missing
+            missing = calendar.monthrange(year, month)[1] * 8 - num_record
+            for i in np.arange(num_record):
+                # spectral fields (converted to the grid), after the extra message in front
+                first_SH = 2 + i * self.num_SH_per
+                fields = ICMSHECE.values(np.arange(first_SH, first_SH + 4*levels))
+                if self.spectral:
+                    # the levels of each field are transformed together
+                    grid = np.empty((4*levels, len(self.latitude), len(self.longitude)), dtype=float)
+                    for k in np.arange(4):
+                        grid[k*levels:(k+1)*levels] = self.to_grid(fields[k*levels:(k+1)*levels])
+                    fields = grid
+                u, v, T, gz = fields.reshape((4, 1, levels) + fields.shape[1:])
+                # Gaussian grid
+                first_GG = 35 + i * self.num_GG_per
+                q = ICMGGECE.values(np.arange(first_GG, first_GG + levels))[np.newaxis,:,:,:]
+                ps = ICMGGECE.values([first_GG + levels])
+                yield Block(T, q, u, v, ps, gz = gz, day = (i + missing) // 8 + 1)
+        finally:
+            ICMSHECE.close()
+            ICMGGECE.close()
+
+    def edge_states(self, year, month):
+        if month == 1:
+            state_last = self._state(year - 1, 12, -1)
+        else:
+            state_last = self._state(year, month - 1, -1)
+        if month == 12:
+            state_next = self._state(year + 1, 1, 0)
+        else:
+            state_next = self._state(year, month + 1, 0)
+        return state_last, state_next
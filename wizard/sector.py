@@ -0,0 +1,66 @@
+"""
+Copyright Netherlands eScience Center
+
+Function        : Sector and basin integrals of the meridional energy transport
+Author          : Yang Liu
+Date            : 2018.2.18
+Last Update     : 2018.2.18
+Description     : Only the full zonal integral of AMET was written to the zonal
+                  integral files, hence the analysis of a sector (e.g. the Atlantic)
+                  had to read the files of each grid point again, which take many GB.
+                  The module defines the sectors and takes the integral of the energy
+                  transport at each grid point over each of them, along with the zonal
+                  integral, so that the sector integrals end up in the small files.
+                  A sector is given either by its longitude bounds (west, east) in
+                  degrees east, which may cross the date line or the meridian 0,
+                  e.g. (-80, 20) or (280, 20) for the Atlantic, or by a mask or weights
+                  on the grid (lat, lon) for a basin of any shape.
+Return Value    : numpy arrays
+Dependencies    : numpy
+Caveat!!        : The longitude sectors run from pole to pole and include the land,
+                  e.g. the Atlantic sector contains West Africa and Western Europe.
+                  The names of the sectors are appended to the names of the variables,
+                  e.g. E_Atlantic, so they must be valid in a netCDF variable name.
+"""
+import numpy as np
+
+# default longitude sectors (name, (west, east)) [degrees east]
+sectors = (('Atlantic', (-80.0, 20.0)),
+           ('Pacific', (120.0, 280.0)),
+           ('Eurasia', (-10.0, 180.0)))
+
+def longitude_mask(longitude, west, east):
+    '''
+    True for the longitudes in the sector from west to east (west included, east
+    excluded) [degrees east], in any convention (-180 to 180 or 0 to 360).
+    '''
+    width = np.mod(east - west, 360.0)
+    if width == 0:
+        # the full circle
+        width = 360.0
+    return np.mod(np.asarray(longitude, dtype=float) - west, 360.0) < width
+
+def masks(latitude, longitude, sectors=sectors):
+    '''
+    Weights (lat, lon) of each sector on the grid, as a list of (name, weights).
+    A sector is defined by its longitude bounds (west, east) or its weights (lat, lon).
+    '''
+    sector_masks = []
+    for name, definition in sectors:
+        if np.ndim(definition) == 2:
+            weights = np.asarray(definition, dtype=float)
+            if weights.shape != (len(latitude), len(longitude)):
+                raise ValueError("The mask of sector %s does not match the grid." % (name))
+        else:
+            west, east = definition
+            weights = np.repeat(longitude_mask(longitude, west, east)[np.newaxis,:], len(latitude), 0).astype(float)
+        sector_masks.append((name, weights))
+
+    return sector_masks
+
+def integral(point, weights):
+    '''
+    Integral over the sector of the field at each grid point (..., lat, lon), along
+    the longitude, with the weights (lat, lon) of the sector.
+    '''
+    return np.sum(point * weights, -1)
@@ -0,0 +1,112 @@
+"""
+Copyright Netherlands eScience Center
+
+Function        : Store of the states at the boundaries of each month
+Author          : Yang Liu
+Date            : 2018.2.7
+Last Update     : 2018.2.7
+Description     : The tendency terms in mass correction need the surface pressure and
+                  the precipitable water (vertical integral of q dp / g) at the first
+                  and the last time step of the month, and at the adjacent time steps
+                  of the previous and the next month. The module keeps these 2D fields
+                  in a small numpy archive (.npz) for each month and edge ('first' or
+                  'last'), which is written as a by-product of the processing of the
+                  month. A month takes the states of its neighbours from the store,
+                  instead of opening their files and reading the 3D fields again, so
+                  the months (and the years) do not depend on each other at run time.
+                  If a state is not in the store yet, it is read from the data once and
+                  saved, so every boundary state is read at most once.
+Return Value    : tuple (ps, precipitable water) of numpy arrays (lat, lon)
+Dependencies    : os, numpy
+Caveat!!        : The states are identified only by year, month and edge. Remove them
+                  (or use a new snapshot path) after changing the dataset or the grid.
+"""
+import os
+import numpy as np
+
+def snapshot_file(snapshot_path, year, month, edge):
+    '''
+    Path of the state at the given edge ('first' or 'last') of the month.
+    '''
+    return os.path.join(snapshot_path, 'snapshot_%d_%02d_%s.npz' % (year, month, edge))
+
+def save(snapshot_path, year, month, edge, ps, moisture):
+    '''
+    Save the surface pressure [Pa] and the precipitable water [kg/m2] (lat, lon)
+    at the given edge ('first' or 'last') of the month.
+    '''
+    if not os.path.exists(snapshot_path):
+        try:
+            os.makedirs(snapshot_path)
+        except OSError:
+            # created by another job in the meantime
+            if not os.path.isdir(snapshot_path):
+                raise
+    filename = snapshot_file(snapshot_path, year, month, edge)
+    filename_temp = filename + '.%d.tmp' % (os.getpid())
+    with open(filename_temp, 'wb') as snapshot:
+        np.savez(snapshot, ps=ps, moisture=moisture)
+    # the rename is atomic, the snapshot is either complete or absent
+    os.rename(filename_temp, filename)
+
+def load(snapshot_path, year, month, edge):
+    '''
+    Load the state (ps, precipitable water) at the given edge of the month.
+    None is returned if it is not in the store.
+    '''
+    filename = snapshot_file(snapshot_path, year, month, edge)
+    if not os.path.exists(filename):
+        return None
+    snapshot = np.load(filename)
+    try:
+        state = (snapshot['ps'], snapshot['moisture'])
+    finally:
+        snapshot.close()
+
+    return state
+
+def previous_month(year, month):
+    '''
+    Year and month before the given month.
+    '''
+    if month == 1:
+        return year - 1, 12
+    return year, month - 1
+
+def next_month(year, month):
+    '''
+    Year and month after the given month.
+    '''
+    if month == 12:
+        return year + 1, 1
+    return year, month + 1
+
+def neighbours(snapshot_path, year, month):
+    '''
+    The state at the last time step of the previous month and at the first time
+    step of the next month, each None if it is not in the store.
+    '''
+    year_before, month_before = previous_month(year, month)
+    year_after, month_after = next_month(year, month)
+    return load(snapshot_path, year_before, month_before, 'last'), \
+           load(snapshot_path, year_after, month_after, 'first')
+
+def tendency(state_before, state_start, state_end, state_after, period):
+    '''
+    Tendency of the surface pressure [Pa/s] and of the precipitable water [kg/(m2 s)]
+    over the month, which lasts period [s]. The states are (ps, precipitable water).
+    With the states of the adjacent months, the states at the edges are taken as
+    the mean over the boundary, otherwise only the states of the month are used.
+    '''
+    ps_start, moisture_start = state_start
+    ps_end, moisture_end = state_end
+    if state_before is None or state_after is None:
+        ps_tendency = (ps_end - ps_start) / period
+        moisture_tendency = (moisture_end - moisture_start) / period
+    else:
+        ps_before, moisture_before = state_before
+        ps_after, moisture_after = state_after
+        ps_tendency = ((ps_end + ps_after) / 2 - (ps_before + ps_start) / 2) / period
+        moisture_tendency = ((moisture_end + moisture_after) / 2 - (moisture_before + moisture_start) / 2) / period
+
+    return ps_tendency, moisture_tendency
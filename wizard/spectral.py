@@ -0,0 +1,134 @@
+"""
+Copyright Netherlands eScience Center
+
+Function        : Transform of spectral fields to the Gaussian grid (EC-Earth ICMSH)
+Author          : Yang Liu
+Date            : 2018.2.22
+Last Update     : 2018.2.22
+Description     : The fields u, v, T and gz of the EC-Earth output ICMSH are given as
+                  spherical harmonic coefficients (TL511, 91 levels). They were converted
+                  to the N256 Gaussian grid by CDO (cdo sp2gpl) before the AMET scripts,
+                  which writes a full copy of each month to disk. The module takes the
+                  inverse transform in memory, the same as sp2gpl:
+                  1. Legendre transform, from the coefficients of each zonal wavenumber
+                     m to its Fourier coefficient at each latitude
+                  2. inverse FFT along the latitude circle
+                  The associated Legendre functions of all the latitudes are computed once
+                  for the grid and kept, only those of the northern hemisphere are needed,
+                  since the functions are symmetric (n - m even) or antisymmetric (n - m
+                  odd) about the equator. For each wavenumber, the coefficients of all the
+                  given fields (e.g. 91 levels) are transformed in a single matrix product.
+                  The coefficients follow the convention of ECMWF:
+                  f(lambda, mu) = sum_m sum_n f_n^m P_n^m(mu) exp(i m lambda)
+                  with f_n^-m the complex conjugate of f_n^m, and the Legendre functions
+                  normalized as 1/2 int P_n^m(mu)^2 dmu = 1 without the Condon-Shortley
+                  phase, so that f_0^0 is the global mean. The GRIB values are the real
+                  and imaginary parts of the coefficients, ordered by m and then n.
+Return Value    : numpy arrays (..., lat, lon)
+Dependencies    : numpy
+Caveat!!        : The Legendre functions take (T+1)(T+2)/2 x nlat/2 x 8 bytes, e.g. 270 MB
+                  for TL511 on the N256 grid. The grid must be symmetric about the equator.
+                  Each field is transformed as a scalar, as sp2gpl does.
+"""
+import numpy as np
+
+def gaussian_latitudes(num_latitude):
+    '''
+    Latitudes [degree] of the Gaussian grid with the given number of latitudes
+    (e.g. 512 for N256), from north to south.
+    '''
+    mu, weights = np.polynomial.legendre.leggauss(num_latitude)
+    return np.rad2deg(np.arcsin(mu))[::-1]
+
+def truncation(values):
+    '''
+    Triangular truncation T of the spectral field, from the number of its GRIB values
+    (real and imaginary parts of (T+1)(T+2)/2 coefficients) on the last axis.
+    '''
+    num_coefficient = np.shape(values)[-1] // 2
+    T = int(round((np.sqrt(8 * num_coefficient + 1) - 3) / 2))
+    if (T + 1) * (T + 2) // 2 != num_coefficient:
+        raise ValueError("%d values do not make a triangular truncation." % (np.shape(values)[-1]))
+    return T
+
+def legendre(T, mu):
+    '''
+    Associated Legendre functions P_n^m(mu) for m = 0 ... T, as a list of arrays
+    (n = m ... T, latitude), normalized as 1/2 int P_n^m(mu)^2 dmu = 1.
+    '''
+    mu = np.asarray(mu, dtype=float)
+    cos_phi = np.sqrt(1 - mu * mu)
+    functions = []
+    P_mm = np.ones(mu.shape, dtype=float)
+    for m in np.arange(T + 1):
+        if m > 0:
+            P_mm = np.sqrt((2.0 * m + 1) / (2.0 * m)) * cos_phi * P_mm
+        P_m = np.empty((T + 1 - m,) + mu.shape, dtype=float)
+        P_m[0] = P_mm
+        if m < T:
+            P_m[1] = np.sqrt(2.0 * m + 3) * mu * P_mm
+        for n in np.arange(m + 2, T + 1):
+            a = np.sqrt((4.0 * n * n - 1) / (n * n - m * m))
+            b = np.sqrt(((n - 1.0)**2 - m * m) / (4.0 * (n - 1.0)**2 - 1))
+            P_m[n-m] = a * (mu * P_m[n-m-1] - b * P_m[n-m-2])
+        functions.append(P_m)
+
+    return functions
+
+class SpectralTransform(object):
+    '''
+    Inverse transform of the spherical harmonic coefficients of truncation T to the
+    grid of the given latitude [degree] (symmetric about the equator, e.g. the
+    Gaussian latitudes) and number of longitudes, starting from longitude 0.
+    '''
+    def __init__(self, T, latitude, num_longitude):
+        latitude = np.asarray(latitude, dtype=float)
+        if len(latitude) % 2 or not np.allclose(latitude, -latitude[::-1]):
+            raise ValueError("The latitudes are not symmetric about the equator.")
+        if num_longitude < 2 * T + 1:
+            raise ValueError("%d longitudes can not resolve the truncation T%d." % (num_longitude, T))
+        self.T = T
+        self.num_latitude = len(latitude)
+        self.num_longitude = num_longitude
+        self.half = len(latitude) // 2
+        # the functions of the hemisphere of the first latitude, the other is its mirror
+        mu = np.sin(np.deg2rad(latitude[:self.half]))
+        # symmetric (n - m even) and antisymmetric (n - m odd) functions (latitude, n)
+        self.even = []
+        self.odd = []
+        for P_m in legendre(T, mu):
+            self.even.append(np.ascontiguousarray(P_m[0::2].T))
+            self.odd.append(np.ascontiguousarray(P_m[1::2].T))
+        # first coefficient of each wavenumber m
+        self.offset = np.concatenate(([0], np.cumsum(np.arange(T + 1, 0, -1))))
+
+    def grid(self, values):
+        '''
+        Grid values (..., lat, lon) of the spectral fields given by their GRIB values
+        (..., 2 * number of coefficients), e.g. (level, 2 * 131328) for TL511.
+        '''
+        values = np.asarray(values, dtype=float)
+        if truncation(values) != self.T:
+            raise ValueError("The fields are not of the truncation T%d." % (self.T))
+        leading = values.shape[:-1]
+        # real parts of all the fields, followed by their imaginary parts (coefficient, field)
+        pairs = values.reshape((-1, values.shape[-1] // 2, 2))
+        num_field = pairs.shape[0]
+        coefficients = np.concatenate((pairs[:,:,0].T, pairs[:,:,1].T), 1)
+        # Fourier coefficients (m, latitude, field), each wavenumber is a contiguous block
+        fourier = np.zeros((self.num_longitude // 2 + 1, self.num_latitude, num_field), dtype=complex)
+        for m in np.arange(self.T + 1):
+            c_m = coefficients[self.offset[m]:self.offset[m+1]]
+            # all the fields in a single matrix product (latitude, field)
+            even = np.dot(self.even[m], c_m[0::2])
+            odd = np.dot(self.odd[m], c_m[1::2])
+            north = even + odd
+            south = (even - odd)[::-1]
+            fourier[m,:self.half,:] = north[:,:num_field] + 1j * north[:,num_field:]
+            fourier[m,self.half:,:] = south[:,:num_field] + 1j * south[:,num_field:]
+        # f = F_0 + 2 Re sum_m F_m exp(i m lambda), irfft divides by the number of longitudes
+        fourier = np.ascontiguousarray(fourier.transpose((2, 1, 0)))
+        grid = np.fft.irfft(fourier, self.num_longitude, axis=-1)
+        grid *= self.num_longitude
+
+        return grid.reshape(leading + (self.num_latitude, self.num_longitude))
@@ -0,0 +1,100 @@
+"""
+Copyright Netherlands eScience Center
+
+Function        : Accurate summation for single precision fields
+Author          : Yang Liu
+Date            : 2018.1.17
+Last Update     : 2018.1.17
+Description     : The module provides the running sums used by the vertical and zonal
+                  integrals. In single precision (float32) the rounding error of a
+                  plain running sum grows with the number of terms, which is why
+                  compensated (Kahan) summation is offered. The error of the sum then
+                  stays at the level of a single rounding, independent of the number
+                  of model levels or grid points.
+                  An accuracy report compares the zonal integrals of the single
+                  precision path with the double precision (float64) path in PW.
+Return Value    : numpy arrays
+Dependencies    : numpy
+Caveat!!        : The compensated sum relies on the exact order of the floating point
+                  operations, so it must not be rewritten into fewer numpy expressions.
+"""
+import numpy as np
+
+class RunningSum(object):
+    '''
+    Plain running sum of arrays with the given shape.
+    '''
+    def __init__(self, shape, dtype=float):
+        self.total = np.zeros(shape, dtype=dtype)
+
+    def add(self, term):
+        self.total += term
+
+    def value(self):
+        return self.total
+
+class CompensatedSum(object):
+    '''
+    Running sum of arrays with the given shape, using Kahan compensated summation.
+    The lost low order part of each addition is kept in compensation and fed
+    back into the next addition.
+    '''
+    def __init__(self, shape, dtype=float):
+        self.total = np.zeros(shape, dtype=dtype)
+        self.compensation = np.zeros(shape, dtype=dtype)
+        # work space, reused for each addition
+        self._term = np.empty(shape, dtype=dtype)
+        self._total = np.empty(shape, dtype=dtype)
+
+    def add(self, term):
+        # y = term - c
+        np.subtract(term, self.compensation, out=self._term)
+        # t = total + y
+        np.add(self.total, self._term, out=self._total)
+        # c = (t - total) - y
+        np.subtract(self._total, self.total, out=self.compensation)
+        self.compensation -= self._term
+        # total = t, swap the buffers instead of copying
+        self.total, self._total = self._total, self.total
+
+    def value(self):
+        return self.total - self.compensation
+
+def compensated_sum(x, axis=-1, dtype=None):
+    '''
+    Sum of x along the given axis with Kahan compensated summation. The sum is
+    accumulated in dtype, which is the type of x by default.
+    '''
+    x = np.asarray(x)
+    if dtype is None:
+        dtype = x.dtype
+    x = np.moveaxis(x, axis, 0)
+    accumulator = CompensatedSum(x.shape[1:], dtype=dtype)
+    for i in np.arange(x.shape[0]):
+        accumulator.add(x[i])
+
+    return accumulator.value()
+
+def accuracy_report(names, reference, result, dx):
+    '''
+    Compare the zonal integrals of the vertically integrated energy fluxes (lat, lon)
+    of the single precision path (result) with those of the double precision path
+    (reference). The zonal integrals are taken in double precision, with dx the
+    zonal grid length at each latitude [m]. A list of lines is returned, with
+    the maximum absolute value and the maximum absolute difference in PW, and
+    their ratio, for each of the names.
+    '''
+    dx = np.asarray(dx, dtype=np.float64)
+    lines = ['%-16s %16s %16s %12s' % ('component', 'max |E| [PW]', 'max |dE| [PW]', 'relative')]
+    for name, flux_ref, flux in zip(names, reference, result):
+        E_ref = compensated_sum(np.asarray(flux_ref, dtype=np.float64), axis=-1) * dx / 1e+15
+        E = compensated_sum(np.asarray(flux, dtype=np.float64), axis=-1) * dx / 1e+15
+        scale = np.max(np.abs(E_ref))
+        error = np.max(np.abs(E - E_ref))
+        if scale > 0:
+            relative = error / scale
+        else:
+            relative = 0.0
+        lines.append('%-16s %16.6e %16.6e %12.3e' % (name, scale, error, relative))
+
+    return lines
@@ -0,0 +1,68 @@
+"""
+Copyright Netherlands eScience Center
+
+Function        : Memory-mapped cache of surface fields of a whole year
+Author          : Yang Liu
+Date            : 2018.1.31
+Last Update     : 2018.1.31
+Description     : A GRIB file with a surface field of a whole year (e.g. the surface
+                  pressure of JRA55, anl_surf.001_pres.reg_tl319.<year>010100_<year>123118)
+                  is decoded only once into a numpy file (.npy) on the local scratch
+                  disk. The file is opened as a read-only memory map (time, lat, lon),
+                  and any time window is a plain slice of it, instead of a walk
+                  through the GRIB messages.
+                  All the jobs on a node which use the same year open the same file,
+                  so they share a single copy in the page cache, and the decoding
+                  is not repeated by the rounds, months or jobs.
+Return Value    : numpy memmap (time, lat, lon)
+Dependencies    : os, numpy, wizard.gribindex
+Caveat!!        : The cache is written to a temporary file which is renamed when it is
+                  complete, so a job never sees a partial cache. Two jobs which start
+                  at the same time may both decode the year, the last one wins.
+                  The cache is decoded again if the GRIB file is newer than the cache.
+"""
+import os
+import numpy as np
+import wizard.gribindex
+
+def cache_file(grib_file, cache_path):
+    '''
+    Path of the cache of the given GRIB file.
+    '''
+    return os.path.join(cache_path, os.path.basename(grib_file) + '.npy')
+
+def build(grib_file, cache_path, index_path=None):
+    '''
+    Decode all the messages of the GRIB file into the cache (message, lat, lon).
+    '''
+    if not os.path.exists(cache_path):
+        try:
+            os.makedirs(cache_path)
+        except OSError:
+            # created by another job in the meantime
+            if not os.path.isdir(cache_path):
+                raise
+    filename = cache_file(grib_file, cache_path)
+    filename_temp = filename + '.%d.tmp' % (os.getpid())
+    grib = wizard.gribindex.MessageIndex(grib_file, index_path)
+    try:
+        shape = (grib.messages,) + grib.message(1).values.shape
+        field = np.lib.format.open_memmap(filename_temp, mode='w+', dtype=np.float64, shape=shape)
+        for i in np.arange(grib.messages):
+            field[i] = grib.message(i + 1).values
+        field.flush()
+        del field
+    finally:
+        grib.close()
+    # the rename is atomic, the cache is either complete or absent
+    os.rename(filename_temp, filename)
+
+def year_field(grib_file, cache_path, index_path=None):
+    '''
+    Surface field of the GRIB file as a read-only memory map (time, lat, lon).
+    The cache is built first if it does not exist yet.
+    '''
+    filename = cache_file(grib_file, cache_path)
+    if not os.path.exists(filename) or os.path.getmtime(filename) < os.path.getmtime(grib_file):
+        build(grib_file, cache_path, index_path)
+    return np.load(filename, mmap_mode='r')
@@ -0,0 +1,390 @@
+"""
+Copyright Netherlands eScience Center
+
+Function        : Synthetic reanalysis files in the layout of each dataset
+Author          : Yang Liu
+Date            : 2018.2.16
+Last Update     : 2018.2.16
+Description     : The AMET and OMET pipelines can only be run on the holdings of the
+                  reanalysis datasets (several TB) on the cluster. The module writes
+                  synthetic files with the same names, dimensions and variables as the
+                  files of each dataset, so that the readers (wizard.reader) and the
+                  kernels can be run and timed anywhere, e.g. on a laptop:
+                  MERRA2        daily inst3_3d_asm_Nv files (8 x 72 x 361 x 576)
+                  ERA-Interim   monthly T_q, u_v and z_lnsp files (60 levels, 0.75 deg)
+                  ORAS4         ORCA1 mesh_mask.nc, basin mask and the yearly thetao
+                                and vo files (42 x 292 x 362)
+                  SODA3         MOM5 topog.nc and the 5-daily files (50 x 1070 x 1440)
+                  The horizontal grid is scaled by a factor (1.0 gives the grid of the
+                  dataset), the levels of the atmosphere are kept, since the A and B
+                  values of the readers are fixed. The fields are smooth profiles of
+                  the right order of magnitude with random noise (fixed seed), the
+                  numbers are not physical.
+Return Value    : NetCDF files
+Dependencies    : os, calendar, numpy, netCDF4
+Caveat!!        : The files are uncompressed, hence their size is the size of the
+                  fields, which is used for the throughput in GB/s.
+"""
+import os
+import calendar
+import numpy as np
+from netCDF4 import Dataset
+
+def _scaled(size, scale, minimum=4):
+    # number of grid points of the scaled grid
+    return max(int(round(size * scale)), minimum)
+
+def _noise(random, shape):
+    # single precision, as the fields in the files of the datasets
+    return random.standard_normal(shape).astype(np.float32)
+
+def _atmosphere(random, steps, levels, latitude, longitude):
+    '''
+    Fields T, q, u, v (time, level, lat, lon), surface pressure and surface
+    geopotential (time, lat, lon) on the given grid, with the levels from TOA
+    to surface.
+    '''
+    shape = (steps, levels, len(latitude), len(longitude))
+    # fraction of the surface pressure at the middle of each level
+    sigma = ((np.arange(levels) + 0.5) / levels)[:,np.newaxis,np.newaxis]
+    coslat = np.cos(np.deg2rad(latitude))[:,np.newaxis]
+    T = (200 + 90 * sigma + 20 * coslat + _noise(random, shape)).astype(np.float32)
+    q = (0.015 * sigma**3 * coslat**2 * (1 + 0.1 * _noise(random, shape))).astype(np.float32)
+    q = np.maximum(q, 0)
+    u = (20 * (1 - sigma) * coslat + 5 * _noise(random, shape)).astype(np.float32)
+    v = (5 * _noise(random, shape)).astype(np.float32)
+    ps = (1e+5 + 1000 * _noise(random, (steps, len(latitude), len(longitude)))).astype(np.float32)
+    # mountains along some of the meridians
+    mountain = np.maximum(np.sin(np.deg2rad(3 * longitude)), 0) * coslat
+    z = np.repeat((9.80616 * 2000 * mountain)[np.newaxis,:,:], steps, 0).astype(np.float32)
+
+    return T, q, u, v, ps, z
+
+def _variable(dataset, name, dimensions, values, units, long_name, dtype=np.float32):
+    var = dataset.createVariable(name, dtype, dimensions)
+    var.units = units
+    var.long_name = long_name
+    var[:] = values
+    return var
+
+def merra2_day(datapath, year, month, day, scale=1.0, seed=0):
+    '''
+    Daily MERRA2 file inst3_3d_asm_Nv (8 time steps, 72 levels) with the
+    name of wizard.reader.MERRA2Reader. The grid is 361 x 576 times the scale.
+    '''
+    if year < 1992:
+        stream = 100
+    elif year < 2001:
+        stream = 200
+    elif year < 2011:
+        stream = 300
+    else:
+        stream = 400
+    folder = datapath + os.sep + 'merra%d' % (year)
+    if not os.path.exists(folder):
+        os.makedirs(folder)
+    filename = folder + os.sep + 'MERRA2_%d.inst3_3d_asm_Nv.%d%02d%02d.SUB.nc4' % (stream, year, month, day)
+    latitude = np.linspace(-90, 90, _scaled(360, scale) + 1)
+    longitude = np.linspace(-180, 180, _scaled(576, scale), endpoint=False)
+    random = np.random.RandomState(seed + year * 400 + month * 32 + day)
+    T, q, u, v, ps, z = _atmosphere(random, 8, 72, latitude, longitude)
+    dataset = Dataset(filename, 'w', format='NETCDF4')
+    try:
+        for name, size in (('time', 8), ('lev', 72), ('lat', len(latitude)), ('lon', len(longitude))):
+            dataset.createDimension(name, size)
+        _variable(dataset, 'time', ('time',), np.arange(0, 1440, 180), 'minutes since %d-%02d-%02d 00:00:00' % (year, month, day),
+                  'time', dtype=np.int32)
+        _variable(dataset, 'lev', ('lev',), np.arange(1, 73), 'layer', 'vertical level', dtype=np.float64)
+        _variable(dataset, 'lat', ('lat',), latitude, 'degrees_north', 'latitude', dtype=np.float64)
+        _variable(dataset, 'lon', ('lon',), longitude, 'degrees_east', 'longitude', dtype=np.float64)
+        _variable(dataset, 'T', ('time', 'lev', 'lat', 'lon'), T, 'K', 'air_temperature')
+        _variable(dataset, 'QV', ('time', 'lev', 'lat', 'lon'), q, 'kg kg-1', 'specific_humidity')
+        _variable(dataset, 'U', ('time', 'lev', 'lat', 'lon'), u, 'm s-1', 'eastward_wind')
+        _variable(dataset, 'V', ('time', 'lev', 'lat', 'lon'), v, 'm s-1', 'northward_wind')
+        _variable(dataset, 'PS', ('time', 'lat', 'lon'), ps, 'Pa', 'surface_pressure')
+        _variable(dataset, 'PHIS', ('time', 'lat', 'lon'), z, 'm+2 s-2', 'surface geopotential height')
+    finally:
+        dataset.close()
+
+    return filename
+
+def merra2(datapath, year, month, scale=1.0, seed=0):
+    '''
+    Daily MERRA2 files of the month, and of the days just before and after the
+    month, which are read for the tendency terms. The files of the month and the
+    number of time steps are returned.
+    '''
+    days = calendar.monthrange(year, month)[1]
+    filenames = [merra2_day(datapath, year, month, day, scale, seed) for day in np.arange(1, days + 1)]
+    if month == 1:
+        merra2_day(datapath, year - 1, 12, 31, scale, seed)
+    else:
+        merra2_day(datapath, year, month - 1, calendar.monthrange(year, month - 1)[1], scale, seed)
+    if month == 12:
+        merra2_day(datapath, year + 1, 1, 1, scale, seed)
+    else:
+        merra2_day(datapath, year, month + 1, 1, scale, seed)
+
+    return filenames, 8 * days
+
+def erai_month(datapath, year, month, scale=1.0, steps=None, seed=0):
+    '''
+    Monthly ERA-Interim files T_q, u_v and z_lnsp (60 levels, 4 time steps a day)
+    with the names of wizard.reader.ERAInterimReader. The grid is 241 x 480 (0.75 deg)
+    times the scale, from north to south. With steps, only the first time steps of
+    the month are written.
+    '''
+    folder = datapath + os.sep + 'era%d' % (year)
+    if not os.path.exists(folder):
+        os.makedirs(folder)
+    if steps is None:
+        steps = 4 * calendar.monthrange(year, month)[1]
+    latitude = np.linspace(90, -90, _scaled(240, scale) + 1)
+    longitude = np.linspace(0, 360, _scaled(480, scale), endpoint=False)
+    random = np.random.RandomState(seed + year * 13 + month)
+    T, q, u, v, ps, z = _atmosphere(random, steps, 60, latitude, longitude)
+    fields = {'T_q': (('t', T, 'K', 'Temperature'),
+                      ('q', q, 'kg kg**-1', 'Specific humidity')),
+              'u_v': (('u', u, 'm s**-1', 'U component of wind'),
+                      ('v', v, 'm s**-1', 'V component of wind')),
+              'z_lnsp': (('z', z, 'm**2 s**-2', 'Geopotential'),
+                         ('lnsp', np.log(ps), '~', 'Logarithm of surface pressure'))}
+    filenames = []
+    for name in ('T_q', 'u_v', 'z_lnsp'):
+        filename = folder + os.sep + 'model_daily_075_%d_%d_%s.nc' % (year, month, name)
+        dataset = Dataset(filename, 'w', format='NETCDF4')
+        try:
+            for dimension, size in (('time', steps), ('level', 60), ('latitude', len(latitude)),
+                                    ('longitude', len(longitude))):
+                dataset.createDimension(dimension, size)
+            _variable(dataset, 'time', ('time',), 6 * np.arange(steps), 'hours since %d-%02d-01 00:00:00' % (year, month),
+                      'time', dtype=np.int32)
+            _variable(dataset, 'level', ('level',), np.arange(1, 61), '~', 'model_level_number', dtype=np.int32)
+            _variable(dataset, 'latitude', ('latitude',), latitude, 'degrees_north', 'latitude', dtype=np.float32)
+            _variable(dataset, 'longitude', ('longitude',), longitude, 'degrees_east', 'longitude', dtype=np.float32)
+            for var_name, values, units, long_name in fields[name]:
+                if values.ndim == 4:
+                    dimensions = ('time', 'level', 'latitude', 'longitude')
+                else:
+                    dimensions = ('time', 'latitude', 'longitude')
+                _variable(dataset, var_name, dimensions, values, units, long_name)
+        finally:
+            dataset.close()
+        filenames.append(filename)
+
+    return filenames, steps
+
+def erai(datapath, year, month, scale=1.0, steps=None, seed=0):
+    '''
+    Monthly ERA-Interim files of the month, and of the months before and after,
+    which are read for the tendency terms. The files of the month and the number
+    of time steps are returned.
+    '''
+    filenames, steps_month = erai_month(datapath, year, month, scale, steps, seed)
+    if month == 1:
+        erai_month(datapath, year - 1, 12, scale, steps, seed)
+    else:
+        erai_month(datapath, year, month - 1, scale, steps, seed)
+    if month == 12:
+        erai_month(datapath, year + 1, 1, scale, steps, seed)
+    else:
+        erai_month(datapath, year, month + 1, scale, steps, seed)
+
+    return filenames, steps_month
+
+def _ocean_grid(random, level, jj, ji, depth_max):
+    '''
+    Thickness of the levels (level), depth of the bottom edges and the number of
+    wet levels of each column (jj, ji), with land around the poles and along some
+    of the meridians.
+    '''
+    # thickness from 10 m at the surface to some hundreds of meters at the bottom
+    dz = 10 + (np.arange(level) / float(level - 1))**2 * (2 * depth_max / level)
+    dz = dz * depth_max / np.sum(dz)
+    zb = np.cumsum(dz)
+    latitude = np.linspace(-78, 90, jj)[:,np.newaxis]
+    longitude = np.linspace(-180, 180, ji, endpoint=False)[np.newaxis,:]
+    depth = depth_max * (0.6 + 0.4 * np.cos(np.deg2rad(2 * longitude)) * np.cos(np.deg2rad(latitude)))
+    depth = depth * (1 + 0.05 * random.standard_normal((jj, ji)))
+    depth[(latitude < -70) | (latitude > 85) | (np.abs(longitude + 80) < 10)] = 0
+    depth = np.minimum(depth, zb[-1])
+    # number of wet levels, the bottom cell is a partial cell
+    levels = np.searchsorted(zb, depth)
+    levels[depth > 0] = np.minimum(levels[depth > 0] + 1, level)
+    depth[levels > 0] = np.maximum(depth[levels > 0], zb[levels[levels > 0] - 1] - 0.7 * dz[levels[levels > 0] - 1])
+    depth[levels == 0] = 0
+
+    return dz, zb, np.broadcast_to(latitude, (jj, ji)), np.broadcast_to(longitude, (jj, ji)), depth, levels
+
+def _ocean_fields(random, steps, dz, mask):
+    # potential temperature [C] and meridional velocity [m/s] (time, level, jj, ji)
+    shape = (steps,) + mask.shape
+    decay = np.exp(-np.cumsum(dz) / 1000)[:,np.newaxis,np.newaxis]
+    theta = ((2 + 20 * decay + _noise(random, shape)) * mask).astype(np.float32)
+    v = ((0.05 * decay + 0.02 * _noise(random, shape)) * mask).astype(np.float32)
+    return theta, v
+
+def orca1(datapath, year, scale=1.0, seed=0):
+    '''
+    ORCA1 mesh_mask.nc and basinmask_050308_UKMO.nc, and the yearly ORAS4 files
+    theta/thetao_oras4_1m_(year)_grid_T.nc and v/vo_oras4_1m_(year)_grid_V.nc
+    (12 months, 42 levels). The grid is 292 x 362 times the scale. The files of
+    the year and the number of time steps are returned.
+    '''
+    level = 42
+    jj = _scaled(292, scale)
+    ji = _scaled(362, scale)
+    random = np.random.RandomState(seed + year)
+    dz, zb, nav_lat, nav_lon, depth, mbathy = _ocean_grid(random, level, jj, ji, 5500.0)
+    tmask = (np.arange(level)[:,np.newaxis,np.newaxis] < mbathy[np.newaxis,:,:]).astype(np.int8)
+    vmask = tmask.copy()
+    vmask[:,:-1,:] = tmask[:,:-1,:] * tmask[:,1:,:]
+    bottom = np.maximum(mbathy - 1, 0)
+    e3t_ps = np.where(mbathy > 0, depth - (zb[bottom] - dz[bottom]), dz[bottom])
+    e1 = 111e+3 * 360.0 / ji * np.maximum(np.cos(np.deg2rad(nav_lat)), 0.05)
+    e2 = 111e+3 * 168.0 / jj * np.ones((jj, ji))
+    if not os.path.exists(datapath):
+        os.makedirs(datapath)
+    mesh = Dataset(datapath + os.sep + 'mesh_mask.nc', 'w', format='NETCDF4')
+    try:
+        for name, size in (('t', 1), ('z', level), ('y', jj), ('x', ji)):
+            mesh.createDimension(name, size)
+        _variable(mesh, 'nav_lat', ('y', 'x'), nav_lat, 'degrees_north', 'Latitude')
+        _variable(mesh, 'nav_lon', ('y', 'x'), nav_lon, 'degrees_east', 'Longitude')
+        _variable(mesh, 'nav_lev', ('z',), zb - dz / 2, 'm', 'Depth')
+        _variable(mesh, 'gphiv', ('t', 'y', 'x'), nav_lat[np.newaxis] + 84.0 / jj, 'degrees_north', 'latitude of V points')
+        _variable(mesh, 'glamv', ('t', 'y', 'x'), nav_lon[np.newaxis], 'degrees_east', 'longitude of V points')
+        _variable(mesh, 'tmask', ('t', 'z', 'y', 'x'), tmask[np.newaxis], '1', 'land-sea mask of T points', dtype=np.int8)
+        _variable(mesh, 'vmask', ('t', 'z', 'y', 'x'), vmask[np.newaxis], '1', 'land-sea mask of V points', dtype=np.int8)
+        for name in ('e1t', 'e1v'):
+            _variable(mesh, name, ('t', 'y', 'x'), e1[np.newaxis], 'm', 'zonal scale factor', dtype=np.float64)
+        for name in ('e2t', 'e2v'):
+            _variable(mesh, name, ('t', 'y', 'x'), e2[np.newaxis], 'm', 'meridional scale factor', dtype=np.float64)
+        _variable(mesh, 'mbathy', ('t', 'y', 'x'), mbathy[np.newaxis], '1', 'number of wet levels', dtype=np.int16)
+        _variable(mesh, 'e3t_0', ('t', 'z'), dz[np.newaxis], 'm', 'thickness of the levels', dtype=np.float64)
+        _variable(mesh, 'e3t_ps', ('t', 'y', 'x'), e3t_ps[np.newaxis], 'm', 'thickness of the partial cells',
+                  dtype=np.float64)
+    finally:
+        mesh.close()
+    # the Atlantic between 30S and 70N
+    atlantic = (nav_lon > -70) & (nav_lon < 20) & (nav_lat > -30) & (nav_lat < 70)
+    basin = Dataset(datapath + os.sep + 'basinmask_050308_UKMO.nc', 'w', format='NETCDF4')
+    try:
+        basin.createDimension('y', jj)
+        basin.createDimension('x', ji)
+        _variable(basin, 'tmaskatl', ('y', 'x'), atlantic * tmask[0], '1', 'Atlantic basin mask')
+    finally:
+        basin.close()
+    theta, v = _ocean_fields(random, 12, dz, tmask)
+    v = v * vmask
+    filenames = []
+    for folder, name, grid, var_name, values, units in (('theta', 'thetao', 'T', 'thetao', theta, 'degC'),
+                                                        ('v', 'vo', 'V', 'vo', v, 'm/s')):
+        if not os.path.exists(datapath + os.sep + folder):
+            os.makedirs(datapath + os.sep + folder)
+        filename = datapath + os.sep + folder + os.sep + '%s_oras4_1m_%d_grid_%s.nc' % (name, year, grid)
+        dataset = Dataset(filename, 'w', format='NETCDF4')
+        try:
+            depth_name = 'depth%s' % (grid.lower())
+            for dimension, size in (('time_counter', None), (depth_name, level), ('y', jj), ('x', ji)):
+                dataset.createDimension(dimension, size)
+            _variable(dataset, 'time_counter', ('time_counter',), 30 * np.arange(12) + 15,
+                      'days since %d-01-01 00:00:00' % (year), 'time', dtype=np.float64)
+            _variable(dataset, depth_name, (depth_name,), zb - dz / 2, 'm', 'depth', dtype=np.float32)
+            _variable(dataset, var_name, ('time_counter', depth_name, 'y', 'x'), values, units, var_name)
+        finally:
+            dataset.close()
+        filenames.append(filename)
+
+    return filenames, 12
+
+def mom5(datapath_mask, datapath, year, scale=1.0, files=73, seed=0):
+    '''
+    MOM5 topog.nc in datapath_mask and the 5-daily SODA3 files of the year in
+    datapath/soda(year), listed in namelist.txt (50 levels, 1 time step each).
+    The grid is 1070 x 1440 times the scale. With files, only the first files of
+    the year are written. The files and the number of time steps are returned.
+    '''
+    level = 50
+    jj = _scaled(1070, scale)
+    ji = _scaled(1440, scale)
+    random = np.random.RandomState(seed + year)
+    dz, zb, y_T, x_T, depth, num_levels = _ocean_grid(random, level, jj, ji, 5500.0)
+    wet = (num_levels > 0).astype(np.float64)
+    # the C cell is wet if the four surrounding T cells are wet
+    wet_c = wet * np.roll(wet, -1, axis=1)
+    wet_c[:-1,:] = wet_c[:-1,:] * wet_c[1:,:]
+    num_levels_c = np.where(wet_c > 0, np.minimum(num_levels, np.roll(num_levels, -1, axis=1)), 0)
+    num_levels_c[:-1,:] = np.minimum(num_levels_c[:-1,:], num_levels_c[1:,:])
+    # the bottom of the C cells halfway their bottom level
+    bottom_c = np.maximum(num_levels_c - 1, 0)
+    depth_c = np.where(num_levels_c > 0, zb[bottom_c] - 0.5 * dz[bottom_c], 0)
+    dx = 111e+3 * 360.0 / ji * np.maximum(np.cos(np.deg2rad(y_T)), 0.05)
+    dy = 111e+3 * 168.0 / jj * np.ones((jj, ji))
+    if not os.path.exists(datapath_mask):
+        os.makedirs(datapath_mask)
+    topog = Dataset(datapath_mask + os.sep + 'topog.nc', 'w', format='NETCDF4')
+    try:
+        for name, size in (('grid_x_T', ji), ('grid_y_T', jj), ('grid_x_C', ji), ('grid_y_C', jj),
+                           ('zt', level), ('zb', level)):
+            topog.createDimension(name, size)
+        _variable(topog, 'grid_x_T', ('grid_x_T',), x_T[0], 'degree_east', 'Nominal Longitude of T-cell center',
+                  dtype=np.float64)
+        _variable(topog, 'grid_y_T', ('grid_y_T',), y_T[:,0], 'degree_north', 'Nominal Latitude of T-cell center',
+                  dtype=np.float64)
+        _variable(topog, 'grid_x_C', ('grid_x_C',), x_T[0] + 180.0 / ji, 'degree_east',
+                  'Nominal Longitude of C-cell center', dtype=np.float64)
+        _variable(topog, 'grid_y_C', ('grid_y_C',), y_T[:,0] + 84.0 / jj, 'degree_north',
+                  'Nominal Latitude of C-cell center', dtype=np.float64)
+        horizontal = ('grid_y_T', 'grid_x_T')
+        _variable(topog, 'x_T', horizontal, x_T, 'degree_east', 'Geographic Longitude of T-cell center', dtype=np.float64)
+        _variable(topog, 'y_T', horizontal, y_T, 'degree_north', 'Geographic Latitude of T-cell center', dtype=np.float64)
+        _variable(topog, 'x_C', horizontal, x_T + 180.0 / ji, 'degree_east', 'Geographic Longitude of C-cell center',
+                  dtype=np.float64)
+        _variable(topog, 'y_C', horizontal, y_T + 84.0 / jj, 'degree_north', 'Geographic Latitude of C-cell center',
+                  dtype=np.float64)
+        _variable(topog, 'zt', ('zt',), zb - dz / 2, 'meters', 'Depth of T cell', dtype=np.float64)
+        _variable(topog, 'zb', ('zb',), zb, 'meters', 'Depth of T cell edges', dtype=np.float64)
+        _variable(topog, 'area_T', horizontal, dx * dy, 'm^2', 'Area of T-cell', dtype=np.float64)
+        for name, values in (('ds_01_21_T', dx), ('ds_10_12_T', dy), ('ds_01_21_C', dx), ('ds_10_12_C', dy)):
+            _variable(topog, name, horizontal, values, 'm', 'width or height of the cell', dtype=np.float64)
+        _variable(topog, 'wet', horizontal, wet, 'none', 'land/sea flag (0=land) for T-cell', dtype=np.float64)
+        _variable(topog, 'wet_c', horizontal, wet_c, 'none', 'land/sea flag (0=land) for C-cell', dtype=np.float64)
+        _variable(topog, 'num_levels', horizontal, num_levels, 'none', 'number of vertical T-cells', dtype=np.float64)
+        _variable(topog, 'num_levels_c', horizontal, num_levels_c, 'none', 'number of vertical C-cells', dtype=np.float64)
+        _variable(topog, 'depth', horizontal, depth, 'meters', 'topographic depth of T-cell', dtype=np.float64)
+        _variable(topog, 'depth_c', horizontal, depth_c, 'meters', 'topographic depth of C-cell', dtype=np.float64)
+    finally:
+        topog.close()
+    folder = datapath + os.sep + 'soda%d' % (year)
+    if not os.path.exists(folder):
+        os.makedirs(folder)
+    tmask = (np.arange(level)[:,np.newaxis,np.newaxis] < num_levels[np.newaxis,:,:])
+    cmask = (np.arange(level)[:,np.newaxis,np.newaxis] < num_levels_c[np.newaxis,:,:])
+    namelist = []
+    filenames = []
+    for n in np.arange(files):
+        day = 5 * n + 3
+        date = np.datetime64('%d-01-01' % (year)) + np.timedelta64(int(day) - 1, 'D')
+        name = 'soda3.3.1_5dy_ocean_reg_%s.nc' % (str(date).replace('-', '_'))
+        temp, v = _ocean_fields(random, 1, dz, tmask)
+        v = v * cmask
+        dataset = Dataset(folder + os.sep + name, 'w', format='NETCDF4')
+        try:
+            for dimension, size in (('time', None), ('st_ocean', level), ('yt_ocean', jj), ('xt_ocean', ji),
+                                    ('yu_ocean', jj), ('xu_ocean', ji)):
+                dataset.createDimension(dimension, size)
+            _variable(dataset, 'time', ('time',), [day], 'days since %d-01-01 00:00:00' % (year), 'time',
+                      dtype=np.float64)
+            _variable(dataset, 'st_ocean', ('st_ocean',), zb - dz / 2, 'meters', 'tcell zstar depth', dtype=np.float64)
+            _variable(dataset, 'temp', ('time', 'st_ocean', 'yt_ocean', 'xt_ocean'), temp, 'degrees C',
+                      'Potential temperature')
+            _variable(dataset, 'v', ('time', 'st_ocean', 'yu_ocean', 'xu_ocean'), v, 'm/sec', 'j-current')
+        finally:
+            dataset.close()
+        namelist.append(name)
+        filenames.append(folder + os.sep + name)
+    with open(folder + os.sep + 'namelist.txt', 'w') as namelist_file:
+        namelist_file.write('\n'.join(namelist) + '\n')
+
+    return filenames, files
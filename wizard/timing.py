@@ -0,0 +1,209 @@
+"""
+Copyright Netherlands eScience Center
+
+Function        : Wall time, CPU time and peak memory of each stage of the pipelines
+Author          : Yang Liu
+Date            : 2018.2.14
+Last Update     : 2018.2.23
+Description     : The only measure of the performance of the AMET and OMET scripts was
+                  the elapsed time at the end of the job. The module records the wall
+                  time, the CPU time and the peak resident memory (RSS) of each stage
+                  of the pipeline, e.g.
+                  retrieve, divergence (mass correction), tendency, flux, correction,
+                  write, plot
+                  for each day, month or year, as given by the labels of the stage.
+                  Each measurement is written as a JSON object on a single line to a
+                  file next to the log of the job (timing_file), together with the
+                  Slurm job id, the host and the process id.
+                  summarize aggregates the measurements of many jobs, e.g. all the
+                  years of a dataset, by stage or by any other label.
+Return Value    : JSON lines file
+Dependencies    : os, sys, time, json, socket, resource (not on Windows)
+Caveat!!        : The CPU time includes all the threads of the process and the child
+                  processes which have finished, e.g. the worker processes of
+                  wizard.executor, once they have been joined.
+                  The peak RSS is the high-water mark of the process since it started,
+                  not of the stage alone. The worker processes of wizard.executor which
+                  take a single task each report the peak of that task.
+                  The geopotential is streamed level by level into the energy flux,
+                  so its integral is part of the flux stage.
+"""
+import os
+import sys
+import time
+import json
+import socket
+try:
+    import resource
+except ImportError:
+    # no resource module on Windows
+    resource = None
+
+# stages of the AMET pipelines, the OMET scripts add 'stream_function'
+# the geopotential is computed within the flux stage
+stages = ('retrieve', 'divergence', 'tendency', 'flux', 'correction', 'write', 'plot')
+
+def timing_file(log_file):
+    '''
+    File of the measurements next to the given log file, e.g. history_E_1980.log
+    gives history_E_1980_timing.jsonl.
+    '''
+    return os.path.splitext(log_file)[0] + '_timing.jsonl'
+
+def cpu_time():
+    '''
+    User and system time [s] of the process and its finished child processes.
+    '''
+    times = os.times()
+    return times[0] + times[1] + times[2] + times[3]
+
+def peak_rss():
+    '''
+    Peak resident memory [MB] of the process, None if it is not available.
+    '''
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # bytes on Mac OS, kilobytes on Linux
+    if sys.platform == 'darwin':
+        return peak / 1024.0**2
+    return peak / 1024.0
+
+def _plain(value):
+    # numpy scalars (e.g. the year from np.arange) are not JSON serializable
+    if hasattr(value, 'item'):
+        return value.item()
+    return str(value)
+
+class StageTimer(object):
+    '''
+    Measurements of the stages of a pipeline, written to the given file as JSON lines.
+    The labels (e.g. dataset='MERRA2') are added to every measurement. Without a
+    file, nothing is recorded, which keeps the instrumented code unchanged.
+    '''
+    def __init__(self, filename=None, **labels):
+        self.filename = filename
+        self.labels = labels
+        self.labels['job'] = os.environ.get('SLURM_JOB_ID')
+        self.labels['host'] = socket.gethostname()
+
+    def stage(self, name, **labels):
+        '''
+        Context manager which measures the stage with the given name and labels, e.g.
+        with timer.stage('flux', year=1980, month=1, day=1):
+        '''
+        return _Stage(self, name, labels)
+
+    def iterate(self, name, iterable, **labels):
+        '''
+        Yield the items of the iterable (e.g. the blocks of a reader) and measure the
+        time spent waiting for each of them as the stage with the given name. The
+        index of the item is added as the label 'block'.
+        '''
+        iterator = iter(iterable)
+        block = 0
+        while True:
+            wall = time.time()
+            cpu = cpu_time()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+            self.record(name, time.time() - wall, cpu_time() - cpu, block=block, **labels)
+            yield item
+            block += 1
+
+    def record(self, name, wall, cpu, **labels):
+        '''
+        Write a single measurement of the stage: wall and CPU time [s], together with
+        the peak RSS [MB] of the process.
+        '''
+        if self.filename is None:
+            return
+        entry = dict(self.labels)
+        entry.update(labels)
+        entry['stage'] = name
+        entry['wall'] = wall
+        entry['cpu'] = cpu
+        entry['peak_rss_mb'] = peak_rss()
+        entry['pid'] = os.getpid()
+        entry['time'] = time.time()
+        line = json.dumps(entry, sort_keys=True, default=_plain) + '\n'
+        # a single short write in append mode, the worker processes share the file
+        with open(self.filename, 'a') as timing:
+            timing.write(line)
+
+class _Stage(object):
+    def __init__(self, timer, name, labels):
+        self.timer = timer
+        self.name = name
+        self.labels = labels
+
+    def __enter__(self):
+        self.wall = time.time()
+        self.cpu = cpu_time()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        # a stage which fails is recorded too
+        if exc_type is not None:
+            self.labels['failed'] = True
+        self.timer.record(self.name, time.time() - self.wall, cpu_time() - self.cpu, **self.labels)
+        return False
+
+def load(filenames):
+    '''
+    Yield the measurements in the given files. A line which is cut off (e.g. by a
+    job which is killed) is skipped.
+    '''
+    for filename in filenames:
+        with open(filename, 'r') as timing:
+            for line in timing:
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    continue
+
+def summarize(filenames, keys=('stage',)):
+    '''
+    Aggregate the measurements of all the files (e.g. of many Slurm jobs) by the given
+    labels. A dictionary is returned, which maps the values of the labels to the
+    count, the total and maximum wall time, the total CPU time [s], the maximum peak
+    RSS [MB] and the number of jobs.
+    '''
+    summary = {}
+    jobs = {}
+    for entry in load(filenames):
+        key = tuple([entry.get(name) for name in keys])
+        if key not in summary:
+            summary[key] = {'count': 0, 'wall': 0.0, 'wall_max': 0.0, 'cpu': 0.0, 'peak_rss_mb': 0.0}
+            jobs[key] = set()
+        total = summary[key]
+        total['count'] += 1
+        total['wall'] += entry['wall']
+        total['wall_max'] = max(total['wall_max'], entry['wall'])
+        total['cpu'] += entry['cpu']
+        if entry.get('peak_rss_mb') is not None:
+            total['peak_rss_mb'] = max(total['peak_rss_mb'], entry['peak_rss_mb'])
+        jobs[key].add(entry.get('job'))
+    for key in summary:
+        summary[key]['jobs'] = len(jobs[key])
+
+    return summary
+
+def report(summary, keys=('stage',)):
+    '''
+    Table of the summary as a list of lines, sorted by the total wall time. The share
+    of the total wall time and the ratio of CPU time to wall time are given for each row.
+    '''
+    wall_total = sum([total['wall'] for total in summary.values()]) or 1.0
+    lines = ['%-40s %8s %12s %7s %12s %10s %6s %12s' % ('/'.join(keys), 'count', 'wall [s]', 'share',
+                                                        'max [s]', 'cpu/wall', 'jobs', 'peak [MB]')]
+    for key in sorted(summary, key=lambda key: -summary[key]['wall']):
+        total = summary[key]
+        lines.append('%-40s %8d %12.1f %6.1f%% %12.2f %10.2f %6d %12.0f' %
+                     ('/'.join([str(value) for value in key]), total['count'], total['wall'],
+                      100 * total['wall'] / wall_total, total['wall_max'],
+                      total['cpu'] / max(total['wall'], 1e-9), total['jobs'], total['peak_rss_mb']))
+
+    return lines
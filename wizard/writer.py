@@ -0,0 +1,201 @@
+"""
+Copyright Netherlands eScience Center
+
+Function        : Chunked and compressed NetCDF4 output, written record by record
+Author          : Yang Liu
+Date            : 2018.2.9
+Last Update     : 2018.2.19
+Description     : The fields of meridional energy transport at each grid point were
+                  written as uncompressed NETCDF3_64BIT files in double precision,
+                  all at once at the end of the year. The module writes NetCDF4 files
+                  instead, with:
+                  1. zlib compression with the shuffle filter
+                  2. float32 storage (the results are far from single precision)
+                  3. optional lossy quantization (least_significant_digit), which
+                     makes the compression much more effective
+                  4. chunks which hold a long time series of a small tile of grid
+                     points, since the regression scripts read the time series at
+                     each point
+                  The time dimension (e.g. 'month') is unlimited and the records are
+                  written one by one as soon as they are computed. A file which
+                  exists already is opened again and its records are overwritten,
+                  so a job which resumes from a checkpoint continues the same file.
+Return Value    : NetCDF4 data file
+Dependencies    : os, numpy, netCDF4
+                  wizard.bands, wizard.sector
+Caveat!!        : The chunks of the records which are written are kept in the chunk
+                  cache of each variable until the file is closed, the size of the
+                  cache is set for a full slab of chunks along the time axis.
+                  With least_significant_digit = n, the values are only exact to
+                  10**(-n) in the unit of the variable.
+"""
+import os
+import numpy as np
+from netCDF4 import Dataset
+import wizard.bands
+import wizard.sector
+
+class RecordWriter(object):
+    '''
+    NetCDF4 file with an unlimited time dimension (e.g. 'month') and fixed
+    coordinates, given as a list of (name, values, units), e.g.
+    [('latitude', latitude, 'degree_north'), ('longitude', longitude, 'degree_east')].
+    The variables are declared with variable and a record is written with write.
+    Each chunk holds time_chunk records of a tile of tile x tile grid points.
+    '''
+    def __init__(self, filename, time_name, coordinates, description=None,
+                 time_chunk=12, tile=32, complevel=4):
+        self.filename = filename
+        self.time_name = time_name
+        self.time_chunk = time_chunk
+        self.tile = tile
+        self.complevel = complevel
+        if os.path.exists(filename):
+            # continue the file of a previous run
+            self.data_wrap = Dataset(filename, 'a')
+            for name, values, units in coordinates:
+                if not np.allclose(self.data_wrap.variables[name][:], values):
+                    raise ValueError("The coordinate %s of %s does not match." % (name, filename))
+            return
+        self.data_wrap = Dataset(filename, 'w', format='NETCDF4')
+        # create dimensions for netcdf data
+        self.data_wrap.createDimension(time_name, None)
+        self.data_wrap.createVariable(time_name, np.int32, (time_name,))
+        for name, values, units in coordinates:
+            self.data_wrap.createDimension(name, len(values))
+            coordinate_var = self.data_wrap.createVariable(name, np.float32, (name,))
+            coordinate_var.units = units
+            coordinate_var[:] = values
+        if description is not None:
+            self.data_wrap.description = description
+
+    def variable(self, name, dimensions, units, long_name, dtype=np.float32,
+                 least_significant_digit=None):
+        '''
+        Declare a variable with the time dimension followed by the given dimensions
+        (e.g. ('latitude', 'longitude')). The variable of a file which is opened
+        again is kept as it is, with its compression and chunks.
+        '''
+        if name in self.data_wrap.variables:
+            var_wrap = self.data_wrap.variables[name]
+        else:
+            chunksizes = [self.time_chunk]
+            for dimension in dimensions:
+                chunksizes.append(min(self.tile, len(self.data_wrap.dimensions[dimension])))
+            # the zonal integrals (time, lat) are small, a chunk holds all the latitudes
+            if len(dimensions) == 1:
+                chunksizes[-1] = len(self.data_wrap.dimensions[dimensions[0]])
+            var_wrap = self.data_wrap.createVariable(name, dtype, (self.time_name,) + tuple(dimensions),
+                                                     zlib=True, complevel=self.complevel, shuffle=True,
+                                                     chunksizes=tuple(chunksizes),
+                                                     least_significant_digit=least_significant_digit)
+            var_wrap.units = units
+            var_wrap.long_name = long_name
+        # keep a full slab of chunks along the time axis in the cache
+        chunksizes = var_wrap.chunking()
+        slab = var_wrap.dtype.itemsize * chunksizes[0]
+        for dimension, chunk in zip(dimensions, chunksizes[1:]):
+            slab *= -(-len(self.data_wrap.dimensions[dimension]) // chunk) * chunk
+        var_wrap.set_var_chunk_cache(size=max(int(slab * 1.25), 1024**2), nelems=4099, preemption=0.75)
+        return var_wrap
+
+    def write(self, record, time, **fields):
+        '''
+        Write the fields (name = array) of a record (from 0) with the given value
+        of the time coordinate (e.g. the month). The records may be written in any
+        order, a record which is written already is overwritten.
+        '''
+        self.data_wrap.variables[self.time_name][record] = time
+        for name, field in fields.items():
+            self.data_wrap.variables[name][record] = field
+        # the records on disk are complete if the job is stopped
+        self.data_wrap.sync()
+
+    def close(self):
+        self.data_wrap.close()
+
+# output name and long name of the meridional energy transport and each component
+amet_components = (('E', 'atmospheric meridional energy transport'),
+                   ('E_cpT', 'atmospheric meridional internal energy transport'),
+                   ('E_Lvq', 'atmospheric meridional latent heat transport'),
+                   ('E_gz', 'atmospheric meridional geopotential transport'),
+                   ('E_uv2', 'atmospheric meridional kinetic energy transport'))
+
+def amet_point(filename, latitude, longitude, dtype=np.float32, least_significant_digit=None):
+    '''
+    Monthly file of the meridional energy transport and each component at each grid
+    point [TW], together with the barotropic correction wind (uc, vc).
+    '''
+    point_writer = RecordWriter(filename, 'month',
+                                [('latitude', latitude, 'degree_north'), ('longitude', longitude, 'degree_east')],
+                                'Monthly mean meridional energy transport and each component at each grid point')
+    point_writer.variable('uc', ('latitude', 'longitude'), 'm/s', 'zonal barotropic correction wind')
+    point_writer.variable('vc', ('latitude', 'longitude'), 'm/s', 'meridional barotropic correction wind')
+    for name, long_name in amet_components:
+        point_writer.variable(name, ('latitude', 'longitude'), 'tera watt', long_name, dtype=dtype,
+                              least_significant_digit=least_significant_digit)
+    return point_writer
+
+def amet_sector_variables(data_writer, sectors, suffix=''):
+    '''
+    Declare the integral over each sector (name) of the meridional energy transport
+    and each component, e.g. E_Atlantic, or E_mean2int_Atlantic with a suffix.
+    '''
+    for sector in sectors:
+        for name, long_name in amet_components:
+            data_writer.variable(name + suffix + '_' + sector, ('latitude',), 'tera watt',
+                                 long_name + ' integrated over the sector %s' % (sector), dtype=np.float64)
+
+def amet_band_coordinate(edges=wizard.bands.edges):
+    '''
+    Coordinate of the pressure bands (wizard.bands), the pressure at the top of
+    each band [hPa], to be given to RecordWriter with the other coordinates.
+    '''
+    return ('band', wizard.bands.top(edges), 'hPa')
+
+def amet_band_variables(data_writer, edges=wizard.bands.edges):
+    '''
+    Declare the zonal integral of the meridional energy transport and each component
+    in each pressure band (band, lat), e.g. E_band. The file must have the coordinate
+    of amet_band_coordinate.
+    '''
+    band_names = ', '.join(wizard.bands.names(edges))
+    for name, long_name in amet_components:
+        data_writer.variable(name + '_band', ('band', 'latitude'), 'tera watt',
+                             long_name + ' in the pressure bands %s' % (band_names), dtype=np.float64)
+
+def amet_zonal_int(filename, latitude, sectors=()):
+    '''
+    Monthly file of the zonal integral of meridional energy transport and each
+    component [TW], and of the integral over each sector (name, see wizard.sector).
+    The zonal integrals are small and kept in double precision.
+    '''
+    zonal_writer = RecordWriter(filename, 'month', [('latitude', latitude, 'degree_north')],
+                                'Monthly mean zonal integral of meridional energy transport and each component')
+    for name, long_name in amet_components:
+        zonal_writer.variable(name, ('latitude',), 'tera watt', long_name, dtype=np.float64)
+    amet_sector_variables(zonal_writer, sectors)
+    return zonal_writer
+
+def write_amet_month(point_writer, zonal_writer, month, results, sector_masks=()):
+    '''
+    Write the results of a month (from 1) to the files of amet_point and amet_zonal_int.
+    The results are named as in the checkpoints of the AMET scripts (meridional_E,
+    meridional_E_internal, ... meridional_E_point, ... uc, vc). The integrals over
+    the sectors of wizard.sector.masks are taken from the fields at each grid point.
+    '''
+    point_fields = {'E': results['meridional_E_point'],
+                    'E_cpT': results['meridional_E_internal_point'],
+                    'E_Lvq': results['meridional_E_latent_point'],
+                    'E_gz': results['meridional_E_geopotential_point'],
+                    'E_uv2': results['meridional_E_kinetic_point']}
+    point_writer.write(month - 1, month, uc = results['uc'], vc = results['vc'], **point_fields)
+    zonal_fields = {'E': results['meridional_E'],
+                    'E_cpT': results['meridional_E_internal'],
+                    'E_Lvq': results['meridional_E_latent'],
+                    'E_gz': results['meridional_E_geopotential'],
+                    'E_uv2': results['meridional_E_kinetic']}
+    for sector, weights in sector_masks:
+        for name in point_fields:
+            zonal_fields[name + '_' + sector] = wizard.sector.integral(point_fields[name], weights)
+    zonal_writer.write(month - 1, month, **zonal_fields)